@@ -0,0 +1,157 @@
+"""baseline schema
+
+Creates the schema as it stood when migrations were introduced. Databases
+that were managed by create_all() and the old startup column checks are
+adopted in place: existing tables only get the columns and indexes they are
+missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:58:55.047049
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def users_columns() -> list[sa.Column]:
+    return [
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('is_verified', sa.Boolean(), server_default=sa.false(), nullable=False),
+        sa.Column('verification_token_hash', sa.String(length=255), nullable=True),
+        sa.Column('verification_token_expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('password_reset_token_hash', sa.String(length=255), nullable=True),
+        sa.Column('password_reset_token_expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('failed_login_attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_failed_login_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('lockout_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    ]
+
+
+def deployments_columns() -> list[sa.Column]:
+    return [
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('environment_id', sa.UUID(), nullable=False),
+        sa.Column('version', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('logs_url', sa.String(length=512), nullable=True),
+        sa.Column('logs', sa.String(), nullable=True),
+        sa.Column('app_logs', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    ]
+
+
+def add_missing_columns(inspector, table: str, columns: list[sa.Column]) -> None:
+    existing = {column['name'] for column in inspector.get_columns(table)}
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(table, column)
+
+
+def create_missing_indexes(inspector, table: str, indexes: list[tuple]) -> None:
+    existing = {index['name'] for index in inspector.get_indexes(table)}
+    for name, columns, options in indexes:
+        if name not in existing:
+            op.create_index(name, table, columns, **options)
+
+
+SESSION_INDEXES = [
+    ('ix_sessions_active_lookup', ['session_id_hash', 'revoked_at', 'expires_at'],
+     {'unique': False, 'postgresql_include': ['user_id', 'last_seen_at']}),
+    ('ix_sessions_expires_at', ['expires_at'], {'unique': False}),
+    ('ix_sessions_revoked_at', ['revoked_at'],
+     {'unique': False, 'postgresql_where': sa.text('revoked_at IS NOT NULL')}),
+    ('ix_sessions_session_id_hash', ['session_id_hash'], {'unique': True}),
+    ('ix_sessions_user_id', ['user_id'], {'unique': False}),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'users' in tables:
+        add_missing_columns(inspector, 'users', users_columns())
+    else:
+        op.create_table('users', *users_columns(), sa.PrimaryKeyConstraint('id'))
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    if 'projects' not in tables:
+        op.create_table('projects',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.String(length=1024), nullable=True),
+        sa.Column('repo_url', sa.String(length=512), nullable=True),
+        sa.Column('owner_id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'sessions' not in tables:
+        op.create_table('sessions',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('session_id_hash', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_seen_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('ip_address', sa.String(length=50), nullable=True),
+        sa.Column('user_agent', sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+    create_missing_indexes(sa.inspect(op.get_bind()), 'sessions', SESSION_INDEXES)
+
+    if 'environments' not in tables:
+        op.create_table('environments',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('project_id', sa.UUID(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('base_url', sa.String(length=512), nullable=True),
+        sa.Column('config', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'deployments' in tables:
+        add_missing_columns(inspector, 'deployments', deployments_columns())
+    else:
+        op.create_table('deployments', *deployments_columns(),
+        sa.ForeignKeyConstraint(['environment_id'], ['environments.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('deployments')
+    op.drop_table('environments')
+    for name, _, _ in reversed(SESSION_INDEXES):
+        op.drop_index(name, table_name='sessions')
+    op.drop_table('sessions')
+    op.drop_table('projects')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,49 @@
+"""lookup indexes
+
+Index the foreign keys the list endpoints filter on, together with the
+created_at ordering they return, and the email verification token lookup.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 14:02:11.512734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY on Postgres, so building the indexes does not block writes to live
+    # tables; it cannot run inside a transaction.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_projects_owner_id_created_at', 'projects',
+                        ['owner_id', sa.text('created_at DESC')], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_environments_project_id_created_at', 'environments',
+                        ['project_id', sa.text('created_at DESC')], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_deployments_environment_id_created_at', 'deployments',
+                        ['environment_id', sa.text('created_at DESC')], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_users_verification_token_hash', 'users', ['verification_token_hash'], unique=False,
+                        postgresql_where=sa.text('verification_token_hash IS NOT NULL'),
+                        sqlite_where=sa.text('verification_token_hash IS NOT NULL'),
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_verification_token_hash', table_name='users')
+    op.drop_index('ix_deployments_environment_id_created_at', table_name='deployments')
+    op.drop_index('ix_environments_project_id_created_at', table_name='environments')
+    op.drop_index('ix_projects_owner_id_created_at', table_name='projects')
@@ -0,0 +1,48 @@
+"""keyset pagination indexes
+
+Extend the list indexes with id, the tie-breaker of the (created_at, id)
+keyset the list endpoints page on, so a page is one index range scan.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 15:20:43.106218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, parent column) of each paged list
+LISTS = [
+    ('projects', 'owner_id'),
+    ('environments', 'project_id'),
+    ('deployments', 'environment_id'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The new index is built before the old one is dropped, so the lists never go unindexed
+    with op.get_context().autocommit_block():
+        for table, parent in LISTS:
+            op.create_index(f'ix_{table}_{parent}_created_at_id', table,
+                            [parent, sa.text('created_at DESC'), sa.text('id DESC')], unique=False,
+                            postgresql_concurrently=True)
+            op.drop_index(f'ix_{table}_{parent}_created_at', table_name=table,
+                          postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, parent in LISTS:
+        op.create_index(f'ix_{table}_{parent}_created_at', table,
+                        [parent, sa.text('created_at DESC')], unique=False)
+        op.drop_index(f'ix_{table}_{parent}_created_at_id', table_name=table)
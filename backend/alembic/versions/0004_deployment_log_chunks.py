@@ -0,0 +1,111 @@
+"""deployment log chunks
+
+Move deployment logs out of the deployments row into an append-only
+deployment_log_chunks table: the runner appends new chunks instead of
+rewriting the whole log on every step. Existing logs are copied over as the
+first chunk of their stream.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 17:41:09.283514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (old deployments column, chunk stream)
+STREAMS = [
+    ('logs', 'deploy'),
+    ('app_logs', 'app'),
+]
+BATCH = 1000
+
+deployments = sa.table(
+    'deployments',
+    sa.column('id', sa.UUID()),
+    sa.column('logs', sa.String()),
+    sa.column('app_logs', sa.String()),
+)
+chunks = sa.table(
+    'deployment_log_chunks',
+    sa.column('deployment_id', sa.UUID()),
+    sa.column('stream', sa.String()),
+    sa.column('seq', sa.Integer()),
+    sa.column('byte_offset', sa.BigInteger()),
+    sa.column('data', sa.LargeBinary()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('deployment_log_chunks',
+    sa.Column('deployment_id', sa.UUID(), nullable=False),
+    sa.Column('stream', sa.String(length=16), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('byte_offset', sa.BigInteger(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['deployment_id'], ['deployments.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('deployment_id', 'stream', 'seq')
+    )
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(deployments.c.id, deployments.c.logs, deployments.c.app_logs)
+        .where(sa.or_(deployments.c.logs.is_not(None), deployments.c.app_logs.is_not(None)))
+        .execution_options(yield_per=BATCH)
+    )
+    for batch in rows.partitions():
+        values = [
+            {
+                'deployment_id': row.id,
+                'stream': stream,
+                'seq': 0,
+                'byte_offset': 0,
+                # Chunks hold whole lines, each ending in a newline
+                'data': (text.rstrip('\n') + '\n').encode(),
+            }
+            for row in batch
+            for column, stream in STREAMS
+            if (text := getattr(row, column))
+        ]
+        if values:
+            bind.execute(chunks.insert(), values)
+
+    with op.batch_alter_table('deployments') as batch_op:
+        batch_op.drop_column('app_logs')
+        batch_op.drop_column('logs')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('deployments') as batch_op:
+        batch_op.add_column(sa.Column('logs', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('app_logs', sa.String(), nullable=True))
+
+    bind = op.get_bind()
+    for column, stream in STREAMS:
+        assembled: dict = {}
+        for row in bind.execute(
+            sa.select(chunks.c.deployment_id, chunks.c.data)
+            .where(chunks.c.stream == stream)
+            .order_by(chunks.c.deployment_id, chunks.c.seq)
+        ):
+            assembled.setdefault(row.deployment_id, []).append(row.data)
+        for deployment_id, parts in assembled.items():
+            bind.execute(
+                deployments.update()
+                .where(deployments.c.id == deployment_id)
+                .values({column: b''.join(parts).decode(errors='replace').rstrip('\n')})
+            )
+
+    op.drop_table('deployment_log_chunks')
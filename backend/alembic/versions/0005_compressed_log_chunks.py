@@ -0,0 +1,110 @@
+"""compressed log chunks
+
+Record each log chunk's uncompressed size and Adler-32, and how its data is
+stored: as is, or as a raw deflate block (app.core.deflate). Existing chunks
+are filled in, and deflated when that saves space.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 19:02:37.604112
+
+"""
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 1000
+COMPRESS_MIN_BYTES = 1024
+
+chunks = sa.table(
+    'deployment_log_chunks',
+    sa.column('deployment_id', sa.UUID()),
+    sa.column('stream', sa.String()),
+    sa.column('seq', sa.Integer()),
+    sa.column('size', sa.BigInteger()),
+    sa.column('checksum', sa.BigInteger()),
+    sa.column('encoding', sa.String()),
+    sa.column('data', sa.LargeBinary()),
+)
+
+
+def compress_block(data: bytes) -> bytes:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def key(row) -> dict:
+    return {'k_deployment_id': row.deployment_id, 'k_stream': row.stream, 'k_seq': row.seq}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('deployment_log_chunks') as batch_op:
+        batch_op.add_column(sa.Column('size', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('checksum', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('encoding', sa.String(length=16), nullable=True))
+
+    bind = op.get_bind()
+    update = (
+        chunks.update()
+        .where(chunks.c.deployment_id == sa.bindparam('k_deployment_id'),
+               chunks.c.stream == sa.bindparam('k_stream'),
+               chunks.c.seq == sa.bindparam('k_seq'))
+        .values(size=sa.bindparam('size'), checksum=sa.bindparam('checksum'),
+                encoding=sa.bindparam('encoding'), data=sa.bindparam('data'))
+    )
+    rows = bind.execute(
+        sa.select(chunks.c.deployment_id, chunks.c.stream, chunks.c.seq, chunks.c.data)
+        .execution_options(yield_per=BATCH)
+    )
+    for batch in rows.partitions():
+        values = []
+        for row in batch:
+            value = key(row) | {'size': len(row.data), 'checksum': zlib.adler32(row.data),
+                                'encoding': None, 'data': row.data}
+            if len(row.data) >= COMPRESS_MIN_BYTES:
+                block = compress_block(row.data)
+                if len(block) < len(row.data):
+                    value.update(encoding='deflate', data=block)
+            values.append(value)
+        bind.execute(update, values)
+
+    with op.batch_alter_table('deployment_log_chunks') as batch_op:
+        batch_op.alter_column('size', existing_type=sa.BigInteger(), nullable=False)
+        batch_op.alter_column('checksum', existing_type=sa.BigInteger(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    update = (
+        chunks.update()
+        .where(chunks.c.deployment_id == sa.bindparam('k_deployment_id'),
+               chunks.c.stream == sa.bindparam('k_stream'),
+               chunks.c.seq == sa.bindparam('k_seq'))
+        .values(data=sa.bindparam('data'))
+    )
+    rows = bind.execute(
+        sa.select(chunks.c.deployment_id, chunks.c.stream, chunks.c.seq, chunks.c.data)
+        .where(chunks.c.encoding == 'deflate')
+        .execution_options(yield_per=BATCH)
+    )
+    for batch in rows.partitions():
+        bind.execute(update, [
+            key(row) | {'data': zlib.decompressobj(-zlib.MAX_WBITS).decompress(row.data)}
+            for row in batch
+        ])
+
+    with op.batch_alter_table('deployment_log_chunks') as batch_op:
+        batch_op.drop_column('encoding')
+        batch_op.drop_column('checksum')
+        batch_op.drop_column('size')
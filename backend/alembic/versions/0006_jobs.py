@@ -0,0 +1,51 @@
+"""jobs
+
+Durable background jobs: deployments and environment provisioning are
+enqueued in the request's transaction and run by worker processes, instead
+of in the API process's threadpool, where a restart lost them.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 21:12:40.518307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('jobs',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.String(length=64), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('run_after', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('locked_by', sa.String(length=255), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_claimable_run_after', 'jobs', ['run_after'], unique=False,
+                    postgresql_where=sa.text("status IN ('queued', 'running')"),
+                    sqlite_where=sa.text("status IN ('queued', 'running')"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_claimable_run_after', table_name='jobs',
+                  postgresql_where=sa.text("status IN ('queued', 'running')"),
+                  sqlite_where=sa.text("status IN ('queued', 'running')"))
+    op.drop_table('jobs')
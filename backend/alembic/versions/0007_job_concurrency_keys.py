@@ -0,0 +1,37 @@
+"""job concurrency keys
+
+Jobs sharing a concurrency key run one at a time: deployments are keyed by
+environment, so an environment has at most one rollout in progress.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 23:02:11.804519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('jobs', sa.Column('concurrency_key', sa.String(length=255), nullable=True))
+    op.create_index('ix_jobs_concurrency_key', 'jobs', ['concurrency_key'], unique=False,
+                    postgresql_where=sa.text("status IN ('queued', 'running') AND concurrency_key IS NOT NULL"),
+                    sqlite_where=sa.text("status IN ('queued', 'running') AND concurrency_key IS NOT NULL"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_concurrency_key', table_name='jobs',
+                  postgresql_where=sa.text("status IN ('queued', 'running') AND concurrency_key IS NOT NULL"),
+                  sqlite_where=sa.text("status IN ('queued', 'running') AND concurrency_key IS NOT NULL"))
+    op.drop_column('jobs', 'concurrency_key')
@@ -2,26 +2,70 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.db_runner import SessionRunner, get_db_runner, get_read_db_runner
 from app.models.user import User
 from app.schemas.user import UserCreate, UserRead, RegisterResponse
 from app.schemas.auth import VerifyTokenRequest
 from app.services import auth as auth_service
 from app.core.security import generate_random_token
 from app.core.config import settings
+from app.core.rate_limit import client_ip_resolver
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+def cookie_flags() -> dict:
+    """Secure/SameSite for every cookie the API sets, from settings.use_secure_cookies."""
+    secure = settings.use_secure_cookies
+    return {"secure": secure, "samesite": "none" if secure else "lax"}
+
+
+def set_access_token_cookie(response: Response, access_token: str) -> None:
+    response.set_cookie(
+        key="envctl-access",
+        value=access_token,
+        max_age=settings.jwt_access_token_expires_minutes * 60,
+        httponly=True,
+        path="/",
+        **cookie_flags(),
+    )
+
+
+async def get_current_user(
+    request: Request, response: Response, db: SessionRunner = Depends(get_read_db_runner)
+) -> User:
+    return await resolve_current_user(request, response, db)
+
+
+async def get_current_user_for_stream(
+    request: Request, response: Response, db: SessionRunner = Depends(get_read_db_runner, scope="function")
+) -> User:
+    """get_current_user for streaming responses: its DB session is closed before the stream starts."""
+    return await resolve_current_user(request, response, db)
+
+
+async def resolve_current_user(request: Request, response: Response, db: SessionRunner) -> User:
+    if settings.session_mode == "token":
+        # Signed access token: resolved in CPU, no DB session is ever used
+        user = auth_service.get_user_from_access_token(request.cookies.get("envctl-access"))
+        if user:
+            return user
+
     session_id = request.cookies.get("envctl-session")
     if not session_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
 
-    user = auth_service.get_current_user_from_session_id(db, session_id)
+    if settings.session_mode == "token":
+        # Missing or expired access token: refresh it from the session
+        refreshed = await db.run(auth_service.refresh_access_token, session_id)
+        if not refreshed:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
+        user, access_token = refreshed
+        set_access_token_cookie(response, access_token)
+        return user
+
+    user = await db.run(auth_service.get_current_user_from_session_id, session_id)
 
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
@@ -30,8 +74,8 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
 
 
 @router.post("/register", response_model=RegisterResponse, status_code=status.HTTP_202_ACCEPTED)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
-    verification_url = auth_service.register_user(db, user_in)
+async def register(user_in: UserCreate, db: SessionRunner = Depends(get_db_runner, scope="function")):
+    verification_url = await auth_service.register_user(db, user_in)
     
     detail = "If the account exists and requires verification, verification instructions have been prepared."
 
@@ -48,8 +92,8 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/verify-email")
-def verify_email(req: VerifyTokenRequest, db: Session = Depends(get_db)):
-    success = auth_service.verify_email_token(db, req.token)
+async def verify_email(req: VerifyTokenRequest, db: SessionRunner = Depends(get_db_runner, scope="function")):
+    success = await db.run(auth_service.verify_email_token, req.token)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -59,8 +103,11 @@ def verify_email(req: VerifyTokenRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/login")
-def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user, session_id, verification_url = auth_service.authenticate_user(db, form_data.username, form_data.password)
+async def login(request: Request, response: Response, form_data: OAuth2PasswordRequestForm = Depends(), db: SessionRunner = Depends(get_db_runner, scope="function")):
+    client_ip = client_ip_resolver.for_request(request)
+    user, session_id, verification_url = await auth_service.authenticate_user(
+        db, form_data.username, form_data.password, client_ip
+    )
     
     if verification_url:
         # Password was correct but email not verified
@@ -85,16 +132,12 @@ def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends(),
             detail="Invalid email or password.",
         )
 
-    use_secure_cookies = settings.app_env != "local"
-    samesite_policy = "none" if use_secure_cookies else "lax"
-
     response.set_cookie(
         key="envctl-session",
         value=session_id,
         httponly=True,
-        secure=True,         
-        samesite="none",   
         path="/",
+        **cookie_flags(),
     )
 
     csrf_token = generate_random_token()
@@ -102,22 +145,38 @@ def login(response: Response, form_data: OAuth2PasswordRequestForm = Depends(),
         key="XSRF-TOKEN",
         value=csrf_token,
         httponly=False,
-        secure=True,
-        samesite="none",
         path="/",
+        **cookie_flags(),
     )
 
+    if settings.session_mode == "token":
+        refreshed = await db.run(auth_service.refresh_access_token, session_id)
+        if refreshed:
+            set_access_token_cookie(response, refreshed[1])
+
     return {"detail": "Successfully logged in"}
 
 
+@router.post("/refresh")
+async def refresh(request: Request, response: Response, db: SessionRunner = Depends(get_read_db_runner)):
+    session_id = request.cookies.get("envctl-session")
+    refreshed = await db.run(auth_service.refresh_access_token, session_id) if session_id else None
+    if not refreshed:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
+
+    set_access_token_cookie(response, refreshed[1])
+    return {"detail": "Access token refreshed"}
+
+
 @router.post("/logout")
-def logout(request: Request, response: Response, db: Session = Depends(get_db)):
+async def logout(request: Request, response: Response, db: SessionRunner = Depends(get_db_runner, scope="function")):
     session_id = request.cookies.get("envctl-session")
     if session_id:
-        auth_service.revoke_session(db, session_id)
+        await db.run(auth_service.revoke_session, session_id)
 
-    response.delete_cookie(key="envctl-session", path="/")
-    response.delete_cookie(key="XSRF-TOKEN", path="/")
+    # Same attributes as when set, or browsers keep SameSite=None cookies
+    for key in ("envctl-session", "envctl-access", "XSRF-TOKEN"):
+        response.delete_cookie(key=key, path="/", **cookie_flags())
     return {"detail": "Successfully logged out"}
 
 
@@ -1,12 +1,18 @@
+from typing import Literal, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, Query, Response, status
+from fastapi.responses import StreamingResponse
 
-from app.core.database import get_db
-from app.api.v1.auth import get_current_user
+from app.core.byte_ranges import LOG_OFFSET_HEADER, NEXT_OFFSET_HEADER
+from app.core.config import settings
+from app.core.db_runner import SessionRunner, get_db_runner, get_polling_db_runner, get_read_db_runner
+from app.core.deflate import accepts_deflate
+from app.core.pagination import set_next_cursor
+from app.api.v1.auth import get_current_user, get_current_user_for_stream
 from app.models.user import User
-from app.schemas.deployment import DeploymentCreate, DeploymentRead
+from app.schemas.deployment import DeploymentCreate, DeploymentLogsRead, DeploymentRead
+from app.services import deployment_logs as deployment_logs_service
 from app.services import deployments as deployments_service
 import logging
 
@@ -16,33 +22,144 @@ router = APIRouter(prefix="/deployments", tags=["deployments"])
 
 
 @router.post("/environments/{env_id}", response_model=DeploymentRead, status_code=status.HTTP_201_CREATED)
-def create_deployment_for_environment(env_id: UUID, dep_in: DeploymentCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return deployments_service.create_deployment(db, background_tasks, env_id, dep_in, current_user.id)
+async def create_deployment_for_environment(env_id: UUID, dep_in: DeploymentCreate, db: SessionRunner = Depends(get_db_runner, scope="function"), current_user: User = Depends(get_current_user)):
+    return await db.run(deployments_service.create_deployment, env_id, dep_in, current_user.id)
 
 
 @router.get("/environments/{env_id}", response_model=list[DeploymentRead])
-def list_deployments_for_environment(env_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return deployments_service.list_deployments(db, env_id, current_user.id)
+async def list_deployments_for_environment(
+    env_id: UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    db: SessionRunner = Depends(get_read_db_runner),
+    current_user: User = Depends(get_current_user),
+):
+    page = await db.run(deployments_service.list_deployments, env_id, current_user.id, cursor, limit)
+    set_next_cursor(response, page)
+    return page.items
 
 
 @router.get("/{deployment_id}", response_model=DeploymentRead)
-def get_deployment(
+async def get_deployment(
     deployment_id: UUID,
-    db: Session = Depends(get_db),
+    db: SessionRunner = Depends(get_read_db_runner),
     current_user: User = Depends(get_current_user),
 ):
-    return deployments_service.get_deployment_by_id(db, deployment_id, current_user.id)
+    return await db.run(deployments_service.get_deployment_by_id, deployment_id, current_user.id)
 
-@router.get("/{deployment_id}/logs")
-def get_deployment_logs(deployment_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/{deployment_id}/logs", response_model=DeploymentLogsRead)
+async def get_deployment_logs(
+    deployment_id: UUID,
+    deploy_since_offset: int = Query(0, ge=0),
+    app_since_offset: int = Query(0, ge=0),
+    tail: Optional[int] = Query(None, ge=0),
+    max_bytes: Optional[int] = Query(None, ge=1),
+    db: SessionRunner = Depends(get_read_db_runner),
+    current_user: User = Depends(get_current_user),
+):
     logger.info(f"Fetching logs for deployment {deployment_id} (user {current_user.id})")
     try:
-        dep = deployments_service.get_deployment_by_id(db, deployment_id, current_user.id)
-        logger.info(f"Found deployment {deployment_id}, logs length: {len(dep.logs) if dep.logs else 0}, app_logs length: {len(dep.app_logs) if dep.app_logs else 0}")
-        return {
-            "deployment_logs": dep.logs or "No logs available for this deployment.",
-            "app_logs": dep.app_logs or "No app logs available yet..."
-        }
+        logs = await db.run(
+            deployments_service.get_deployment_logs,
+            deployment_id,
+            current_user.id,
+            deploy_since_offset,
+            app_since_offset,
+            tail,
+            max_bytes,
+        )
+        logger.info(f"Found deployment {deployment_id}, logs length: {len(logs.deployment_logs)}, app_logs length: {len(logs.app_logs)}")
+        return logs
     except Exception as e:
         logger.error(f"Error fetching logs for deployment {deployment_id}: {e}")
         raise
+
+
+@router.get("/{deployment_id}/logs/events", response_class=StreamingResponse)
+async def stream_deployment_logs(
+    deployment_id: UUID,
+    response: Response,
+    deploy_offset: int = Query(0, ge=0),
+    app_offset: int = Query(0, ge=0),
+    last_event_id: Optional[str] = Header(None),
+    db: SessionRunner = Depends(get_read_db_runner, scope="function"),
+    polling_db: SessionRunner = Depends(get_polling_db_runner),
+    current_user: User = Depends(get_current_user_for_stream),
+):
+    """
+    The deployment's logs as Server-Sent Events, from the given byte offsets (or
+    the Last-Event-ID of a reconnecting EventSource) on; see
+    deployment_logs_service.stream_log_events. Sessions of this request close
+    before the stream starts.
+    """
+    await db.run(deployments_service.get_deployment_by_id, deployment_id, current_user.id)
+    if last_event_id:
+        offsets = deployment_logs_service.parse_event_id(last_event_id)
+    else:
+        offsets = {deployment_logs_service.DEPLOY_STREAM: deploy_offset, deployment_logs_service.APP_STREAM: app_offset}
+
+    events = StreamingResponse(
+        deployment_logs_service.stream_log_events(
+            polling_db,
+            deployment_id,
+            offsets,
+            settings.log_tail_poll_seconds,
+            settings.log_tail_heartbeat_seconds,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Cookies set while authenticating (a refreshed access token)
+    events.raw_headers.extend(response.raw_headers)
+    return events
+
+
+@router.get("/{deployment_id}/logs/{stream}", response_class=Response)
+async def get_deployment_log_stream(
+    deployment_id: UUID,
+    stream: Literal["deploy", "app"],
+    since_offset: int = Query(0, ge=0),
+    tail: Optional[int] = Query(None, ge=0),
+    max_bytes: Optional[int] = Query(None, ge=1),
+    accept_encoding: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    db: SessionRunner = Depends(get_read_db_runner),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    One log stream as plain text, or the part of it selected by since_offset,
+    tail and max_bytes (whole lines), or by a Range header (exact bytes, 206).
+    X-Log-Offset and X-Next-Offset give the byte offsets of what was sent.
+
+    Clients that accept `deflate` get the stored compressed chunks as they
+    are, in one deflate stream; the others get it decompressed. Range
+    responses are not compressed: their offsets count uncompressed bytes.
+    """
+    window = await db.run(
+        deployment_logs_service.read_log_window_for_user,
+        deployment_id,
+        current_user.id,
+        stream,
+        since_offset,
+        tail,
+        max_bytes,
+        range_header,
+    )
+    headers = {
+        "Vary": "Accept-Encoding",
+        "Accept-Ranges": "bytes",
+        LOG_OFFSET_HEADER: str(window.start),
+        NEXT_OFFSET_HEADER: str(window.end),
+    }
+    if window.ranged:
+        headers["Content-Range"] = f"bytes {window.start}-{window.end - 1}/{window.size}"
+        body = deployment_logs_service.log_as_text(window)
+        return Response(body, status.HTTP_206_PARTIAL_CONTENT, headers, media_type="text/plain; charset=utf-8")
+
+    if accepts_deflate(accept_encoding):
+        body = deployment_logs_service.log_as_deflate(window)
+        headers["Content-Encoding"] = "deflate"
+    else:
+        body = deployment_logs_service.log_as_text(window)
+    return Response(body, media_type="text/plain; charset=utf-8", headers=headers)
@@ -1,9 +1,11 @@
+from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Response, status
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.db_runner import SessionRunner, get_db_runner, get_read_db_runner
+from app.core.pagination import set_next_cursor
 from app.api.v1.auth import get_current_user
 from app.models.user import User
 from app.schemas.environment import EnvironmentCreate, EnvironmentRead
@@ -17,44 +19,51 @@ router = APIRouter(prefix="/environments", tags=["environments"])
     response_model=EnvironmentRead,
     status_code=status.HTTP_201_CREATED,
 )
-def create_environment_for_project(
+async def create_environment_for_project(
     project_id: UUID,
     env_in: EnvironmentCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: SessionRunner = Depends(get_db_runner, scope="function"),
     current_user: User = Depends(get_current_user),
 ):
-    return environments_service.create_environment_for_project(
-        db, project_id, env_in, current_user.id, background_tasks
+    return await db.run(
+        environments_service.create_environment_for_project,
+        project_id,
+        env_in,
+        current_user.id,
     )
 
 
 @router.get("/projects/{project_id}", response_model=list[EnvironmentRead])
-def list_environments_for_project(
+async def list_environments_for_project(
     project_id: UUID,
-    db: Session = Depends(get_db),
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    db: SessionRunner = Depends(get_read_db_runner),
     current_user: User = Depends(get_current_user),
 ):
-    return environments_service.get_environments_for_project(
-        db, project_id, current_user.id
+    page = await db.run(
+        environments_service.get_environments_for_project, project_id, current_user.id, cursor, limit
     )
+    set_next_cursor(response, page)
+    return page.items
 
 
 @router.get("/{env_id}", response_model=EnvironmentRead)
-def get_environment(
+async def get_environment(
     env_id: UUID,
-    db: Session = Depends(get_db),
+    db: SessionRunner = Depends(get_read_db_runner),
     current_user: User = Depends(get_current_user),
 ):
-    return environments_service.get_environment_by_id_for_user(
-        db, env_id, current_user.id
+    return await db.run(
+        environments_service.get_environment_by_id_for_user, env_id, current_user.id
     )
 
 
 @router.delete("/{env_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_environment(
+async def delete_environment(
     env_id: UUID,
-    db: Session = Depends(get_db),
+    db: SessionRunner = Depends(get_db_runner, scope="function"),
     current_user: User = Depends(get_current_user),
 ):
-    environments_service.delete_environment_for_user(db, env_id, current_user.id)
+    await db.run(environments_service.delete_environment_for_user, env_id, current_user.id)
@@ -1,8 +1,10 @@
+from typing import Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Response, status
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.db_runner import SessionRunner, get_db_runner, get_read_db_runner
+from app.core.pagination import set_next_cursor
 from app.api.v1.auth import get_current_user
 from app.schemas.project import ProjectCreate, ProjectRead
 from app.models.user import User
@@ -12,39 +14,44 @@ router = APIRouter(prefix="/projects", tags=["projects"])
 
 
 @router.get("", response_model=list[ProjectRead])
-def list_projects(
-    db: Session = Depends(get_db),
+async def list_projects(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    db: SessionRunner = Depends(get_read_db_runner),
     current_user: User = Depends(get_current_user),
 ):
-    return projects_service.get_projects_for_user(db, current_user.id)
+    page = await db.run(projects_service.get_projects_for_user, current_user.id, cursor, limit)
+    set_next_cursor(response, page)
+    return page.items
 
 
 @router.post("", response_model=ProjectRead, status_code=status.HTTP_201_CREATED)
-def create_project(
+async def create_project(
     project_in: ProjectCreate,
-    db: Session = Depends(get_db),
+    db: SessionRunner = Depends(get_db_runner, scope="function"),
     current_user: User = Depends(get_current_user),
 ):
     import logging
 
     logger = logging.getLogger("envctl")
     logger.info(f"Creating project for user {current_user.id}: {project_in}")
-    return projects_service.create_project_for_user(db, project_in, current_user.id)
+    return await db.run(projects_service.create_project_for_user, project_in, current_user.id)
 
 
 @router.get("/{project_id}", response_model=ProjectRead)
-def get_project(
+async def get_project(
     project_id: UUID,
-    db: Session = Depends(get_db),
+    db: SessionRunner = Depends(get_read_db_runner),
     current_user: User = Depends(get_current_user),
 ):
-    return projects_service.get_project_by_id_for_user(db, project_id, current_user.id)
+    return await db.run(projects_service.get_project_by_id_for_user, project_id, current_user.id)
 
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_project(
+async def delete_project(
     project_id: UUID,
-    db: Session = Depends(get_db),
+    db: SessionRunner = Depends(get_db_runner, scope="function"),
     current_user: User = Depends(get_current_user),
 ):
-    projects_service.delete_project_for_user(db, project_id, current_user.id)
+    await db.run(projects_service.delete_project_for_user, project_id, current_user.id)
@@ -0,0 +1,120 @@
+# app/cli.py
+"""
+Operational commands.
+
+    python -m app.cli migrate
+    python -m app.cli reap-sessions
+    python -m app.cli worker --concurrency 100
+    python -m app.cli requeue-jobs
+    python -m app.cli calibrate-argon2 --target-ms 250
+"""
+import argparse
+import logging
+import asyncio
+import signal
+
+
+def migrate(args: argparse.Namespace) -> None:
+    from app.core.database import engine
+    from app.core.migrations import run_migrations
+
+    run_migrations(engine, args.revision)
+
+
+def reap_sessions(args: argparse.Namespace) -> None:
+    from app.services.session_reaper import session_reaper
+
+    if args.batch_size:
+        session_reaper.batch_size = args.batch_size
+    if args.max_batches:
+        session_reaper.max_batches = args.max_batches
+    session_reaper.run_once()
+
+
+def worker(args: argparse.Namespace) -> None:
+    from app.services.job_worker import job_worker
+
+    if args.concurrency:
+        job_worker.concurrency = args.concurrency
+    if args.once:
+        asyncio.run(job_worker.run_once())
+        return
+
+    async def run() -> None:
+        # SIGTERM (pod shutdown) stops claiming; running jobs get JOB_SHUTDOWN_GRACE_SECONDS to finish
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+        await job_worker.run(stop)
+
+    asyncio.run(run())
+
+
+def requeue_jobs(args: argparse.Namespace) -> None:
+    from datetime import datetime, timezone
+
+    from app.core.database import SessionLocal
+    import app.repositories.jobs as jobs_repo
+
+    with SessionLocal() as db:
+        requeued = jobs_repo.requeue_dead_jobs(db, datetime.now(timezone.utc), args.kind)
+        db.commit()
+    print(f"Requeued {requeued} dead jobs.")
+
+
+def calibrate_argon2(args: argparse.Namespace) -> None:
+    from app.core.config import settings
+    from app.core.security import calibrate_argon2 as run_calibration
+
+    result = run_calibration(
+        target_ms=args.target_ms,
+        memory_cost=args.memory_cost or settings.argon2_memory_cost,
+        parallelism=args.parallelism or settings.argon2_parallelism,
+    )
+    print(f"# median verify: {result['verify_ms']} ms (target {args.target_ms} ms)")
+    print(f"ARGON2_TIME_COST={result['time_cost']}")
+    print(f"ARGON2_MEMORY_COST={result['memory_cost']}")
+    print(f"ARGON2_PARALLELISM={result['parallelism']}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser(
+        "migrate", help="Apply schema migrations (pre-deploy step; safe to run from several replicas)"
+    )
+    migrate_parser.add_argument("--revision", default="head", help="Target revision")
+    migrate_parser.set_defaults(handler=migrate)
+
+    reap = commands.add_parser("reap-sessions", help="Delete expired and revoked sessions in batches")
+    reap.add_argument("--batch-size", type=int, help="Rows per delete batch")
+    reap.add_argument("--max-batches", type=int, help="Upper bound on batches for this run")
+    reap.set_defaults(handler=reap_sessions)
+
+    run_worker = commands.add_parser("worker", help="Run queued background jobs (deployments, provisioning)")
+    run_worker.add_argument("--concurrency", type=int, help="Jobs run at a time (default JOB_WORKER_CONCURRENCY)")
+    run_worker.add_argument("--once", action="store_true", help="Run one batch of due jobs, then exit")
+    run_worker.set_defaults(handler=worker)
+
+    requeue = commands.add_parser("requeue-jobs", help="Retry dead-lettered jobs with a fresh set of attempts")
+    requeue.add_argument("--kind", help="Only jobs of this kind, e.g. run_deployment")
+    requeue.set_defaults(handler=requeue_jobs)
+
+    calibrate = commands.add_parser(
+        "calibrate-argon2", help="Pick argon2 parameters that hit a target verify latency on this host"
+    )
+    calibrate.add_argument("--target-ms", type=float, default=250.0, help="Target median verify time")
+    calibrate.add_argument("--memory-cost", type=int, help="Starting memory cost in KiB")
+    calibrate.add_argument("--parallelism", type=int, help="Argon2 lanes (match the pod's CPU limit)")
+    calibrate.set_defaults(handler=calibrate_argon2)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
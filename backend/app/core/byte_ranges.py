@@ -0,0 +1,45 @@
+# app/core/byte_ranges.py
+"""
+Partial reads of byte streams: HTTP `Range: bytes=` requests and the headers
+that tell a client where the bytes it got sit in the whole stream.
+"""
+from typing import Optional
+
+from app.core.exceptions import RangeNotSatisfiableException
+
+# Byte offset of the first byte sent, and the offset to ask for next
+LOG_OFFSET_HEADER = "X-Log-Offset"
+NEXT_OFFSET_HEADER = "X-Next-Offset"
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    The bytes [start, end) that a Range header asks for, out of `size`. None
+    when the whole stream should be sent instead: no header, another unit,
+    several ranges, or a malformed one (RFC 9110 lets a server ignore those).
+    Raises RangeNotSatisfiableException for a range that starts past the end.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            # "-N": the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiableException(size)
+            return max(size - length, 0), size
+        start = int(first)
+        end = int(last) + 1 if last else max(size, start + 1)
+    except ValueError:
+        return None
+    if start < 0 or end <= start:
+        return None  # "a-b" with b < a is invalid, not unsatisfiable
+    if start >= size:
+        raise RangeNotSatisfiableException(size)
+    return start, min(end, size)
@@ -7,9 +7,75 @@ class Settings(BaseModel):
         "DATABASE_URL",
         "sqlite:///./envctl.db",  # fallback for local non-docker dev
     )
+    # Request handlers use an async engine (asyncpg / aiosqlite) derived from DATABASE_URL.
+    # Set to false to run them on the sync engine through the threadpool instead.
+    database_async: bool = os.getenv("DATABASE_ASYNC", "true").lower() == "true"
+    # Schema migrations normally run as a pre-deploy step (python -m app.cli migrate) and
+    # startup only checks the schema version. Local development migrates on startup instead.
+    db_migrate_on_startup: bool = (
+        os.getenv("DB_MIGRATE_ON_STARTUP", "true" if os.getenv("APP_ENV", "local") == "local" else "false").lower()
+        == "true"
+    )
+    # Read replicas: comma-separated URLs of the same database family as DATABASE_URL.
+    # GET handlers and session lookups read from them round-robin; a replica whose connection
+    # fails is skipped for REPLICA_RETRY_SECONDS. After a write, the same client reads from
+    # the primary for READ_YOUR_WRITES_SECONDS (set above the replicas' expected lag).
+    database_replica_urls: list[str] = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    replica_retry_seconds: float = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+    read_your_writes_seconds: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+    # Connection pool (QueuePool; ignored for in-memory SQLite, which uses a single shared connection).
+    # Sized per engine: the sync and the async engine each get their own pool.
+    # DB_POOL_PRE_PING defaults to on for Postgres and off for SQLite.
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout_seconds: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    db_pool_recycle_seconds: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    db_pool_pre_ping: bool | None = (
+        os.getenv("DB_POOL_PRE_PING").lower() == "true" if os.getenv("DB_POOL_PRE_PING") else None
+    )
+    # Development query-plan advisor: EXPLAINs the queries each endpoint runs and warns about
+    # sequential scans of tables with at least QUERY_PLAN_SCAN_MIN_ROWS rows. Ignored in production.
+    query_plan_advisor: bool = os.getenv("QUERY_PLAN_ADVISOR", "false").lower() == "true"
+    query_plan_scan_min_rows: int = int(os.getenv("QUERY_PLAN_SCAN_MIN_ROWS", "1000"))
+    # List endpoints return pages of PAGE_SIZE_DEFAULT rows unless the client passes ?limit=
+    # (at most PAGE_SIZE_MAX); the next page's cursor is in the X-Next-Cursor response header.
+    page_size_default: int = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+    page_size_max: int = int(os.getenv("PAGE_SIZE_MAX", "500"))
+    # Deployment log tails (SSE): a tail wakes as soon as a runner commits new lines (on Postgres
+    # via LISTEN/NOTIFY, from any process), and re-reads every LOG_TAIL_POLL_SECONDS in case a
+    # notification was missed (e.g. while the listener reconnects).
+    # Idle tails get a heartbeat comment every LOG_TAIL_HEARTBEAT_SECONDS so proxies keep them open.
+    log_tail_poll_seconds: float = float(os.getenv("LOG_TAIL_POLL_SECONDS", "2"))
+    log_tail_heartbeat_seconds: float = float(os.getenv("LOG_TAIL_HEARTBEAT_SECONDS", "15"))
+    # Background jobs (deployments, provisioning) are queued in the jobs table and run by
+    # `python -m app.cli worker`, up to JOB_WORKER_CONCURRENCY at a time per worker (jobs are
+    # coroutines that hold no thread or connection while they wait). A claimed job is leased for
+    # JOB_VISIBILITY_TIMEOUT_SECONDS (renewed while it runs); if its worker dies, another
+    # one takes it over once the lease expires. A failed job is retried after JOB_RETRY_BASE_SECONDS,
+    # doubling up to JOB_RETRY_MAX_SECONDS, and is dead-lettered after JOB_MAX_ATTEMPTS attempts.
+    # On shutdown a worker gives running jobs JOB_SHUTDOWN_GRACE_SECONDS to finish, then cancels
+    # them and puts them back in the queue.
+    # Local development runs a worker inside the API process instead (JOBS_IN_PROCESS).
+    job_worker_concurrency: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "100"))
+    job_poll_seconds: float = float(os.getenv("JOB_POLL_SECONDS", "1"))
+    job_visibility_timeout_seconds: float = float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "60"))
+    job_max_attempts: int = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    job_retry_base_seconds: float = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+    job_retry_max_seconds: float = float(os.getenv("JOB_RETRY_MAX_SECONDS", "300"))
+    job_shutdown_grace_seconds: float = float(os.getenv("JOB_SHUTDOWN_GRACE_SECONDS", "30"))
+    # An environment runs one rollout at a time; deployments queued behind it are coalesced, and
+    # only the newest one runs (the others become "superseded"). ROLLOUT_MAX_CONCURRENT caps the
+    # rollouts in progress across all workers (0: no cap).
+    rollout_max_concurrent: int = int(os.getenv("ROLLOUT_MAX_CONCURRENT", "50"))
+    jobs_in_process: bool = (
+        os.getenv("JOBS_IN_PROCESS", "true" if os.getenv("APP_ENV", "local") == "local" else "false").lower()
+        == "true"
+    )
     jwt_secret_key: str = os.getenv("JWT_SECRET_KEY", "change-me-in-prod")
     jwt_algorithm: str = "HS256"
-    jwt_access_token_expires_minutes: int = 60
+    jwt_access_token_expires_minutes: int = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES_MINUTES", "5"))
     frontend_url: str = os.getenv("FRONTEND_URL", "http://localhost:4200")
     app_env: str = os.getenv("APP_ENV", "local")  # local | staging | production
 
@@ -17,6 +83,12 @@ class Settings(BaseModel):
     def is_development(self) -> bool:
         return self.app_env != "production"
 
+    # Cookies are Secure and SameSite=None (the frontend may live on another site) except locally,
+    # where plain-http development needs them non-Secure, and so SameSite=Lax
+    @property
+    def use_secure_cookies(self) -> bool:
+        return self.app_env != "local"
+
     # Email Configuration
     # EMAIL_MODE can be: "mock_terminal" (logs to stdout), "mock_api" (returns link in API response), or "real" (sends actual email)
     # Default to "mock_api" if running in Cloud Run (detected via K_SERVICE) and no mode is set.
@@ -33,5 +105,62 @@ class Settings(BaseModel):
     smtp_password: str = os.getenv("SMTP_PASSWORD", "")  # Note: smtp_password was using SMTP_USER env var? Likely a bug in previous edit, fixing to SMTP_PASSWORD
     smtp_from: str = os.getenv("SMTP_FROM", "noreply@envctl.com")
 
+    # Argon2 parameters (tune per host with `python -m app.cli calibrate-argon2`).
+    # Hashes made with other parameters are transparently rehashed on the next successful login.
+    argon2_time_cost: int = int(os.getenv("ARGON2_TIME_COST", "3"))
+    argon2_memory_cost: int = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+    argon2_parallelism: int = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+    # Password hashing executor
+    # "thread" relies on argon2-cffi releasing the GIL; "process" isolates hashing in worker processes.
+    # PASSWORD_HASH_WORKERS=0 hashes on the shared request threadpool (pre-pool behaviour).
+    password_hash_executor: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread | process
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    password_hash_max_pending: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+    # Login lockout policy
+    # Failed attempts are counted in LOGIN_ATTEMPT_STORE ("memory" per process, or "redis" shared
+    # across workers). Only a triggered lockout is written to the DB.
+    login_attempt_store: str = os.getenv("LOGIN_ATTEMPT_STORE", "memory")  # memory | redis
+    login_attempt_redis_url: str = os.getenv("LOGIN_ATTEMPT_REDIS_URL", "redis://localhost:6379/0")
+    login_max_failed_attempts: int = int(os.getenv("LOGIN_MAX_FAILED_ATTEMPTS", "5"))
+    login_failure_window_seconds: int = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", "900"))
+    login_lockout_minutes: int = int(os.getenv("LOGIN_LOCKOUT_MINUTES", "15"))
+
+    # Login admission (token buckets checked before any password hashing)
+    login_ip_rate_per_minute: float = float(os.getenv("LOGIN_IP_RATE_PER_MINUTE", "10"))
+    login_ip_burst: int = int(os.getenv("LOGIN_IP_BURST", "20"))
+    login_account_rate_per_minute: float = float(os.getenv("LOGIN_ACCOUNT_RATE_PER_MINUTE", "5"))
+    login_account_burst: int = int(os.getenv("LOGIN_ACCOUNT_BURST", "10"))
+    # Proxies (IPs or CIDRs) whose X-Forwarded-For is believed when keying the IP bucket.
+    # Empty: the peer address is the client, and forwarded headers are ignored.
+    trusted_proxies: list[str] = [
+        proxy.strip() for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip()
+    ]
+
+    # Session mode
+    # "database": every request resolves the envctl-session cookie against the sessions table.
+    # "token": requests carry a short-lived signed access token (envctl-access cookie) checked in CPU;
+    # the session cookie acts as the refresh token. Revocations reach other workers via periodic sync.
+    session_mode: str = os.getenv("SESSION_MODE", "database")  # database | token
+    revocation_sync_interval_seconds: int = int(os.getenv("REVOCATION_SYNC_INTERVAL_SECONDS", "10"))
+
+    # Session reaper (deletes expired/revoked sessions in bounded batches; interval 0 disables it in-process)
+    session_reaper_interval_seconds: int = int(os.getenv("SESSION_REAPER_INTERVAL_SECONDS", "3600"))
+    session_reaper_batch_size: int = int(os.getenv("SESSION_REAPER_BATCH_SIZE", "1000"))
+    session_reaper_max_batches: int = int(os.getenv("SESSION_REAPER_MAX_BATCHES", "100"))
+    session_reaper_pause_seconds: float = float(os.getenv("SESSION_REAPER_PAUSE_SECONDS", "0.1"))
+
+    # Session Cache (per-process; revocations in other workers surface after the TTL)
+    session_cache_ttl_seconds: int = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "30"))
+    session_cache_max_entries: int = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+    # Unknown, revoked or expired session ids, kept apart so junk cookies can't evict live sessions
+    session_negative_cache_max_entries: int = int(os.getenv("SESSION_NEGATIVE_CACHE_MAX_ENTRIES", "1000"))
+
+    # Session last_seen_at write-behind buffer
+    last_seen_flush_interval_seconds: int = int(os.getenv("LAST_SEEN_FLUSH_INTERVAL_SECONDS", "10"))
+    last_seen_flush_max_entries: int = int(os.getenv("LAST_SEEN_FLUSH_MAX_ENTRIES", "500"))
+    last_seen_min_delta_seconds: int = int(os.getenv("LAST_SEEN_MIN_DELTA_SECONDS", "60"))
+
 
 settings = Settings()
@@ -1,17 +1,186 @@
 # app/core/database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
 from app.core.config import settings
+from app.core.metrics import Histogram, register_collector
+from app.core.replicas import ReplicaSet
 
 
 class Base(DeclarativeBase):
-    pass
+    # Server-generated columns (created_at, updated_at) come back in the INSERT/UPDATE
+    # via RETURNING, so a flushed object never needs a refresh query
+    __mapper_args__ = {"eager_defaults": True}
 
 
-engine = create_engine(
-    settings.database_url,
-    echo=False,
-)
+def utcnow() -> datetime:
+    """
+    Python-side default for the created_at columns that order list pages. SQLite's
+    CURRENT_TIMESTAMP has whole-second precision and a different text format than
+    bound datetimes, so a server default would break ties and keyset cursors.
+    """
+    return datetime.now(timezone.utc)
+
+
+# Unit of work: repositories only flush. A request's writes are committed once, by
+# get_db_runner, when the handler returns; background jobs commit their own steps.
+def after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """Run `callback` once the current transaction commits; dropped on rollback."""
+    db.info.setdefault("after_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(db: Session) -> None:
+    for callback in db.info.pop("after_commit", []):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit_callbacks(db: Session) -> None:
+    db.info.pop("after_commit", None)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkout_wait_ms = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000])
+        self.timeouts = 0
+
+
+class CheckoutTimingMixin:
+    """Pool mixin that records how long each checkout waits for a connection."""
+
+    metrics: PoolMetrics
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.checkout_wait_ms.observe((time.perf_counter() - started) * 1000)
+
+
+def instrumented_pool_class(
+    metrics: PoolMetrics, base: type[QueuePool] = QueuePool
+) -> type[QueuePool]:
+    # A subclass per engine keeps metrics attached across pool.recreate()
+    return type(f"Instrumented{base.__name__}", (CheckoutTimingMixin, base), {"metrics": metrics})
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_database_url(database_url: str) -> URL | None:
+    """
+    The async-driver equivalent of a sync DATABASE_URL, or None when there is
+    none. In-memory SQLite has none: a second engine would see a different,
+    empty database.
+    """
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None or _is_sqlite_memory(url):
+        return None
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+def engine_options(
+    database_url: str | URL, metrics: PoolMetrics, pool_base: type[QueuePool] = QueuePool
+) -> dict[str, Any]:
+    """Per-dialect engine/pool defaults, overridable through the DB_POOL_* settings."""
+    url = make_url(database_url)
+
+    if _is_sqlite_memory(url):
+        # One shared connection, otherwise every checkout would see an empty database
+        return {
+            "poolclass": StaticPool,
+            "connect_args": {"check_same_thread": False},
+        }
+
+    options: dict[str, Any] = {
+        "poolclass": instrumented_pool_class(metrics, pool_base),
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": (
+            settings.db_pool_pre_ping
+            if settings.db_pool_pre_ping is not None
+            else url.get_backend_name() == "postgresql"
+        ),
+    }
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def configure_sqlite(engine: Engine) -> None:
+    """WAL lets readers proceed while a writer commits; busy_timeout waits instead of failing."""
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        if not _is_sqlite_memory(engine.url):
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
+def pool_stats(engine: Engine, metrics: PoolMetrics) -> dict[str, Any]:
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": "QueuePool",
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.db_max_overflow,
+        "timeouts": metrics.timeouts,
+        "checkout_wait_ms": metrics.checkout_wait_ms.snapshot(),
+    }
+
+
+def build_engine(database_url: str, name: str) -> Engine:
+    metrics = PoolMetrics()
+    new_engine = create_engine(database_url, echo=False, **engine_options(database_url, metrics))
+    if new_engine.dialect.name == "sqlite":
+        configure_sqlite(new_engine)
+    register_collector(f"db_pool_{name}", lambda: pool_stats(new_engine, metrics))
+    return new_engine
+
+
+def build_async_engine(database_url: str, name: str) -> AsyncEngine | None:
+    url = async_database_url(database_url)
+    if url is None:
+        return None
+
+    metrics = PoolMetrics()
+    new_engine = create_async_engine(
+        url, echo=False, **engine_options(url, metrics, AsyncAdaptedQueuePool)
+    )
+    if new_engine.dialect.name == "sqlite":
+        configure_sqlite(new_engine.sync_engine)
+    register_collector(f"db_pool_{name}", lambda: pool_stats(new_engine.sync_engine, metrics))
+    return new_engine
+
+
+engine = build_engine(settings.database_url, "primary")
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -19,6 +188,41 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
+# Used by request handlers when DATABASE_ASYNC is on. Objects are not expired on
+# commit: once the handler returns, attribute access can no longer await a reload.
+async_engine = (
+    build_async_engine(settings.database_url, "primary_async") if settings.database_async else None
+)
+
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    if async_engine is not None
+    else None
+)
+
+
+def build_replica_set(use_async: bool) -> ReplicaSet:
+    """Replica engines for whichever engine kind serves requests."""
+    engines = []
+    for index, url in enumerate(settings.database_replica_urls):
+        if use_async:
+            replica = build_async_engine(url, f"replica_{index}_async")
+            if replica is None:
+                raise ValueError(f"DATABASE_REPLICA_URLS entry {index} has no async driver")
+        else:
+            replica = build_engine(url, f"replica_{index}")
+        engines.append(replica)
+
+    replicas = ReplicaSet(engines, settings.replica_retry_seconds)
+    for index, replica in enumerate(engines):
+        replicas.watch(index, replica.sync_engine if use_async else replica)
+    return replicas
+
+
+read_replicas = build_replica_set(use_async=async_engine is not None)
+
+register_collector("db_replicas", read_replicas.stats)
+
 
 # Dependency for FastAPI routes
 def get_db():
@@ -0,0 +1,171 @@
+# app/core/db_runner.py
+import logging
+from typing import Any, Callable, Protocol, TypeVar
+
+from fastapi import Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.database import (
+    AsyncSessionLocal,
+    SessionLocal,
+    async_engine,
+    engine,
+    get_db,
+    read_replicas,
+)
+from app.core.replicas import choose_read_engine, pin_reads_to_primary
+
+logger = logging.getLogger("envctl")
+
+T = TypeVar("T")
+
+
+class SessionRunner(Protocol):
+    """
+    Runs a sync unit of DB work, `fn(session, *args, **kwargs)`, from async code.
+
+    Repositories and services are written once against the sync `Session`; the
+    runner decides whether that code waits on the DB through an async driver
+    or through a worker thread.
+    """
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T: ...
+
+
+class AsyncSessionRunner:
+    """
+    Runs the work through `AsyncSession.run_sync`: the code executes on the event
+    loop and every DB round trip is awaited on the async driver, so a request
+    waiting on the DB holds no worker thread.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+
+class ThreadedSessionRunner:
+    """Runs the work on the sync `Session` in the request threadpool."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+
+class FailoverSessionRunner:
+    """
+    Runs read-only work on a replica; if the replica fails, the work is rerun on
+    the primary, and so is the rest of the request. Only for reads: they are safe
+    to repeat.
+    """
+
+    def __init__(self, replica: SessionRunner, primary: SessionRunner):
+        self.replica = replica
+        self.primary = primary
+        self.failed_over = False
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if not self.failed_over:
+            try:
+                return await self.replica.run(fn, *args, **kwargs)
+            except OperationalError as e:
+                logger.warning(f"Replica read failed, retrying on the primary: {e}")
+                self.failed_over = True
+        return await self.primary.run(fn, *args, **kwargs)
+
+
+class AsyncSessionPerRunRunner:
+    """
+    Opens a session for every run() and closes it as soon as the work returns, so
+    nothing is held between runs. For long-lived responses that read now and then.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self.session_factory = session_factory
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        async with self.session_factory() as session:
+            return await session.run_sync(fn, *args, **kwargs)
+
+
+class ThreadedSessionPerRunRunner:
+    """AsyncSessionPerRunRunner on sync sessions: a thread is used only while the work runs."""
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+
+    def _run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self.session_factory() as session:
+            return fn(session, *args, **kwargs)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await run_in_threadpool(self._run, fn, *args, **kwargs)
+
+
+async def get_async_db_runner(response: Response):
+    if read_replicas:
+        pin_reads_to_primary(response)
+    async with AsyncSessionLocal() as session:
+        yield AsyncSessionRunner(session)
+        await session.commit()
+
+
+async def get_async_read_db_runner(request: Request):
+    bind = choose_read_engine(request, read_replicas, async_engine)
+    if bind is async_engine:
+        async with AsyncSessionLocal() as session:
+            yield AsyncSessionRunner(session)
+        return
+
+    async with AsyncSessionLocal(bind=bind) as replica, AsyncSessionLocal() as primary:
+        yield FailoverSessionRunner(AsyncSessionRunner(replica), AsyncSessionRunner(primary))
+
+
+def get_threaded_db_runner(response: Response, db: Session = Depends(get_db)):
+    if read_replicas:
+        pin_reads_to_primary(response)
+    yield ThreadedSessionRunner(db)
+    db.commit()
+
+
+def get_threaded_read_db_runner(request: Request):
+    bind = choose_read_engine(request, read_replicas, engine)
+    if bind is engine:
+        with SessionLocal() as session:
+            yield ThreadedSessionRunner(session)
+        return
+
+    with SessionLocal(bind=bind) as replica, SessionLocal() as primary:
+        yield FailoverSessionRunner(ThreadedSessionRunner(replica), ThreadedSessionRunner(primary))
+
+
+# Dependencies for FastAPI routes: get_db_runner for handlers that write (always the
+# primary), get_read_db_runner for GET handlers and auth lookups (replicas, when configured).
+# get_db_runner is the request's unit of work: it commits once after the handler returns.
+# Declare it with scope="function" so the commit happens before the response is sent and
+# a failed commit becomes an error response; if the handler raises, nothing is committed.
+# Tests override both with get_threaded_db_runner, which follows their get_db override.
+if AsyncSessionLocal is not None:
+    get_db_runner = get_async_db_runner
+    get_read_db_runner = get_async_read_db_runner
+else:
+    get_db_runner = get_threaded_db_runner
+    get_read_db_runner = get_threaded_read_db_runner
+
+
+def get_polling_db_runner() -> SessionRunner:
+    """
+    For streaming responses that keep reading after the handler returns (log tails)
+    and for background jobs: each run gets its own short session on the primary, so
+    an open stream or a running job holds no connection or thread while it waits.
+    """
+    if AsyncSessionLocal is not None:
+        return AsyncSessionPerRunRunner(AsyncSessionLocal)
+    return ThreadedSessionPerRunRunner(SessionLocal)
@@ -0,0 +1,65 @@
+# app/core/deflate.py
+"""
+Deflate blocks that can be stored separately and later served as one stream.
+
+Each piece of data is compressed on its own into raw deflate ending with a
+sync flush (byte-aligned, not final), so stored blocks can be concatenated
+as they are. zlib_stream() wraps a run of them in a zlib header and trailer,
+the format of HTTP `Content-Encoding: deflate`; the trailer's Adler-32 is
+combined from per-block checksums, so nothing is decompressed to serve it.
+"""
+import zlib
+from typing import Iterable, Iterator, Optional
+
+ADLER32_BASE = 65521
+ZLIB_HEADER = b"\x78\x9c"  # deflate, 32K window, default compression
+FINAL_EMPTY_BLOCK = b"\x03\x00"
+
+
+def compress_block(data: bytes, level: int = zlib.Z_DEFAULT_COMPRESSION) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def decompress_block(block: bytes) -> bytes:
+    return zlib.decompressobj(-zlib.MAX_WBITS).decompress(block)
+
+
+def adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    """Adler-32 of A + B from adler32(A), adler32(B) and len(B) (zlib's adler32_combine)."""
+    remainder = length2 % ADLER32_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (remainder * sum1) % ADLER32_BASE
+    sum1 = (sum1 + (adler2 & 0xFFFF) + ADLER32_BASE - 1) % ADLER32_BASE
+    sum2 = (sum2 + (adler1 >> 16) + (adler2 >> 16) + ADLER32_BASE - remainder) % ADLER32_BASE
+    return sum1 | (sum2 << 16)
+
+
+def zlib_stream(blocks: Iterable[tuple[bytes, int, int]]) -> Iterator[bytes]:
+    """A zlib stream from (compress_block output, adler32 of its data, len of its data)."""
+    yield ZLIB_HEADER
+    checksum = 1  # Adler-32 of no data
+    for block, adler, length in blocks:
+        yield block
+        checksum = adler32_combine(checksum, adler, length)
+    yield FINAL_EMPTY_BLOCK + checksum.to_bytes(4, "big")
+
+
+def accepts_deflate(accept_encoding: Optional[str]) -> bool:
+    """
+    Whether an Accept-Encoding header allows `deflate` with q > 0. A `deflate`
+    entry decides on its own; `*` only when deflate is not named (RFC 9110).
+    """
+    weights = {}
+    for coding in (accept_encoding or "").split(","):
+        name, *params = (part.strip().lower() for part in coding.split(";"))
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0  # Unreadable weight: not acceptable
+        weights.setdefault(name, q)
+    q = weights.get("deflate", weights.get("*", 0.0))
+    return q > 0
@@ -19,6 +19,27 @@ class InvalidOperationException(Exception):
         super().__init__(self.detail)
 
 
+class ServiceUnavailableException(Exception):
+    def __init__(self, detail: str = "Service temporarily unavailable", retry_after: int = 1):
+        self.detail = detail
+        self.retry_after = retry_after
+        super().__init__(self.detail)
+
+
+class RateLimitedException(Exception):
+    def __init__(self, detail: str = "Too many requests", retry_after: int = 1):
+        self.detail = detail
+        self.retry_after = retry_after
+        super().__init__(self.detail)
+
+
+class RangeNotSatisfiableException(Exception):
+    def __init__(self, size: int, detail: str = "Requested range not satisfiable"):
+        self.detail = detail
+        self.size = size
+        super().__init__(self.detail)
+
+
 async def resource_not_found_exception_handler(
     request: Request, exc: ResourceNotFoundException
 ):
@@ -37,6 +58,34 @@ async def invalid_operation_exception_handler(
     )
 
 
+async def service_unavailable_exception_handler(
+    request: Request, exc: ServiceUnavailableException
+):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def rate_limited_exception_handler(request: Request, exc: RateLimitedException):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def range_not_satisfiable_exception_handler(
+    request: Request, exc: RangeNotSatisfiableException
+):
+    return JSONResponse(
+        status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        content={"detail": exc.detail},
+        headers={"Content-Range": f"bytes */{exc.size}"},
+    )
+
+
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global exception: {exc}", exc_info=True)
     return JSONResponse(
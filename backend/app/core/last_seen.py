@@ -0,0 +1,154 @@
+# app/core/last_seen.py
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import register_collector
+import app.repositories.sessions as sessions_repo
+
+logger = logging.getLogger("envctl")
+
+
+class LastSeenBuffer:
+    """
+    Write-behind buffer for sessions.last_seen_at.
+
+    Requests record activity in memory; the flusher task (wait_until_due, then
+    flush on a thread) writes all pending timestamps in one bulk UPDATE once
+    `max_entries` sessions are pending or `flush_interval_seconds` have passed.
+    A request never flushes itself. Activity closer than `min_delta_seconds`
+    to the last recorded value for a session is dropped, so a polling client
+    produces at most one write per session per delta.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval_seconds: float,
+        max_entries: int,
+        min_delta_seconds: float,
+        max_tracked: int = 50_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_entries = max_entries
+        self.min_delta = timedelta(seconds=min_delta_seconds)
+        self.max_tracked = max_tracked
+        self._clock = clock
+        self._pending: dict[str, datetime] = {}
+        self._last_recorded: OrderedDict[str, datetime] = OrderedDict()
+        self._last_flush = clock()
+        self._lock = threading.Lock()
+        self._due = False
+        # (loop, event) of the flusher while it waits, so touch() can wake it from any thread
+        self._waiter: tuple[asyncio.AbstractEventLoop, asyncio.Event] | None = None
+        self.skipped = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+
+    def touch(
+        self,
+        session_hash: str,
+        seen_at: datetime,
+        last_known: datetime | None = None,
+    ) -> None:
+        with self._lock:
+            previous = self._last_recorded.get(session_hash) or last_known
+            if previous is not None and seen_at - previous < self.min_delta:
+                self.skipped += 1
+                return
+
+            self._pending[session_hash] = seen_at
+            self._last_recorded[session_hash] = seen_at
+            self._last_recorded.move_to_end(session_hash)
+            while len(self._last_recorded) > self.max_tracked:
+                self._last_recorded.popitem(last=False)
+
+            if self._due or not (
+                len(self._pending) >= self.max_entries
+                or self._clock() - self._last_flush >= self.flush_interval_seconds
+            ):
+                return
+            self._due = True
+            waiter = self._waiter
+
+        if waiter is not None:
+            loop, event = waiter
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The loop is closing; the shutdown flush picks the batch up
+
+    async def wait_until_due(self, timeout: float) -> None:
+        """Return once a flush is due (see touch), or after `timeout` at the latest."""
+        event = asyncio.Event()
+        with self._lock:
+            if self._due:
+                return
+            self._waiter = (asyncio.get_running_loop(), event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiter = None
+
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._last_flush = self._clock()
+            self._due = False
+
+        if not batch:
+            return 0
+
+        db = self.session_factory()
+        try:
+            sessions_repo.bulk_update_last_seen(db, batch)
+        except Exception as e:
+            logger.warning(f"Failed to flush {len(batch)} last_seen_at updates: {e}")
+            db.rollback()
+            with self._lock:
+                self.failed_flushes += 1
+                # Requeue, keeping anything newer recorded since the swap
+                for session_hash, seen_at in batch.items():
+                    self._pending.setdefault(session_hash, seen_at)
+            return 0
+        finally:
+            db.close()
+
+        with self._lock:
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+        return len(batch)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "skipped": self.skipped,
+                "flushes": self.flushes,
+                "flushed_rows": self.flushed_rows,
+                "failed_flushes": self.failed_flushes,
+            }
+
+
+last_seen_buffer = LastSeenBuffer(
+    session_factory=SessionLocal,
+    flush_interval_seconds=settings.last_seen_flush_interval_seconds,
+    max_entries=settings.last_seen_flush_max_entries,
+    min_delta_seconds=settings.last_seen_min_delta_seconds,
+)
+
+register_collector("last_seen", last_seen_buffer.stats)
@@ -0,0 +1,139 @@
+# app/core/login_attempts.py
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Protocol
+
+import redis
+
+from app.core.config import settings
+from app.core.metrics import register_collector
+
+
+class LoginAttemptStore(Protocol):
+    """Sliding-window counter of failed login attempts per key."""
+
+    def record_failure(self, key: str) -> int:
+        """Record a failure and return the number of failures inside the window."""
+        ...
+
+    def failures(self, key: str) -> int:
+        ...
+
+    def reset(self, key: str) -> None:
+        ...
+
+    def stats(self) -> dict[str, int]:
+        ...
+
+
+class InMemoryLoginAttemptStore:
+    """
+    Per-process store. Keys are kept in LRU order and capped at `max_keys`,
+    so a flood of distinct accounts cannot grow memory without bound.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        max_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._clock = clock
+        self._attempts: OrderedDict[str, deque[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> deque[float] | None:
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return None
+        while attempts and attempts[0] <= now - self.window_seconds:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+            return None
+        return attempts
+
+    def record_failure(self, key: str) -> int:
+        now = self._clock()
+        with self._lock:
+            attempts = self._prune(key, now)
+            if attempts is None:
+                attempts = self._attempts[key] = deque()
+            attempts.append(now)
+            self._attempts.move_to_end(key)
+            while len(self._attempts) > self.max_keys:
+                self._attempts.popitem(last=False)
+            return len(attempts)
+
+    def failures(self, key: str) -> int:
+        with self._lock:
+            attempts = self._prune(key, self._clock())
+            return len(attempts) if attempts else 0
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"tracked_keys": len(self._attempts)}
+
+
+class RedisLoginAttemptStore:
+    """
+    Shared store for multi-worker deployments. Works against Redis or any
+    server speaking its protocol (Valkey, KeyDB, Dragonfly). Each key is a
+    sorted set of attempt timestamps.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        window_seconds: float,
+        prefix: str = "envctl:login:",
+        clock: Callable[[], float] = time.time,
+    ):
+        self._client = client
+        self.window_seconds = window_seconds
+        self.prefix = prefix
+        self._clock = clock
+
+    def record_failure(self, key: str) -> int:
+        now = self._clock()
+        redis_key = self.prefix + key
+        pipe = self._client.pipeline(transaction=True)
+        pipe.zremrangebyscore(redis_key, 0, now - self.window_seconds)
+        pipe.zadd(redis_key, {f"{now}:{uuid.uuid4().hex}": now})
+        pipe.zcard(redis_key)
+        pipe.expire(redis_key, int(self.window_seconds) + 1)
+        _, _, count, _ = pipe.execute()
+        return int(count)
+
+    def failures(self, key: str) -> int:
+        now = self._clock()
+        # Exclusive lower bound: an attempt exactly window_seconds old has slid out
+        return int(self._client.zcount(self.prefix + key, f"({now - self.window_seconds}", "+inf"))
+
+    def reset(self, key: str) -> None:
+        self._client.delete(self.prefix + key)
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+
+def create_login_attempt_store() -> LoginAttemptStore:
+    if settings.login_attempt_store == "redis":
+        return RedisLoginAttemptStore(
+            redis.Redis.from_url(settings.login_attempt_redis_url),
+            settings.login_failure_window_seconds,
+        )
+    return InMemoryLoginAttemptStore(settings.login_failure_window_seconds)
+
+
+login_attempts = create_login_attempt_store()
+
+register_collector("login_attempts", lambda: login_attempts.stats())
@@ -0,0 +1,45 @@
+# app/core/metrics.py
+import bisect
+import threading
+from typing import Any, Callable
+
+# Components register a collector that returns a flat dict of current values.
+# GET /metrics returns a snapshot of every registered collector as JSON.
+_collectors: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register_collector(name: str, collector: Callable[[], dict[str, Any]]) -> None:
+    _collectors[name] = collector
+
+
+def unregister_collector(name: str) -> None:
+    _collectors.pop(name, None)
+
+
+def collect() -> dict[str, dict[str, Any]]:
+    return {name: collector() for name, collector in _collectors.items()}
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style); bucket bounds are upper limits."""
+
+    def __init__(self, buckets: list[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[f"le_{bound:g}"] = cumulative
+            buckets["le_inf"] = cumulative + self._counts[-1]
+            return {"count": buckets["le_inf"], "sum": round(self._sum, 3), "buckets": buckets}
@@ -1,69 +1,111 @@
 # app/core/migrations.py
+"""
+Versioned schema migrations (Alembic, see alembic/versions/).
+
+Migrations are applied by an explicit pre-deploy step, `python -m app.cli migrate`,
+never by every replica at boot. Startup only checks that the database is at the
+revision this code expects: a single query.
+"""
 import logging
-from sqlalchemy import text, inspect
-from sqlalchemy.engine import Engine
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
 
 logger = logging.getLogger("envctl")
 
-def ensure_user_columns(engine: Engine):
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# Key of the Postgres advisory lock held while migrating ("envctl" in ASCII)
+MIGRATION_LOCK_KEY = 0x656E7663746C
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def alembic_config(connection: Connection | None = None) -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.attributes["configure_logging"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+@lru_cache
+def head_revision() -> str:
+    """The revision this code expects; read from the migration scripts, not the DB."""
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def current_revision(connection: Connection) -> str | None:
     """
-    Ensures that all required security columns exist in the users table.
-    SQLAlchemy's create_all doesn't add columns to existing tables.
+    Read the stamped revision and end the read's transaction, so the caller
+    can hand the connection to Alembic: it must begin the migration
+    transaction itself, as revisions that build indexes CONCURRENTLY step out
+    of it with autocommit_block().
     """
-    required_columns = {
-        "is_verified": "BOOLEAN DEFAULT FALSE NOT NULL",
-        "verification_token_hash": "VARCHAR(255)",
-        "verification_token_expires_at": "TIMESTAMP WITH TIME ZONE",
-        "password_reset_token_hash": "VARCHAR(255)",
-        "password_reset_token_expires_at": "TIMESTAMP WITH TIME ZONE",
-        "failed_login_attempts": "INTEGER DEFAULT 0 NOT NULL",
-        "last_failed_login_at": "TIMESTAMP WITH TIME ZONE",
-        "lockout_until": "TIMESTAMP WITH TIME ZONE",
-    }
-
     try:
-        inspector = inspect(engine)
-        existing_columns = [col["name"] for col in inspector.get_columns("users")]
-        
-        with engine.connect() as conn:
-            for column_name, column_type in required_columns.items():
-                if column_name not in existing_columns:
-                    logger.info(f"Adding missing column '{column_name}' to users table.")
-                    # Handle SQLite vs Postgres differences for column types if necessary
-                    # For BOOLEAN/INTEGER it's mostly same. TIMESTAMP varies but 
-                    # generic enough works for both in most DBs.
-                    type_str = column_type
-                    if engine.url.drivername == "sqlite":
-                         if "TIMESTAMP WITH TIME ZONE" in type_str:
-                             type_str = "DATETIME"
-                    
-                    conn.execute(text(f"ALTER TABLE users ADD COLUMN {column_name} {type_str}"))
-            conn.commit()
-            logger.info("Database schema check completed.")
-    except Exception as e:
-        logger.error(f"Error during database migration: {e}")
-        # We don't raise here to allow the app to attempt starting anyway, 
-        # though it will likely fail later if crucial columns are missing.
-
-def ensure_deployment_columns(engine: Engine):
+        return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except (OperationalError, ProgrammingError):
+        # No alembic_version table: a new database, or one from before migrations
+        return None
+    finally:
+        connection.rollback()
+
+
+def check_schema_version(engine: Engine) -> str:
+    """Fail fast unless the database is exactly at the head revision."""
+    with engine.connect() as connection:
+        current = current_revision(connection)
+
+    expected = head_revision()
+    if current != expected:
+        raise SchemaVersionError(
+            f"Database schema is at revision {current or 'none'}, this build expects {expected}. "
+            "Run `python -m app.cli migrate` before starting the app."
+        )
+    return current
+
+
+@contextmanager
+def migration_lock(connection: Connection):
     """
-    Ensures that all required columns exist in the deployments table.
+    Serialize migrations across replicas and deploy jobs. Postgres uses a
+    session-level advisory lock; SQLite is single-host and needs none.
     """
-    required_columns = {
-        "logs": "TEXT",
-        "app_logs": "TEXT",
-    }
+    if connection.dialect.name != "postgresql":
+        yield
+        return
 
+    logger.info("Waiting for the migration lock...")
+    connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    connection.commit()
     try:
-        inspector = inspect(engine)
-        existing_columns = [col["name"] for col in inspector.get_columns("deployments")]
-        
-        with engine.connect() as conn:
-            for column_name, column_type in required_columns.items():
-                if column_name not in existing_columns:
-                    logger.info(f"Adding missing column '{column_name}' to deployments table.")
-                    conn.execute(text(f"ALTER TABLE deployments ADD COLUMN {column_name} {column_type}"))
-            conn.commit()
-            logger.info("Deployments table schema check completed.")
-    except Exception as e:
-        logger.error(f"Error during deployments database migration: {e}")
+        yield
+    finally:
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        connection.commit()
+
+
+def run_migrations(engine: Engine, revision: str = "head") -> str | None:
+    """Upgrade the database to `revision` while holding the migration lock."""
+    with engine.connect() as connection:
+        with migration_lock(connection):
+            # Whoever held the lock before us may already have done the work
+            before = current_revision(connection)
+            command.upgrade(alembic_config(connection), revision)
+            connection.commit()
+            after = current_revision(connection)
+
+    if before == after:
+        logger.info(f"Database schema already at revision {after}.")
+    else:
+        logger.info(f"Database schema migrated from {before or 'none'} to {after}.")
+    return after
@@ -0,0 +1,84 @@
+# app/core/pagination.py
+"""
+Keyset pagination for the list endpoints.
+
+Lists are ordered newest first on (created_at, id); id breaks ties between rows
+created in the same instant, so the order is total and stable. A page ends with
+the key of its last row, handed to the client as an opaque cursor; the next page
+is "rows strictly after that key", which an index on (parent, created_at, id)
+answers without reading the rows before it, however deep the page.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Generic, Optional, TypeVar
+from uuid import UUID
+
+from fastapi import Response
+from sqlalchemy import ColumnElement, true, tuple_
+
+from app.core.exceptions import InvalidOperationException
+
+T = TypeVar("T")
+
+# Response header carrying the cursor of the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass(frozen=True)
+class Cursor:
+    created_at: datetime
+    id: UUID
+
+    def encode(self) -> str:
+        raw = json.dumps([self.created_at.isoformat(), self.id.hex]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            created_at, id_hex = json.loads(raw)
+            return cls(datetime.fromisoformat(created_at), UUID(hex=id_hex))
+        except (binascii.Error, ValueError, TypeError):
+            raise InvalidOperationException(detail="Invalid pagination cursor")
+
+    @classmethod
+    def of(cls, row) -> "Cursor":
+        return cls(row.created_at, row.id)
+
+
+@dataclass
+class Page(Generic[T]):
+    items: list[T]
+    next_cursor: Optional[str] = None
+
+
+def after_cursor(model, cursor: Optional[Cursor]) -> ColumnElement[bool]:
+    """Filter for the rows that follow `cursor` in (created_at DESC, id DESC) order."""
+    if cursor is None:
+        return true()
+    return tuple_(model.created_at, model.id) < tuple_(cursor.created_at, cursor.id)
+
+
+def newest_first(model) -> tuple:
+    return (model.created_at.desc(), model.id.desc())
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    return Cursor.decode(token) if token else None
+
+
+def make_page(rows: list[T], limit: int) -> Page[T]:
+    """`rows` is the result of a query with LIMIT limit + 1; the extra row only signals a next page."""
+    if len(rows) <= limit:
+        return Page(rows)
+    items = rows[:limit]
+    return Page(items, Cursor.of(items[-1]).encode())
+
+
+def set_next_cursor(response: Response, page: Page) -> None:
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
@@ -0,0 +1,118 @@
+# app/core/password_hashing.py
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableException
+from app.core.metrics import register_collector
+from app.core.security import hash_password, verify_password, verify_and_update_password
+
+
+class PasswordHashingPool:
+    """
+    Runs argon2 hashing on a dedicated, bounded executor so a burst of logins
+    cannot take over the threadpool that serves every other endpoint.
+
+    At most `max_pending` operations may be queued or running; beyond that,
+    callers get a ServiceUnavailableException (503) instead of piling up.
+    """
+
+    def __init__(self, executor_kind: str, workers: int, max_pending: int):
+        self.executor_kind = executor_kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so importing the app never forks worker processes
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise ServiceUnavailableException(
+                    detail="Authentication is temporarily overloaded. Please retry shortly."
+                )
+            self._pending += 1
+
+    def _release(self, _: Future | None = None) -> None:
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+    def _cancel(self) -> None:
+        # The operation never started: give the slot back without counting it
+        with self._lock:
+            self._pending -= 1
+
+    async def _run(self, fn, *args):
+        self._acquire()
+
+        if self.workers <= 0:
+            try:
+                return await run_in_threadpool(fn, *args)
+            finally:
+                self._release()
+
+        try:
+            with self._lock:
+                executor = self._get_executor()
+            # Raises if the executor is shut down or its worker processes died
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._cancel()
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        return await self._run(verify_and_update_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, int | str]:
+        with self._lock:
+            return {
+                "executor": self.executor_kind if self.workers > 0 else "shared_threadpool",
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+password_hasher = PasswordHashingPool(
+    executor_kind=settings.password_hash_executor,
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
+
+register_collector("password_hashing", password_hasher.stats)
@@ -0,0 +1,165 @@
+# app/core/query_plans.py
+import json
+import logging
+import re
+import threading
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger("envctl")
+
+# ASGI scope of the request being served; the route is resolved when a statement runs
+_current_scope: ContextVar[dict | None] = ContextVar("query_plan_scope", default=None)
+
+
+class QueryPlanMiddleware:
+    """Tags the statements a request runs with its endpoint (pure ASGI, no buffering)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+
+
+def current_endpoint() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return "(no request)"
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else scope['path']}"
+
+
+def sqlite_full_scans(plan: list[tuple], statement: str) -> list[str]:
+    """Tables read by a plain `SCAN` (no index) in SQLite's EXPLAIN QUERY PLAN output."""
+    tables = []
+    for *_, detail in plan:
+        if not detail.startswith("SCAN ") or " USING " in detail:
+            continue
+        name = detail.split()[1]
+        # SQLite reports aliases (e.g. projects_1); map them back to the table
+        aliased = re.search(rf'"?(\w+)"? AS "?{re.escape(name)}"?\b', statement)
+        tables.append(aliased.group(1) if aliased else name)
+    return tables
+
+
+def postgres_seq_scans(plan: Any) -> list[str]:
+    """Relations read by a `Seq Scan` node in Postgres' EXPLAIN (FORMAT JSON) output."""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    tables = []
+    nodes = [entry["Plan"] for entry in plan]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan":
+            tables.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return tables
+
+
+class QueryPlanAdvisor:
+    """
+    Development aid: EXPLAINs each distinct SELECT once per endpoint, on the
+    connection that ran it, and flags sequential scans of tables holding at
+    least `min_rows` rows. Findings are logged and exposed under "query_plans"
+    in GET /metrics.
+
+    Every new statement costs an extra EXPLAIN and a row count, so this is
+    meant for development and load-test databases, never production.
+    """
+
+    def __init__(self, min_rows: int):
+        self.min_rows = min_rows
+        self._explained: set[tuple[str, str]] = set()
+        self._findings: dict[tuple[str, str], dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def install(self, engine: Engine) -> None:
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _after_cursor_execute(self, conn: Connection, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith("SELECT"):
+            return
+        key = (current_endpoint(), statement)
+        with self._lock:
+            if key in self._explained:
+                return
+            self._explained.add(key)
+
+        try:
+            self.inspect(conn, key[0], statement, parameters)
+        except Exception as e:
+            logger.warning(f"Query plan advisor could not explain a statement: {e}")
+
+    def inspect(self, conn: Connection, endpoint: str, statement: str, parameters) -> None:
+        dialect = conn.dialect.name
+        # A raw DB-API cursor, so the EXPLAIN and the row counts fire no events of their own
+        cursor = conn.connection.cursor()
+        try:
+            if dialect == "sqlite":
+                cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                scanned = sqlite_full_scans(cursor.fetchall(), statement)
+                sizes = {table: self.table_rows(cursor, dialect, table) for table in scanned}
+            elif dialect == "postgresql":
+                # In a savepoint: a failed EXPLAIN must not abort the request's transaction
+                cursor.execute("SAVEPOINT query_plan_advisor")
+                try:
+                    cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                    scanned = postgres_seq_scans(cursor.fetchone()[0])
+                    sizes = {table: self.table_rows(cursor, dialect, table) for table in scanned}
+                except Exception:
+                    cursor.execute("ROLLBACK TO SAVEPOINT query_plan_advisor")
+                    raise
+                finally:
+                    cursor.execute("RELEASE SAVEPOINT query_plan_advisor")
+            else:
+                return
+        finally:
+            cursor.close()
+
+        for table, rows in sizes.items():
+            if rows >= self.min_rows:
+                self.record(endpoint, table, rows, statement)
+
+    @staticmethod
+    def table_rows(cursor, dialect: str, table: str) -> int:
+        # Literal table names: the drivers disagree on parameter style, and the name
+        # comes from the query plan, not from a client
+        quoted = table.replace('"', '""')
+        if dialect == "postgresql":
+            # The planner's estimate: no scan needed to size the table (-1 if never analyzed)
+            cursor.execute(f"SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass('\"{quoted}\"')")
+            row = cursor.fetchone()
+            if row and row[0] is not None and row[0] >= 0:
+                return int(row[0])
+        cursor.execute(f'SELECT count(*) FROM "{quoted}"')
+        row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else 0
+
+    def record(self, endpoint: str, table: str, rows: int, statement: str) -> None:
+        with self._lock:
+            first = (endpoint, table) not in self._findings
+            self._findings[(endpoint, table)] = {
+                "endpoint": endpoint,
+                "table": table,
+                "rows": rows,
+                "statement": " ".join(statement.split()),
+            }
+        if first:
+            logger.warning(f"Sequential scan on {table} ({rows} rows) in {endpoint}: {' '.join(statement.split())}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "statements_explained": len(self._explained),
+                "sequential_scans": list(self._findings.values()),
+            }
@@ -0,0 +1,121 @@
+# app/core/rate_limit.py
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.metrics import register_collector
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets held in process memory.
+
+    Each key starts with `burst` tokens and regains `rate_per_second`. Buckets
+    are kept in LRU order and capped at `max_keys`; an evicted key simply
+    starts again with a full bucket.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: int,
+        max_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    def try_acquire(self, key: str) -> float:
+        """Take a token for `key`. Returns 0 if admitted, else seconds until one is available."""
+        now = self._clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated_at) * self.rate_per_second)
+
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+                self.admitted += 1
+            else:
+                retry_after = (1 - tokens) / self.rate_per_second
+                self.rejected += 1
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+            return retry_after
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "tracked_keys": len(self._buckets),
+            }
+
+
+class ClientIpResolver:
+    """
+    Finds the client address behind explicitly trusted proxies.
+
+    X-Forwarded-For is only read when the peer is a trusted proxy, and then
+    from the right: each trusted hop is skipped and the first address that is
+    not a trusted proxy is the client. Entries further left are set by the
+    client itself and are never believed.
+    """
+
+    def __init__(self, trusted_proxies: Iterable[str]):
+        self.trusted = [ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies]
+
+    def _is_trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted)
+
+    def resolve(self, peer: str | None, forwarded_for: str | None) -> str | None:
+        if peer is None or not self._is_trusted(peer):
+            return peer
+        hops = [hop.strip() for hop in (forwarded_for or "").split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self._is_trusted(hop):
+                return hop
+        # Every hop is a trusted proxy (or there were none): the request started inside
+        return hops[0] if hops else peer
+
+    def for_request(self, request: Request) -> str | None:
+        peer = request.client.host if request.client else None
+        return self.resolve(peer, request.headers.get("x-forwarded-for"))
+
+
+client_ip_resolver = ClientIpResolver(settings.trusted_proxies)
+
+login_ip_limiter = TokenBucketLimiter(
+    rate_per_second=settings.login_ip_rate_per_minute / 60,
+    burst=settings.login_ip_burst,
+)
+login_account_limiter = TokenBucketLimiter(
+    rate_per_second=settings.login_account_rate_per_minute / 60,
+    burst=settings.login_account_burst,
+)
+
+register_collector("login_ip_limiter", login_ip_limiter.stats)
+register_collector("login_account_limiter", login_account_limiter.stats)
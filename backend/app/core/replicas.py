@@ -0,0 +1,108 @@
+# app/core/replicas.py
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Generic, TypeVar
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+
+logger = logging.getLogger("envctl")
+
+E = TypeVar("E")
+
+# Set on responses to writes; while it is valid the client's reads go to the primary
+READ_PRIMARY_COOKIE = "envctl-read-primary"
+
+
+class ReplicaSet(Generic[E]):
+    """
+    Round-robin over read replica engines. A replica whose connection fails is
+    skipped for `retry_seconds`, then tried again on its next turn; with every
+    replica down, reads fall back to the primary.
+    """
+
+    def __init__(
+        self,
+        engines: list[E],
+        retry_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.engines = engines
+        self.retry_seconds = retry_seconds
+        self._clock = clock
+        self._next = itertools.count()
+        self._down_until = [0.0] * len(engines)
+        self._lock = threading.Lock()
+        self.reads = [0] * len(engines)
+        self.failures = [0] * len(engines)
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def choose(self) -> E | None:
+        if not self.engines:
+            return None
+
+        now = self._clock()
+        start = next(self._next)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self._down_until[index] <= now:
+                self.reads[index] += 1
+                return self.engines[index]
+        return None
+
+    def mark_down(self, index: int) -> None:
+        with self._lock:
+            if self._down_until[index] <= self._clock():
+                logger.warning(f"Read replica {index} failed; using other replicas for {self.retry_seconds}s.")
+            self._down_until[index] = self._clock() + self.retry_seconds
+            self.failures[index] += 1
+
+    def watch(self, index: int, sync_engine) -> None:
+        """Mark the replica down when its connection fails or drops."""
+
+        @event.listens_for(sync_engine, "handle_error")
+        def _on_error(context):
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+                self.mark_down(index)
+
+    def stats(self) -> dict[str, list[int | bool]]:
+        now = self._clock()
+        return {
+            "reads": list(self.reads),
+            "failures": list(self.failures),
+            "healthy": [down_until <= now for down_until in self._down_until],
+        }
+
+
+def pin_reads_to_primary(response: Response) -> None:
+    """Send this client's reads to the primary for the read-your-writes window."""
+    response.set_cookie(
+        key=READ_PRIMARY_COOKIE,
+        value=str(int(time.time() + settings.read_your_writes_seconds)),
+        max_age=max(1, int(settings.read_your_writes_seconds)),
+        httponly=True,
+        secure=True,
+        samesite="none",
+        path="/",
+    )
+
+
+def reads_pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def choose_read_engine(request: Request, replicas: ReplicaSet[E], primary: E) -> E:
+    if not replicas or reads_pinned_to_primary(request):
+        return primary
+    return replicas.choose() or primary
+
@@ -0,0 +1,132 @@
+# app/core/revocation.py
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import register_collector
+import app.repositories.sessions as sessions_repo
+
+logger = logging.getLogger("envctl")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+class RevocationList:
+    """
+    Session ids revoked recently enough that an access token for them may still
+    be valid. Lookups go through a Bloom filter first, so the common
+    "not revoked" answer never touches the exact set.
+
+    Each worker rebuilds the list from the sessions table every sync; ids
+    revoked locally are kept across rebuilds until they age out of the window.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        retention_seconds: float,
+        capacity: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.session_factory = session_factory
+        self.retention_seconds = retention_seconds
+        self.capacity = capacity
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._local: dict[str, float] = {}
+        self._state = (BloomFilter(capacity), frozenset())
+        self.syncs = 0
+        self.failed_syncs = 0
+
+    def _rebuild(self, session_ids: set[str]) -> None:
+        bloom = BloomFilter(max(self.capacity, 2 * len(session_ids)))
+        for session_id in session_ids:
+            bloom.add(session_id)
+        # Single attribute swap: readers see either the old or the new state
+        self._state = (bloom, frozenset(session_ids))
+
+    def _recent_local(self) -> set[str]:
+        cutoff = self._clock() - self.retention_seconds
+        self._local = {sid: at for sid, at in self._local.items() if at >= cutoff}
+        return set(self._local)
+
+    def add(self, session_id: str) -> None:
+        with self._lock:
+            self._local[session_id] = self._clock()
+            bloom, exact = self._state
+            # Setting bits in place is safe for concurrent readers; the next
+            # sync resizes the filter if it is running over capacity.
+            bloom.add(session_id)
+            self._state = (bloom, exact | {session_id})
+
+    def replace(self, session_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._rebuild(set(session_ids) | self._recent_local())
+
+    def is_revoked(self, session_id: str) -> bool:
+        bloom, exact = self._state
+        return session_id in bloom and session_id in exact
+
+    def sync(self) -> int:
+        since = datetime.now(timezone.utc) - timedelta(seconds=self.retention_seconds)
+        db = self.session_factory()
+        try:
+            session_ids = sessions_repo.list_revoked_session_ids_since(db, since)
+        except Exception as e:
+            logger.warning(f"Failed to sync session revocations: {e}")
+            self.failed_syncs += 1
+            return 0
+        finally:
+            db.close()
+
+        self.replace(str(session_id) for session_id in session_ids)
+        self.syncs += 1
+        return len(session_ids)
+
+    def stats(self) -> dict[str, int]:
+        _, exact = self._state
+        return {
+            "revoked": len(exact),
+            "syncs": self.syncs,
+            "failed_syncs": self.failed_syncs,
+        }
+
+
+revocation_list = RevocationList(
+    session_factory=SessionLocal,
+    # Access tokens outlive their revocation by at most their lifetime plus one sync
+    retention_seconds=settings.jwt_access_token_expires_minutes * 60
+    + 2 * settings.revocation_sync_interval_seconds,
+)
+
+register_collector("session_revocations", revocation_list.stats)
+
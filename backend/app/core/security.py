@@ -2,13 +2,24 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 import secrets
 import hashlib
+import statistics
+import time
 
-from jose import jwt
+from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=settings.argon2_time_cost,
+    argon2__memory_cost=settings.argon2_memory_cost,
+    argon2__parallelism=settings.argon2_parallelism,
+)
+
+# OWASP's floor for argon2id memory; calibration never goes below it
+ARGON2_MIN_MEMORY_COST = 19456
 
 
 def hash_password(password: str) -> str:
@@ -19,12 +30,92 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_access_token(subject: str, expires_minutes: Optional[int] = None) -> str:
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """
+    Verify a password. If it matches and the stored hash uses outdated
+    parameters, also return a new hash made with the current ones.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def calibrate_argon2(
+    target_ms: float,
+    memory_cost: int,
+    parallelism: int,
+    max_time_cost: int = 20,
+    samples: int = 3,
+) -> dict:
+    """
+    Benchmark argon2 on this host and return the strongest parameters whose
+    median verify time stays within `target_ms`. Time cost is raised first;
+    if even time_cost=1 is too slow, memory is halved down to the OWASP floor.
+    """
+    from passlib.hash import argon2
+
+    password = secrets.token_urlsafe(16)
+
+    def measure(time_cost: int, memory: int) -> float:
+        handler = argon2.using(
+            time_cost=time_cost, memory_cost=memory, parallelism=parallelism
+        )
+        hashed = handler.hash(password)
+        timings = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            handler.verify(password, hashed)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    memory = memory_cost
+    while True:
+        best = None
+        for time_cost in range(1, max_time_cost + 1):
+            elapsed_ms = measure(time_cost, memory)
+            if elapsed_ms > target_ms:
+                break
+            best = {
+                "time_cost": time_cost,
+                "memory_cost": memory,
+                "parallelism": parallelism,
+                "verify_ms": round(elapsed_ms, 1),
+            }
+        if best or memory // 2 < ARGON2_MIN_MEMORY_COST:
+            break
+        memory //= 2
+
+    return best or {
+        "time_cost": 1,
+        "memory_cost": memory,
+        "parallelism": parallelism,
+        "verify_ms": round(measure(1, memory), 1),
+    }
+
+
+_dummy_password_hash: str | None = None
+
+
+def get_dummy_password_hash() -> str:
+    """
+    A hash of a random password produced with the current argon2 parameters.
+    Verifying against it costs the same as verifying a real account's hash,
+    so unknown emails take as long as wrong passwords.
+    """
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = hash_password(secrets.token_urlsafe(32))
+    return _dummy_password_hash
+
+
+def create_access_token(
+    subject: str, expires_minutes: Optional[int] = None, claims: Optional[dict] = None
+) -> str:
     if expires_minutes is None:
         expires_minutes = settings.jwt_access_token_expires_minutes
 
     expire = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes)
-    to_encode = {"sub": subject, "exp": expire}
+    to_encode = {**(claims or {}), "sub": subject, "exp": expire}
     encoded_jwt = jwt.encode(
         to_encode,
         settings.jwt_secret_key,
@@ -33,6 +124,16 @@ def create_access_token(subject: str, expires_minutes: Optional[int] = None) ->
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> Optional[dict]:
+    """Return the claims of a valid, unexpired access token, or None."""
+    try:
+        return jwt.decode(
+            token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm]
+        )
+    except JWTError:
+        return None
+
+
 def generate_random_token(length: int = 32) -> str:
     """Generate a high-entropy random token for verifications and resets."""
     return secrets.token_urlsafe(length)
@@ -0,0 +1,109 @@
+# app/core/session_cache.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.metrics import register_collector
+from app.models.user import User
+
+
+@dataclass(frozen=True)
+class CachedSession:
+    """Resolved state of a session. `user` is detached from any DB session."""
+
+    user: User | None
+    expires_at: datetime
+    revoked: bool
+    session_id: UUID | None = None
+
+
+class SessionCache:
+    """
+    Bounded, per-process TTL/LRU cache of resolved sessions keyed by session hash.
+
+    Revocations in this process invalidate their entry immediately. Revocations
+    made by other workers become visible once the entry's TTL runs out, so keep
+    the TTL short.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, CachedSession]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_hash: str) -> CachedSession | None:
+        with self._lock:
+            item = self._entries.get(session_hash)
+            if item is None:
+                self.misses += 1
+                return None
+
+            stored_at, entry = item
+            if self._clock() - stored_at >= self.ttl_seconds:
+                del self._entries[session_hash]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(session_hash)
+            self.hits += 1
+            return entry
+
+    def put(self, session_hash: str, entry: CachedSession) -> None:
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+
+        with self._lock:
+            self._entries[session_hash] = (self._clock(), entry)
+            self._entries.move_to_end(session_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, session_hash: str) -> None:
+        with self._lock:
+            self._entries.pop(session_hash, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+session_cache = SessionCache(
+    ttl_seconds=settings.session_cache_ttl_seconds,
+    max_entries=settings.session_cache_max_entries,
+)
+
+# Session ids that resolved to no live session. Small and separate from
+# session_cache: a flood of made-up cookies only churns this one.
+negative_session_cache = SessionCache(
+    ttl_seconds=settings.session_cache_ttl_seconds,
+    max_entries=settings.session_negative_cache_max_entries,
+)
+
+register_collector("session_cache", session_cache.stats)
+register_collector("session_negative_cache", negative_session_cache.stats)
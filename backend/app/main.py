@@ -1,6 +1,8 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -9,10 +11,21 @@ import time
 import logging
 
 from app.core.config import settings
-from app.core.database import Base, engine, SessionLocal
-from app.core.migrations import ensure_user_columns, ensure_deployment_columns
+from app.core.database import engine, async_engine, SessionLocal
+from app.core.migrations import check_schema_version, run_migrations
 from app.core.seed import seed_db
+from app.core.security import get_dummy_password_hash
+from app.core.metrics import collect as collect_metrics, register_collector
+from app.core.last_seen import last_seen_buffer
+from app.core.password_hashing import password_hasher
+from app.core.revocation import revocation_list
+from app.services.deployment_logs import log_tail_notifier
+from app.services.job_worker import job_worker
+from app.services.session_reaper import session_reaper
 from app.core.middleware import CSRFMiddleware
+from app.core.byte_ranges import LOG_OFFSET_HEADER, NEXT_OFFSET_HEADER
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.query_plans import QueryPlanAdvisor, QueryPlanMiddleware
 from app.api.v1.auth import router as auth_router
 from app.api.v1.projects import router as projects_router
 from app.api.v1.environments import router as environments_router
@@ -25,12 +38,39 @@ from app.core.exceptions import (
     resource_not_found_exception_handler,
     InvalidOperationException,
     invalid_operation_exception_handler,
+    ServiceUnavailableException,
+    service_unavailable_exception_handler,
+    RateLimitedException,
+    rate_limited_exception_handler,
+    RangeNotSatisfiableException,
+    range_not_satisfiable_exception_handler,
 )
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("envctl")
 
 
+async def flush_last_seen_periodically():
+    while True:
+        await last_seen_buffer.wait_until_due(settings.last_seen_flush_interval_seconds)
+        await run_in_threadpool(last_seen_buffer.flush)
+
+
+async def sync_revocations_periodically():
+    while True:
+        await asyncio.sleep(settings.revocation_sync_interval_seconds)
+        await run_in_threadpool(revocation_list.sync)
+
+
+async def reap_sessions_periodically():
+    while True:
+        await asyncio.sleep(settings.session_reaper_interval_seconds)
+        try:
+            await run_in_threadpool(session_reaper.run_once)
+        except Exception as e:
+            logger.error(f"Session reaper run failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -39,20 +79,24 @@ async def lifespan(app: FastAPI):
 
     for attempt in range(max_retries):
         try:
-            with engine.connect() as connection:
-                connection.execute(text("SELECT 1"))
-            Base.metadata.create_all(bind=engine)
-            ensure_user_columns(engine)
-            ensure_deployment_columns(engine)
-            logger.info("Database connected and tables created/updated successfully.")
+            if settings.db_migrate_on_startup:
+                revision = run_migrations(engine)
+            else:
+                # Migrations run as a pre-deploy step; booting is one version query
+                revision = check_schema_version(engine)
+            logger.info(f"Database connected, schema at revision {revision}.")
 
             with SessionLocal() as db:
                 seed_db(db)
+
+            # Pay for the dummy hash once at startup rather than on the first unknown-email login
+            get_dummy_password_hash()
             
             logger.info("==========================================")
             logger.info(f"APP_ENV: {settings.app_env}")
             logger.info(f"EMAIL_MODE: {settings.email_mode}")
             logger.info(f"REQUIRE_EMAIL_VERIFICATION: {settings.require_email_verification}")
+            logger.info(f"DATABASE_ASYNC: {async_engine is not None}")
             logger.info("==========================================")
             break
         except OperationalError as e:
@@ -65,9 +109,34 @@ async def lifespan(app: FastAPI):
                 logger.error("Max retries reached. Could not connect to database.")
                 raise
 
+    background_tasks = [asyncio.create_task(flush_last_seen_periodically())]
+    if settings.session_mode == "token":
+        await run_in_threadpool(revocation_list.sync)
+        background_tasks.append(asyncio.create_task(sync_revocations_periodically()))
+    if settings.session_reaper_interval_seconds > 0:
+        background_tasks.append(asyncio.create_task(reap_sessions_periodically()))
+    if engine.dialect.name == "postgresql":
+        # Wakes log tails when a worker process commits new lines
+        background_tasks.append(asyncio.create_task(log_tail_notifier.listen(engine)))
+    # Local development runs queued jobs here; deployed, they run in `python -m app.cli worker`
+    stop_jobs = asyncio.Event()
+    job_task = None
+    if settings.jobs_in_process:
+        job_task = asyncio.create_task(job_worker.run(stop_jobs))
+
     yield  # Application runs here
 
-    # Shutdown (if needed)
+    # Shutdown
+    for task in background_tasks:
+        task.cancel()
+    if job_task is not None:
+        stop_jobs.set()
+        await job_task
+    flushed = await run_in_threadpool(last_seen_buffer.flush)
+    logger.info(f"Flushed {flushed} pending last_seen_at updates.")
+    password_hasher.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
     logger.info("Application shutting down.")
 
 
@@ -95,6 +164,17 @@ async def log_preflight_diagnostic(request: Request, call_next):
 
 app.add_middleware(CSRFMiddleware)
 
+if settings.query_plan_advisor and settings.is_development:
+    query_plan_advisor = QueryPlanAdvisor(settings.query_plan_scan_min_rows)
+    query_plan_advisor.install(engine)
+    if async_engine is not None:
+        query_plan_advisor.install(async_engine.sync_engine)
+    register_collector("query_plans", query_plan_advisor.stats)
+    app.add_middleware(QueryPlanMiddleware)
+    logger.info(f"Query plan advisor on: flagging sequential scans of tables with >= {settings.query_plan_scan_min_rows} rows.")
+elif settings.query_plan_advisor:
+    logger.warning("QUERY_PLAN_ADVISOR is ignored in production.")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -105,6 +185,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, LOG_OFFSET_HEADER, NEXT_OFFSET_HEADER],
 )
 
 app.add_exception_handler(Exception, global_exception_handler)
@@ -116,6 +197,11 @@ app.add_exception_handler(
 app.add_exception_handler(
     InvalidOperationException, invalid_operation_exception_handler
 )
+app.add_exception_handler(
+    ServiceUnavailableException, service_unavailable_exception_handler
+)
+app.add_exception_handler(RateLimitedException, rate_limited_exception_handler)
+app.add_exception_handler(RangeNotSatisfiableException, range_not_satisfiable_exception_handler)
 
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(projects_router, prefix="/api/v1")
@@ -132,3 +218,8 @@ def health():
         logger.error(f"Health check failed: {e}")
         raise StarletteHTTPException(status_code=503, detail="Database not available")
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+def metrics():
+    return collect_metrics()
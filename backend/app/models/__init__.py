@@ -4,3 +4,5 @@ from app.models.session import Session  # noqa: F401
 from app.models.project import Project  # noqa: F401
 from app.models.environment import Environment  # noqa: F401
 from app.models.deployment import Deployment  # noqa: F401
+from app.models.deployment_log_chunk import DeploymentLogChunk  # noqa: F401
+from app.models.job import Job  # noqa: F401
@@ -1,13 +1,17 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 import uuid
 
-from app.core.database import Base
+from app.core.database import Base, utcnow
 
 
 class Deployment(Base):
     __tablename__ = "deployments"
+    __table_args__ = (
+        # An environment's deployments, newest first, in keyset pages (list_deployments_by_environment_and_owner)
+        Index("ix_deployments_environment_id_created_at_id", "environment_id", text("created_at DESC"), text("id DESC")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
@@ -18,14 +22,14 @@ class Deployment(Base):
     version = Column(String(100), nullable=False)  # e.g. git SHA, tag, build number
     status = Column(
         String(50), nullable=False, default="pending"
-    )  # pending|running|succeeded|failed
+    )  # pending|running|succeeded|failed|superseded (a newer deployment of the environment replaced it)
 
     logs_url = Column(String(512), nullable=True)
-    logs = Column(String, nullable=True)
-    app_logs = Column(String, nullable=True)
+    # Log bodies live in deployment_log_chunks, appended as the deployment runs
 
     created_at = Column(
         DateTime(timezone=True),
+        default=utcnow,
         server_default=func.now(),
         nullable=False,
     )
@@ -0,0 +1,37 @@
+# app/models/deployment_log_chunk.py
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, LargeBinary, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.core.database import Base, utcnow
+
+
+class DeploymentLogChunk(Base):
+    """
+    One appended piece of a deployment's log stream. Streams are append-only:
+    a chunk is written once and never updated, so appending a line costs the
+    same however long the log already is.
+    """
+
+    __tablename__ = "deployment_log_chunks"
+
+    deployment_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("deployments.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    stream = Column(String(16), primary_key=True)  # "deploy" | "app"
+    seq = Column(Integer, primary_key=True)  # 0, 1, 2, ... within the stream
+    # Position of the chunk's first byte in the stream: ranges and tails are
+    # located from the index without reading the chunks before them
+    byte_offset = Column(BigInteger, nullable=False)
+    size = Column(BigInteger, nullable=False)  # Length of the uncompressed data
+    checksum = Column(BigInteger, nullable=False)  # Adler-32 of the uncompressed data
+    # None: data is stored as is. "deflate": data is an app.core.deflate block, and
+    # consecutive deflate chunks are served to clients as one stream without inflating
+    encoding = Column(String(16), nullable=True)
+    data = Column(LargeBinary, nullable=False)  # UTF-8 lines, each ending in "\n"
+
+    created_at = Column(
+        DateTime(timezone=True), default=utcnow, server_default=func.now(), nullable=False
+    )
@@ -1,13 +1,17 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, JSON
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 import uuid
 
-from app.core.database import Base
+from app.core.database import Base, utcnow
 
 
 class Environment(Base):
     __tablename__ = "environments"
+    __table_args__ = (
+        # A project's environments, newest first, in keyset pages (get_environments_for_project_and_owner)
+        Index("ix_environments_project_id_created_at_id", "project_id", text("created_at DESC"), text("id DESC")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
@@ -23,6 +27,7 @@ class Environment(Base):
 
     created_at = Column(
         DateTime(timezone=True),
+        default=utcnow,
         server_default=func.now(),
         nullable=False,
     )
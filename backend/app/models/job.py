@@ -0,0 +1,59 @@
+# app/models/job.py
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, Text, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+
+from app.core.database import Base, utcnow
+
+
+class Job(Base):
+    """
+    A unit of background work (app.services.jobs), run by a worker process
+    (`python -m app.cli worker`). Jobs are enqueued in the transaction that
+    creates their subject, so they survive restarts and are never lost or
+    run for a rolled-back request.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claiming: the due jobs, oldest first (jobs_repo.claim_jobs). Finished and dead jobs are left out.
+        Index(
+            "ix_jobs_claimable_run_after",
+            "run_after",
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+        # The queued and running jobs of a concurrency key (claim_jobs, delete_queued_jobs)
+        Index(
+            "ix_jobs_concurrency_key",
+            "concurrency_key",
+            postgresql_where=text("status IN ('queued', 'running') AND concurrency_key IS NOT NULL"),
+            sqlite_where=text("status IN ('queued', 'running') AND concurrency_key IS NOT NULL"),
+        ),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String(64), nullable=False)  # e.g. "run_deployment"
+    payload = Column(JSON, nullable=False)  # the handler's arguments
+    # Jobs with the same key run one at a time, oldest first (e.g. one rollout per environment)
+    concurrency_key = Column(String(255), nullable=True)
+
+    status = Column(String(16), nullable=False, default="queued")  # queued|running|dead
+    # queued: not claimed before this time (backoff after a failure).
+    # running: the claim's lease expires then, and another worker may take the job over.
+    run_after = Column(DateTime(timezone=True), default=utcnow, nullable=False)
+    # Claims so far; also fences a worker whose lease expired from finishing the job
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    locked_by = Column(String(255), nullable=True)  # worker id of the current claim
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True), default=utcnow, server_default=func.now(), nullable=False
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
@@ -1,13 +1,17 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 import uuid
 
-from app.core.database import Base
+from app.core.database import Base, utcnow
 
 
 class Project(Base):
     __tablename__ = "projects"
+    __table_args__ = (
+        # A user's projects, newest first, in keyset pages (get_projects_by_owner)
+        Index("ix_projects_owner_id_created_at_id", "owner_id", text("created_at DESC"), text("id DESC")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False)
@@ -17,7 +21,7 @@ class Project(Base):
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
 
     created_at = Column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
+        DateTime(timezone=True), default=utcnow, server_default=func.now(), nullable=False
     )
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
@@ -1,5 +1,5 @@
 # app/models/session.py
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -9,6 +9,23 @@ from app.core.database import Base
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Covers the per-request session -> user lookup, including the
+        # revocation and expiry filters (index-only on Postgres).
+        Index(
+            "ix_sessions_active_lookup",
+            "session_id_hash",
+            "revoked_at",
+            "expires_at",
+            postgresql_include=["user_id", "last_seen_at"],
+        ),
+        # Revocation sync in token session mode reads recent revocations only
+        Index(
+            "ix_sessions_revoked_at",
+            "revoked_at",
+            postgresql_where=text("revoked_at IS NOT NULL"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(
@@ -23,7 +40,7 @@ class Session(Base):
     created_at = Column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
     last_seen_at = Column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -0,0 +1,110 @@
+from uuid import UUID
+from sqlalchemy.orm import Session
+from sqlalchemy import Row, and_, delete, func, insert, select, tuple_
+from typing import Iterator, Optional
+
+from app.models.deployment import Deployment
+from app.models.deployment_log_chunk import DeploymentLogChunk as Chunk
+from app.models.environment import Environment
+from app.models.project import Project
+
+
+def append_log_chunks(db: Session, chunks: list[dict]) -> None:
+    """Insert chunks (dicts of DeploymentLogChunk columns) in one statement."""
+    if chunks:
+        db.execute(insert(Chunk), chunks)
+
+
+def replace_log_chunks(db: Session, deployment_id: UUID, stream: str, chunks: list[dict]) -> None:
+    """Swap all of a stream's chunks for `chunks`, covering the same bytes."""
+    db.execute(delete(Chunk).where(Chunk.deployment_id == deployment_id, Chunk.stream == stream))
+    append_log_chunks(db, chunks)
+
+
+def get_log_ends(db: Session, deployment_id: UUID) -> dict[str, tuple[int, int]]:
+    """Per stream: (next seq, length in bytes), read from the last chunk of each stream."""
+    last_seqs = (
+        select(Chunk.stream, func.max(Chunk.seq))
+        .where(Chunk.deployment_id == deployment_id)
+        .group_by(Chunk.stream)
+    )
+    rows = db.execute(
+        select(Chunk.stream, Chunk.seq, Chunk.byte_offset + Chunk.size)
+        .where(Chunk.deployment_id == deployment_id)
+        .where(tuple_(Chunk.stream, Chunk.seq).in_(last_seqs))
+    ).all()
+    return {stream: (seq + 1, end) for stream, seq, end in rows}
+
+
+def iter_log_chunks(
+    db: Session, deployment_id: UUID, stream: str, after_seq: int = -1
+) -> Iterator[Row]:
+    """
+    A stream's chunks (`.seq`, `.byte_offset`, `.size`, `.checksum`, `.encoding`,
+    `.data`) in order, fetched in batches.
+    """
+    yield from db.execute(
+        select(Chunk.seq, Chunk.byte_offset, Chunk.size, Chunk.checksum, Chunk.encoding, Chunk.data)
+        .where(Chunk.deployment_id == deployment_id, Chunk.stream == stream, Chunk.seq > after_seq)
+        .order_by(Chunk.seq)
+        .execution_options(yield_per=100)
+    )
+
+
+def get_log_chunks_from_offset(
+    db: Session,
+    deployment_id: UUID,
+    stream: str,
+    offset: int,
+    limit: Optional[int] = None,
+    end: Optional[int] = None,
+) -> list[Row]:
+    """
+    Chunks (`.byte_offset`, `.size`, `.checksum`, `.encoding`, `.data`) of a stream, in order,
+    starting with the one that holds byte `offset`: up to `limit` of them, and only those
+    that start before byte `end`. Located through the primary key.
+    """
+    holding = (
+        select(func.max(Chunk.seq))
+        .where(Chunk.deployment_id == deployment_id, Chunk.stream == stream, Chunk.byte_offset <= offset)
+        .scalar_subquery()
+    )
+    query = (
+        select(Chunk.byte_offset, Chunk.size, Chunk.checksum, Chunk.encoding, Chunk.data)
+        .where(
+            Chunk.deployment_id == deployment_id,
+            Chunk.stream == stream,
+            Chunk.seq >= func.coalesce(holding, 0),
+        )
+        .order_by(Chunk.seq)
+    )
+    if end is not None:
+        query = query.where(Chunk.byte_offset < end)
+    if limit is not None:
+        query = query.limit(limit)
+    return db.execute(query).all()
+
+
+def get_log_chunks_by_deployment_and_owner(
+    db: Session, deployment_id: UUID, owner_id: UUID, stream: Optional[str] = None
+) -> Optional[list[Row]]:
+    """
+    Every chunk (`.stream`, `.byte_offset`, `.size`, `.checksum`, `.encoding`,
+    `.data`) of an owned deployment, or only those of `stream`, ordered by
+    stream and seq; None if the deployment does not exist or is someone
+    else's. One query: the deployment is outer-joined to its chunks.
+    """
+    on = Chunk.deployment_id == Deployment.id
+    if stream is not None:
+        on = and_(on, Chunk.stream == stream)
+    rows = db.execute(
+        select(Deployment.id, Chunk.stream, Chunk.byte_offset, Chunk.size, Chunk.checksum, Chunk.encoding, Chunk.data)
+        .join(Environment, Environment.id == Deployment.environment_id)
+        .join(Project, Project.id == Environment.project_id)
+        .outerjoin(Chunk, on)
+        .where(Deployment.id == deployment_id, Project.owner_id == owner_id)
+        .order_by(Chunk.stream, Chunk.seq)
+    ).all()
+    if not rows:
+        return None
+    return [row for row in rows if row.stream is not None]
@@ -1,9 +1,12 @@
 from uuid import UUID
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from typing import List, Optional
+from sqlalchemy import and_, select
+from typing import Optional
 
+from app.core.pagination import Cursor, Page, after_cursor, make_page, newest_first
 from app.models.deployment import Deployment
+from app.models.environment import Environment
+from app.models.project import Project
 
 
 def get_deployment_by_id(db: Session, deployment_id: UUID) -> Optional[Deployment]:
@@ -12,23 +15,62 @@ def get_deployment_by_id(db: Session, deployment_id: UUID) -> Optional[Deploymen
     ).scalar_one_or_none()
 
 
+def get_deployment_by_id_and_owner(
+    db: Session, deployment_id: UUID, owner_id: UUID
+) -> Optional[Deployment]:
+    """The deployment, if its environment's project belongs to `owner_id`; one query."""
+    return db.execute(
+        select(Deployment)
+        .join(Environment, Environment.id == Deployment.environment_id)
+        .join(Project, Project.id == Environment.project_id)
+        .where(Deployment.id == deployment_id, Project.owner_id == owner_id)
+    ).scalar_one_or_none()
+
+
+def get_deployment_status(db: Session, deployment_id: UUID) -> Optional[str]:
+    return db.execute(select(Deployment.status).where(Deployment.id == deployment_id)).scalar_one_or_none()
+
+
+def get_newest_deployment_for_environment(db: Session, env_id: UUID) -> Optional[Deployment]:
+    return db.execute(
+        select(Deployment)
+        .where(Deployment.environment_id == env_id)
+        .order_by(*newest_first(Deployment))
+        .limit(1)
+    ).scalar_one_or_none()
+
+
 def create_deployment(db: Session, dep: Deployment) -> Deployment:
     db.add(dep)
-    db.commit()
-    db.refresh(dep)
+    db.flush()
     return dep
 
 
-def list_deployments_by_environment(db: Session, env_id: UUID) -> List[Deployment]:
-    return (
-        db.execute(select(Deployment).where(Deployment.environment_id == env_id))
-        .scalars()
-        .all()
-    )
+def list_deployments_by_environment_and_owner(
+    db: Session, env_id: UUID, owner_id: UUID, limit: int, cursor: Optional[Cursor] = None
+) -> Optional[Page[Deployment]]:
+    """
+    A page of an environment's deployments, newest first, or None if the
+    environment does not exist or its project belongs to someone else. One
+    query, like environments_repo.get_environments_for_project_and_owner.
+    """
+    rows = db.execute(
+        select(Environment.id, Deployment)
+        .join(Project, Project.id == Environment.project_id)
+        .outerjoin(
+            Deployment,
+            and_(Deployment.environment_id == Environment.id, after_cursor(Deployment, cursor)),
+        )
+        .where(Environment.id == env_id, Project.owner_id == owner_id)
+        .order_by(*newest_first(Deployment))
+        .limit(limit + 1)
+    ).all()
+    if not rows:
+        return None
+    return make_page([dep for _, dep in rows if dep is not None], limit)
 
 
 def save_deployment(db: Session, dep: Deployment) -> Deployment:
     db.add(dep)
-    db.commit()
-    db.refresh(dep)
+    db.flush()
     return dep
@@ -1,24 +1,41 @@
 from uuid import UUID
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from typing import List, Optional
+from sqlalchemy import and_, select
+from typing import Optional
 
+from app.core.pagination import Cursor, Page, after_cursor, make_page, newest_first
 from app.models.environment import Environment
+from app.models.project import Project
 
 
 def create_environment(db: Session, env: Environment) -> Environment:
     db.add(env)
-    db.commit()
-    db.refresh(env)
+    db.flush()
     return env
 
 
-def get_environments_for_project(db: Session, project_id: UUID) -> List[Environment]:
-    return (
-        db.execute(select(Environment).where(Environment.project_id == project_id))
-        .scalars()
-        .all()
-    )
+def get_environments_for_project_and_owner(
+    db: Session, project_id: UUID, owner_id: UUID, limit: int, cursor: Optional[Cursor] = None
+) -> Optional[Page[Environment]]:
+    """
+    A page of a project's environments, newest first, or None if the project does
+    not exist or belongs to someone else. One query: the project is outer-joined
+    to its environments (the cursor filter is part of the join), so an owned
+    project with no environments left to list is one row of NULLs.
+    """
+    rows = db.execute(
+        select(Project.id, Environment)
+        .outerjoin(
+            Environment,
+            and_(Environment.project_id == Project.id, after_cursor(Environment, cursor)),
+        )
+        .where(Project.id == project_id, Project.owner_id == owner_id)
+        .order_by(*newest_first(Environment))
+        .limit(limit + 1)
+    ).all()
+    if not rows:
+        return None
+    return make_page([env for _, env in rows if env is not None], limit)
 
 
 def get_environment_by_id(db: Session, env_id: UUID) -> Optional[Environment]:
@@ -27,13 +44,22 @@ def get_environment_by_id(db: Session, env_id: UUID) -> Optional[Environment]:
     ).scalar_one_or_none()
 
 
+def get_environment_by_id_and_owner(
+    db: Session, env_id: UUID, owner_id: UUID
+) -> Optional[Environment]:
+    return db.execute(
+        select(Environment)
+        .join(Project, Project.id == Environment.project_id)
+        .where(Environment.id == env_id, Project.owner_id == owner_id)
+    ).scalar_one_or_none()
+
+
 def delete_environment(db: Session, env: Environment) -> None:
     db.delete(env)
-    db.commit()
+    db.flush()
 
 
 def save_environment(db: Session, env: Environment) -> Environment:
     db.add(env)
-    db.commit()
-    db.refresh(env)
+    db.flush()
     return env
@@ -0,0 +1,176 @@
+from datetime import datetime
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import Row, and_, delete, exists, func, or_, select, text, tuple_, update
+from typing import Optional, Sequence
+from uuid import UUID
+import zlib
+
+from app.models.job import Job
+
+CLAIMABLE = ("queued", "running")
+
+
+def create_job(db: Session, job: Job) -> Job:
+    db.add(job)
+    db.flush()
+    return job
+
+
+def claim_jobs(
+    db: Session,
+    worker_id: str,
+    now: datetime,
+    lease_until: datetime,
+    limit: int,
+    kinds: Optional[Sequence[str]] = None,
+    except_kinds: Sequence[str] = (),
+) -> list[Row]:
+    """
+    Claim up to `limit` due jobs (of `kinds`, if given), oldest first, and
+    return them (`.id`, `.kind`, `.payload`, `.attempts`, `.max_attempts`).
+    Due: queued jobs whose run_after has passed, and running jobs whose lease
+    has expired (their worker died). A job with a concurrency key waits while
+    another job with that key runs or was queued before it. One statement.
+    On Postgres the candidates are locked with FOR UPDATE SKIP LOCKED, so
+    concurrent workers each claim different jobs without waiting on one
+    another. SQLite has no row locks and drops the clause; it runs one write
+    statement at a time, which makes the claim just as exclusive there.
+    """
+    other = aliased(Job)
+    # Compared as (created_at, id), so jobs created in the same instant still have an order
+    waits_for_other = exists().where(
+        other.concurrency_key == Job.concurrency_key,
+        other.id != Job.id,
+        or_(
+            other.status == "running",
+            and_(
+                Job.status == "queued",
+                other.status == "queued",
+                tuple_(other.created_at, other.id) < tuple_(Job.created_at, Job.id),
+            ),
+        ),
+    )
+    due = (
+        select(Job.id)
+        .where(Job.status.in_(CLAIMABLE), Job.run_after <= now)
+        .where(or_(Job.concurrency_key.is_(None), ~waits_for_other))
+        .order_by(Job.run_after)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if kinds is not None:
+        due = due.where(Job.kind.in_(kinds))
+    if except_kinds:
+        due = due.where(Job.kind.not_in(except_kinds))
+    return db.execute(
+        update(Job)
+        .where(Job.id.in_(due.scalar_subquery()))
+        .values(status="running", attempts=Job.attempts + 1, run_after=lease_until, locked_by=worker_id)
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts),
+        execution_options={"synchronize_session": False},
+    ).all()
+
+
+def lock_claims(db: Session, kind: str) -> None:
+    """
+    Serialize claims of one kind of job across workers until the transaction
+    ends, so a cap on how many run at once (count_running_jobs) holds. A
+    Postgres advisory lock; SQLite runs one write transaction at a time.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": zlib.crc32(f"jobs:{kind}".encode())})
+
+
+def count_running_jobs(db: Session, kind: str, now: datetime) -> int:
+    """Jobs of a kind that a worker holds an unexpired lease on."""
+    return db.execute(
+        select(func.count()).where(Job.kind == kind, Job.status == "running", Job.run_after > now)
+    ).scalar_one()
+
+
+def count_queued_jobs_by_kind(db: Session) -> dict[str, int]:
+    return dict(db.execute(select(Job.kind, func.count()).where(Job.status == "queued").group_by(Job.kind)).all())
+
+
+def delete_queued_jobs(db: Session, kind: str, concurrency_key: str) -> list[dict]:
+    """Drop the jobs of a key that are waiting to run; returns their payloads. Running jobs are kept."""
+    return list(
+        db.execute(
+            delete(Job)
+            .where(Job.kind == kind, Job.concurrency_key == concurrency_key, Job.status == "queued")
+            .returning(Job.payload),
+            execution_options={"synchronize_session": False},
+        ).scalars()
+    )
+
+
+# The helpers below act on a claim: (job id, attempts at claim time). A worker whose
+# lease expired and whose job was claimed again no longer matches, and changes nothing.
+def _claimed(job_id: UUID, attempts: int):
+    return (Job.id == job_id, Job.attempts == attempts, Job.status == "running")
+
+
+def hold_claim(db: Session, job_id: UUID, attempts: int) -> bool:
+    """
+    Whether the claim still holds; if so the job row stays locked (FOR UPDATE)
+    until the transaction ends, so the job cannot be claimed again meanwhile.
+    """
+    return db.execute(select(Job.id).where(*_claimed(job_id, attempts)).with_for_update()).first() is not None
+
+
+def renew_leases(db: Session, claims: list[tuple[UUID, int]], lease_until: datetime) -> set[tuple[UUID, int]]:
+    """Extend the leases still held; the claims renewed (the others ended or were taken over)."""
+    if not claims:
+        return set()
+    rows = db.execute(
+        update(Job)
+        .where(tuple_(Job.id, Job.attempts).in_(claims), Job.status == "running")
+        .values(run_after=lease_until)
+        .returning(Job.id, Job.attempts),
+        execution_options={"synchronize_session": False},
+    )
+    return {(row.id, row.attempts) for row in rows}
+
+
+def finish_job(db: Session, job_id: UUID, attempts: int) -> bool:
+    """A finished job is deleted: the table only keeps work that is still to do, or dead."""
+    result = db.execute(
+        delete(Job).where(*_claimed(job_id, attempts)), execution_options={"synchronize_session": False}
+    )
+    return result.rowcount == 1
+
+
+def retry_job(db: Session, job_id: UUID, attempts: int, run_after: datetime, error: str) -> bool:
+    result = db.execute(
+        update(Job)
+        .where(*_claimed(job_id, attempts))
+        .values(status="queued", run_after=run_after, locked_by=None, last_error=error),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount == 1
+
+
+def dead_letter_job(db: Session, job_id: UUID, attempts: int, error: str) -> bool:
+    result = db.execute(
+        update(Job)
+        .where(*_claimed(job_id, attempts))
+        .values(status="dead", locked_by=None, last_error=error),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount == 1
+
+
+def requeue_dead_jobs(db: Session, now: datetime, kind: Optional[str] = None) -> int:
+    """Give dead jobs (of one kind, or all) a fresh set of attempts."""
+    query = update(Job).where(Job.status == "dead")
+    if kind is not None:
+        query = query.where(Job.kind == kind)
+    result = db.execute(
+        query.values(status="queued", attempts=0, run_after=now),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount
+
+
+def count_jobs_by_status(db: Session) -> dict[str, int]:
+    return dict(db.execute(select(Job.status, func.count()).group_by(Job.status)).all())
@@ -1,18 +1,23 @@
 from uuid import UUID
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Optional
 
+from app.core.pagination import Cursor, Page, after_cursor, make_page, newest_first
 from app.models.project import Project
 from app.schemas.project import ProjectCreate
 
 
-def get_projects_by_owner(db: Session, owner_id: UUID) -> List[Project]:
-    return (
+def get_projects_by_owner(
+    db: Session, owner_id: UUID, limit: int, cursor: Optional[Cursor] = None
+) -> Page[Project]:
+    rows = (
         db.query(Project)
-        .filter(Project.owner_id == owner_id)
-        .order_by(Project.created_at.desc())
+        .filter(Project.owner_id == owner_id, after_cursor(Project, cursor))
+        .order_by(*newest_first(Project))
+        .limit(limit + 1)
         .all()
     )
+    return make_page(rows, limit)
 
 
 def create_project(db: Session, project_in: ProjectCreate, owner_id: UUID) -> Project:
@@ -23,8 +28,7 @@ def create_project(db: Session, project_in: ProjectCreate, owner_id: UUID) -> Pr
         owner_id=owner_id,
     )
     db.add(project)
-    db.commit()
-    db.refresh(project)
+    db.flush()
     return project
 
 
@@ -40,4 +44,4 @@ def get_project_by_id_and_owner(
 
 def delete_project(db: Session, project: Project) -> None:
     db.delete(project)
-    db.commit()
+    db.flush()
@@ -1,8 +1,11 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from typing import Optional
+from sqlalchemy import select, update, delete, func, values, column, bindparam, text, String, DateTime
+from typing import List, Optional
+from uuid import UUID
 
 from app.models.session import Session as SessionModel
+from app.models.user import User
 
 
 def get_session_by_hash(db: Session, session_id_hash: str) -> Optional[SessionModel]:
@@ -11,14 +14,111 @@ def get_session_by_hash(db: Session, session_id_hash: str) -> Optional[SessionMo
     ).scalar_one_or_none()
 
 
+def get_active_user_by_session_hash(
+    db: Session, session_id_hash: str, now: datetime
+) -> Optional[tuple[User, UUID, datetime, datetime]]:
+    """
+    Resolve a session hash to (user, session id, expires_at, last_seen_at) in one round trip.
+    Revoked and expired sessions are filtered in SQL and resolve to None.
+    """
+    return db.execute(
+        select(User, SessionModel.id, SessionModel.expires_at, SessionModel.last_seen_at)
+        .join(SessionModel, SessionModel.user_id == User.id)
+        .where(
+            SessionModel.session_id_hash == session_id_hash,
+            SessionModel.revoked_at.is_(None),
+            SessionModel.expires_at > now,
+        )
+    ).one_or_none()
+
+
+def list_revoked_session_ids_since(db: Session, since: datetime) -> List[UUID]:
+    return (
+        db.execute(select(SessionModel.id).where(SessionModel.revoked_at >= since))
+        .scalars()
+        .all()
+    )
+
+
 def create_session(db: Session, session: SessionModel) -> SessionModel:
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    db.flush()
     return session
 
 
 def update_session(db: Session, session: SessionModel) -> SessionModel:
-    db.commit()
-    db.refresh(session)
+    db.flush()
     return session
+
+
+def bulk_update_last_seen(db: Session, last_seen: dict[str, datetime]) -> None:
+    """Apply many last_seen_at bumps (keyed by session hash) in a single statement."""
+    if not last_seen:
+        return
+
+    sessions = SessionModel.__table__
+
+    if db.get_bind().dialect.name == "postgresql":
+        # UPDATE sessions SET last_seen_at = v.last_seen_at FROM (VALUES ...) AS v ...
+        v = values(
+            column("session_id_hash", String),
+            column("last_seen_at", DateTime(timezone=True)),
+            name="v",
+        ).data(list(last_seen.items()))
+        db.execute(
+            update(sessions)
+            .where(sessions.c.session_id_hash == v.c.session_id_hash)
+            .where(sessions.c.last_seen_at < v.c.last_seen_at)
+            .values(last_seen_at=v.c.last_seen_at)
+        )
+    else:
+        # SQLite has no VALUES aliasing for UPDATE ... FROM; use one executemany instead
+        db.execute(
+            update(sessions)
+            .where(sessions.c.session_id_hash == bindparam("b_session_id_hash"))
+            .where(sessions.c.last_seen_at < bindparam("b_last_seen_at"))
+            .values(last_seen_at=bindparam("b_last_seen_at")),
+            [
+                {"b_session_id_hash": session_hash, "b_last_seen_at": seen_at}
+                for session_hash, seen_at in last_seen.items()
+            ],
+        )
+    db.commit()
+
+
+def delete_expired_sessions(db: Session, now: datetime, limit: int) -> int:
+    """Delete up to `limit` expired sessions (walks ix_sessions_expires_at)."""
+    batch = select(SessionModel.id).where(SessionModel.expires_at < now).limit(limit)
+    result = db.execute(delete(SessionModel).where(SessionModel.id.in_(batch)))
+    db.commit()
+    return result.rowcount
+
+
+def delete_revoked_sessions(db: Session, revoked_before: datetime, limit: int) -> int:
+    """Delete up to `limit` sessions revoked before `revoked_before` (walks ix_sessions_revoked_at)."""
+    batch = (
+        select(SessionModel.id)
+        .where(SessionModel.revoked_at < revoked_before)
+        .limit(limit)
+    )
+    result = db.execute(delete(SessionModel).where(SessionModel.id.in_(batch)))
+    db.commit()
+    return result.rowcount
+
+
+def count_sessions(db: Session) -> int:
+    return db.execute(select(func.count()).select_from(SessionModel)).scalar_one()
+
+
+def estimate_session_count(db: Session) -> Optional[int]:
+    """
+    Size of the sessions table without scanning it: the planner's estimate on
+    Postgres (None until the table is first analyzed), an exact count elsewhere.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return count_sessions(db)
+    estimate = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": SessionModel.__tablename__},
+    ).scalar()
+    return int(estimate) if estimate is not None and estimate >= 0 else None
@@ -16,8 +16,7 @@ def get_user_by_id(db: Session, user_id: UUID) -> Optional[User]:
 
 def create_user(db: Session, user: User) -> User:
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.flush()
     return user
 
 
@@ -28,6 +27,5 @@ def get_user_by_verification_token_hash(db: Session, token_hash: str) -> Optiona
 
 
 def update_user(db: Session, user: User) -> User:
-    db.commit()
-    db.refresh(user)
+    db.flush()
     return user
@@ -17,3 +17,11 @@ class DeploymentRead(BaseModel):
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class DeploymentLogsRead(BaseModel):
+    deployment_logs: str
+    app_logs: str
+    # Byte offsets to pass as deploy_since_offset / app_since_offset to read only what follows
+    deployment_logs_next_offset: int = 0
+    app_logs_next_offset: int = 0
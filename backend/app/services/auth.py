@@ -1,9 +1,16 @@
+import math
 from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
+from app.core.database import after_commit
+from app.core.db_runner import SessionRunner
+from app.core.exceptions import RateLimitedException
 from app.core.security import (
-    hash_password,
-    verify_password,
+    create_access_token,
+    decode_access_token,
+    get_dummy_password_hash,
     generate_random_token,
     hash_token,
     generate_session_id,
@@ -13,6 +20,12 @@ from app.models.session import Session as SessionModel
 from app.schemas.user import UserCreate
 from app.services.email import send_verification_email
 from app.core.config import settings
+from app.core.session_cache import negative_session_cache, session_cache, CachedSession
+from app.core.last_seen import last_seen_buffer
+from app.core.password_hashing import password_hasher
+from app.core.login_attempts import login_attempts
+from app.core.rate_limit import login_ip_limiter, login_account_limiter
+from app.core.revocation import revocation_list
 
 import app.repositories.users as users_repo
 import app.repositories.sessions as sessions_repo
@@ -27,34 +40,46 @@ def ensure_utc(dt: datetime | None) -> datetime | None:
     return dt.astimezone(timezone.utc)
 
 
-def register_user(db: Session, user_in: UserCreate) -> str | None:
+async def register_user(db: SessionRunner, user_in: UserCreate) -> str | None:
     """
     Register a user. If they already exist, we silently do nothing or resend email.
     To prevent enumeration, we always return generic success from the API.
     Returns the verification link if in mock modes.
+
+    DB work goes through the session runner; hashing runs on the password hashing pool.
     """
     email = user_in.email.lower().strip()
-    existing = users_repo.get_user_by_email(db, email)
+    existing = await db.run(users_repo.get_user_by_email, email)
 
-    verification_link = None
-    
     # If user exists, we decide whether to resend verification
     if existing:
-        if not existing.is_verified and settings.require_email_verification:
-            # Resend/Update verification token
-            raw_token = generate_random_token()
-            existing.verification_token_hash = hash_token(raw_token)
-            existing.verification_token_expires_at = datetime.now(timezone.utc) + timedelta(hours=24)
-            users_repo.update_user(db, existing)
-            verification_link = send_verification_email(existing.email, raw_token)
-        elif existing.is_verified:
-            import logging
-            logger = logging.getLogger("envctl")
-            logger.info(f"Registration attempt for already verified account: {email}. Silently ignoring.")
-        
-        return verification_link
+        return await db.run(_handle_existing_registration, existing)
+
+    password_hash = await password_hasher.hash(user_in.password)
+    return await db.run(_create_registered_user, email, password_hash)
+
+
+def _handle_existing_registration(db: Session, existing: User) -> str | None:
+    verification_link = None
+
+    if not existing.is_verified and settings.require_email_verification:
+        # Resend/Update verification token
+        raw_token = generate_random_token()
+        existing.verification_token_hash = hash_token(raw_token)
+        existing.verification_token_expires_at = datetime.now(timezone.utc) + timedelta(hours=24)
+        users_repo.update_user(db, existing)
+        verification_link = send_verification_email(existing.email, raw_token, db)
+    elif existing.is_verified:
+        import logging
+        logger = logging.getLogger("envctl")
+        logger.info(f"Registration attempt for already verified account: {existing.email}. Silently ignoring.")
+
+    return verification_link
+
+
+def _create_registered_user(db: Session, email: str, password_hash: str) -> str | None:
+    verification_link = None
 
-    # New user
     raw_token = generate_random_token()
     token_hash = hash_token(raw_token)
     expires_at = datetime.now(timezone.utc) + timedelta(hours=24)
@@ -64,7 +89,7 @@ def register_user(db: Session, user_in: UserCreate) -> str | None:
 
     user = User(
         email=email,
-        password_hash=hash_password(user_in.password),
+        password_hash=password_hash,
         is_verified=is_verified,
         verification_token_hash=None if is_verified else token_hash,
         verification_token_expires_at=None if is_verified else expires_at,
@@ -72,7 +97,7 @@ def register_user(db: Session, user_in: UserCreate) -> str | None:
     users_repo.create_user(db, user)
     
     if not is_verified:
-        verification_link = send_verification_email(user.email, raw_token)
+        verification_link = send_verification_email(user.email, raw_token, db)
         
     return verification_link
 
@@ -98,16 +123,43 @@ def verify_email_token(db: Session, token: str) -> bool:
     return True
 
 
-def authenticate_user(
-    db: Session, email: str, password: str
+def admit_login_attempt(normalized_email: str, client_ip: str | None) -> None:
+    """
+    Token-bucket admission per client IP and per account, checked before any DB
+    lookup or hashing so the CPU a single client can spend on login is bounded.
+
+    The IP bucket goes first: an IP that is turned away spends no account token,
+    so one client cannot lock everyone else out of an account it is spraying.
+    """
+    retry_after = login_ip_limiter.try_acquire(f"ip:{client_ip}") if client_ip else 0.0
+    if retry_after <= 0:
+        retry_after = login_account_limiter.try_acquire(f"account:{normalized_email}")
+
+    if retry_after > 0:
+        raise RateLimitedException(
+            detail="Too many login attempts. Please try again later.",
+            retry_after=math.ceil(retry_after),
+        )
+
+
+async def authenticate_user(
+    db: SessionRunner, email: str, password: str, client_ip: str | None = None
 ) -> tuple[User | None, str | None, str | None]:
     """
     Authenticate user, enforce lockouts, return (User, raw_session_id, verification_link) if successful.
+
+    DB work goes through the session runner; the argon2 verify runs on the password hashing pool.
+    Attempt store calls may be network round trips (Redis), so they run in the threadpool too,
+    outside the DB steps (which may run on the event loop).
     """
     normalized_email = email.lower().strip()
-    user = users_repo.get_user_by_email(db, normalized_email)
+    admit_login_attempt(normalized_email, client_ip)
+
+    user = await db.run(users_repo.get_user_by_email, normalized_email)
 
     if not user:
+        # Same argon2 cost as a real account, so response time doesn't reveal which emails exist
+        await password_hasher.verify(password, get_dummy_password_hash())
         return None, None, None
 
     # Check Lockout
@@ -115,16 +167,38 @@ def authenticate_user(
     if lockout_until and lockout_until > datetime.now(timezone.utc):
         return None, None, None
 
-    # Check Password
-    if not verify_password(password, user.password_hash):
-        # Apply Lockout Policy
-        user.failed_login_attempts += 1
-        user.last_failed_login_at = datetime.now(timezone.utc)
-        if user.failed_login_attempts >= 5:
-            user.lockout_until = datetime.now(timezone.utc) + timedelta(minutes=15)
-        users_repo.update_user(db, user)
+    # Check Password (and rehash if the stored hash uses outdated argon2 parameters)
+    password_ok, new_hash = await password_hasher.verify_and_update(password, user.password_hash)
+    attempts_key = f"user:{user.id}"
+
+    if not password_ok:
+        # Apply Lockout Policy: count in the attempt store, persist only a triggered lockout
+        failures = await run_in_threadpool(login_attempts.record_failure, attempts_key)
+        if failures >= settings.login_max_failed_attempts:
+            await db.run(_lock_out, user, failures)
+            await run_in_threadpool(login_attempts.reset, attempts_key)
         return None, None, None
 
+    authenticated = await db.run(_complete_authentication, user, new_hash)
+    if authenticated[0] is not None:
+        # Success: reset lockouts
+        await run_in_threadpool(login_attempts.reset, attempts_key)
+    return authenticated
+
+
+def _lock_out(db: Session, user: User, failures: int) -> None:
+    now = datetime.now(timezone.utc)
+    user.failed_login_attempts = failures
+    user.last_failed_login_at = now
+    user.lockout_until = now + timedelta(minutes=settings.login_lockout_minutes)
+    users_repo.update_user(db, user)
+    # The login fails and its unit of work is discarded, but the lockout must stick
+    db.commit()
+
+
+def _complete_authentication(
+    db: Session, user: User, new_hash: str | None = None
+) -> tuple[User | None, str | None, str | None]:
     # Check Verified Status (Must be verified to login if required)
     if settings.require_email_verification and not user.is_verified:
         # Securely resend verification email on correct password for unverified account
@@ -134,14 +208,17 @@ def authenticate_user(
             hours=24
         )
         users_repo.update_user(db, user)
-        verification_link = send_verification_email(user.email, raw_token)
+        verification_link = send_verification_email(user.email, raw_token, db)
         return None, None, verification_link
 
-    # Success: Reset lockouts
-    user.failed_login_attempts = 0
-    user.lockout_until = None
-    user.last_failed_login_at = None
-    users_repo.update_user(db, user)
+    # Success: clear the persisted lockout and store the rehashed password, skipping the write when nothing changed
+    if new_hash or user.failed_login_attempts or user.lockout_until or user.last_failed_login_at:
+        if new_hash:
+            user.password_hash = new_hash
+        user.failed_login_attempts = 0
+        user.lockout_until = None
+        user.last_failed_login_at = None
+        users_repo.update_user(db, user)
 
     # Create Session
     raw_session_id = generate_session_id()
@@ -156,27 +233,98 @@ def authenticate_user(
     return user, raw_session_id, None
 
 
-def get_current_user_from_session_id(db: Session, raw_session_id: str) -> User | None:
+def resolve_session(db: Session, raw_session_id: str) -> CachedSession | None:
+    """Resolve a raw session id to its live session state, or None."""
     if not raw_session_id:
         return None
 
     session_hash = hash_token(raw_session_id)
-    session_record = sessions_repo.get_session_by_hash(db, session_hash)
+    now = datetime.now(timezone.utc)
+
+    cached = session_cache.get(session_hash)
+    if cached is not None:
+        if cached.revoked or cached.expires_at < now or not cached.user:
+            return None
+        last_seen_buffer.touch(session_hash, now)
+        return cached
+    if negative_session_cache.get(session_hash) is not None:
+        return None
 
-    if not session_record:
+    row = sessions_repo.get_active_user_by_session_hash(db, session_hash, now)
+
+    if not row:
+        # Unknown, revoked or expired: cache the miss too, so a stale cookie
+        # doesn't hit the DB on every request
+        negative_session_cache.put(
+            session_hash, CachedSession(user=None, expires_at=now, revoked=True)
+        )
         return None
 
-    revoked_at = ensure_utc(session_record.revoked_at)
-    expires_at = ensure_utc(session_record.expires_at)
+    user, session_id, expires_at, last_seen_at = row
+
+    # Buffered: written in bulk by the write-behind flush, not per request
+    last_seen_buffer.touch(session_hash, now, last_known=ensure_utc(last_seen_at))
+
+    # Detach so the cached instance is never expired or refreshed by another request's commit
+    db.expunge(user)
+    resolved = CachedSession(
+        user=user,
+        expires_at=ensure_utc(expires_at),
+        revoked=False,
+        session_id=session_id,
+    )
+    session_cache.put(session_hash, resolved)
+
+    return resolved
+
+
+def get_current_user_from_session_id(db: Session, raw_session_id: str) -> User | None:
+    resolved = resolve_session(db, raw_session_id)
+    return resolved.user if resolved else None
 
-    if revoked_at or (expires_at and expires_at < datetime.now(timezone.utc)):
+
+def refresh_access_token(db: Session, raw_session_id: str) -> tuple[User, str] | None:
+    """
+    Token session mode: exchange a live session (the refresh token) for a new
+    short-lived access token. Returns (user, access_token) or None.
+    """
+    resolved = resolve_session(db, raw_session_id)
+    if not resolved:
+        return None
+
+    user = resolved.user
+    access_token = create_access_token(
+        str(user.id),
+        claims={
+            "sid": str(resolved.session_id),
+            "email": user.email,
+            "created_at": ensure_utc(user.created_at).isoformat(),
+        },
+    )
+    return user, access_token
+
+
+def get_user_from_access_token(access_token: str | None) -> User | None:
+    """
+    Token session mode: resolve the principal from a signed access token without
+    touching the DB. The returned User is transient and carries only the
+    fields in the token.
+    """
+    if not access_token:
         return None
 
-    # Update last seen (throttle this in high-traffic, but fine for now)
-    session_record.last_seen_at = datetime.now(timezone.utc)
-    sessions_repo.update_session(db, session_record)
+    claims = decode_access_token(access_token)
+    if not claims or revocation_list.is_revoked(claims.get("sid", "")):
+        return None
 
-    return users_repo.get_user_by_id(db, session_record.user_id)
+    try:
+        return User(
+            id=UUID(claims["sub"]),
+            email=claims["email"],
+            created_at=datetime.fromisoformat(claims["created_at"]),
+        )
+    except (KeyError, ValueError):
+        return None
 
 
 def revoke_session(db: Session, raw_session_id: str) -> None:
@@ -189,3 +337,10 @@ def revoke_session(db: Session, raw_session_id: str) -> None:
     if session_record and not session_record.revoked_at:
         session_record.revoked_at = datetime.now(timezone.utc)
         sessions_repo.update_session(db, session_record)
+
+    # Drop the entry only after the revocation is committed, so a concurrent
+    # request cannot re-cache the session as live in between.
+    after_commit(db, lambda: session_cache.invalidate(session_hash))
+    if session_record:
+        session_id = str(session_record.id)
+        after_commit(db, lambda: revocation_list.add(session_id))
@@ -0,0 +1,542 @@
+import asyncio
+import logging
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import Engine, func, select
+from sqlalchemy.orm import Session
+
+from app.core.byte_ranges import parse_range
+from app.core.database import after_commit
+from app.core.db_runner import SessionRunner
+from app.core.deflate import compress_block, decompress_block, zlib_stream
+from app.core.exceptions import InvalidOperationException, ResourceNotFoundException
+from app.core.metrics import register_collector
+import app.repositories.deployment_logs as logs_repo
+import app.repositories.deployments as deployments_repo
+
+logger = logging.getLogger("envctl")
+
+# Log streams of a deployment: the rollout itself and the application it started
+DEPLOY_STREAM = "deploy"
+APP_STREAM = "app"
+
+STREAMS = (DEPLOY_STREAM, APP_STREAM)
+
+# A stream's buffered lines become a chunk once they reach this size, or on flush()
+CHUNK_MAX_BYTES = 64 * 1024
+
+# Chunks at least this large are stored deflated (smaller ones gain too little), if that saves space
+COMPRESS_MIN_BYTES = 1024
+DEFLATE = "deflate"
+
+# A tail sends at most this many chunks per stream per read, so catching up on a
+# long log is done in bounded steps
+TAIL_MAX_CHUNKS = 16
+
+# The runner writes no more lines once a deployment is in one of these states
+FINISHED_STATUSES = ("succeeded", "failed", "superseded")
+
+# Postgres NOTIFY channel on which writers announce a deployment's log grew (payload: its id)
+LOG_TAIL_CHANNEL = "envctl_deployment_logs"
+
+
+def make_chunk(data: bytes) -> dict:
+    """Stored columns (size, checksum, encoding, data) for a chunk holding `data`."""
+    chunk = {"size": len(data), "checksum": zlib.adler32(data), "encoding": None, "data": data}
+    if len(data) >= COMPRESS_MIN_BYTES:
+        block = compress_block(data)
+        if len(block) < len(data):
+            chunk.update(encoding=DEFLATE, data=block)
+    return chunk
+
+
+def chunk_bytes(chunk) -> bytes:
+    """The uncompressed data of a stored chunk."""
+    return decompress_block(chunk.data) if chunk.encoding == DEFLATE else chunk.data
+
+
+class DeploymentLogWriter:
+    """
+    Appends lines to a deployment's log streams.
+
+    Lines are buffered per stream and written as new chunks: flush() inserts
+    every pending chunk, of all streams, in one statement, and never touches
+    the chunks already stored. The caller commits, so a runner step's status
+    change and its log lines become visible together. Once the deployment is
+    done writing, seal() compacts what the flushes left behind.
+    """
+
+    def __init__(self, db: Session, deployment_id: UUID, max_chunk_bytes: int = CHUNK_MAX_BYTES):
+        self.db = db
+        self.deployment_id = deployment_id
+        self.max_chunk_bytes = max_chunk_bytes
+        # Resume after whatever an earlier run of this deployment wrote
+        self._ends = logs_repo.get_log_ends(db, deployment_id)
+        self._buffers: dict[str, list[bytes]] = {}
+        self._buffered: dict[str, int] = {}
+        self._pending: list[dict] = []
+
+    def write(self, stream: str, line: str) -> None:
+        data = (line.rstrip("\n") + "\n").encode()
+        self._buffers.setdefault(stream, []).append(data)
+        self._buffered[stream] = self._buffered.get(stream, 0) + len(data)
+        if self._buffered[stream] >= self.max_chunk_bytes:
+            self._cut(stream)
+            self.flush()
+
+    def _cut(self, stream: str) -> None:
+        lines = self._buffers.pop(stream, None)
+        self._buffered.pop(stream, None)
+        if not lines:
+            return
+        data = b"".join(lines)
+        seq, offset = self._ends.get(stream, (0, 0))
+        self._pending.append(self._chunk(stream, seq, offset, data))
+        self._ends[stream] = (seq + 1, offset + len(data))
+
+    def flush(self) -> None:
+        for stream in list(self._buffers):
+            self._cut(stream)
+        logs_repo.append_log_chunks(self.db, self._pending)
+        self._pending = []
+
+    def seal(self) -> None:
+        """
+        Flush, then rewrite each stream as chunks of up to max_chunk_bytes: the
+        small chunks of frequent flushes compress poorly, or not at all. Byte
+        offsets stay the same, so readers and tails are not disturbed; only for
+        when nothing more will be written.
+        """
+        self.flush()
+        for stream in STREAMS:
+            chunks = list(logs_repo.iter_log_chunks(self.db, self.deployment_id, stream))
+            if len(chunks) < 2:
+                continue
+
+            compacted = []
+            offset = chunks[0].byte_offset
+            group: list[bytes] = []
+            grouped = 0
+            for chunk in chunks:
+                data = chunk_bytes(chunk)
+                if group and grouped + len(data) > self.max_chunk_bytes:
+                    compacted.append(self._chunk(stream, len(compacted), offset, b"".join(group)))
+                    offset += grouped
+                    group, grouped = [], 0
+                group.append(data)
+                grouped += len(data)
+            compacted.append(self._chunk(stream, len(compacted), offset, b"".join(group)))
+
+            if len(compacted) < len(chunks):
+                logs_repo.replace_log_chunks(self.db, self.deployment_id, stream, compacted)
+                self._ends[stream] = (len(compacted), offset + grouped)
+
+    def _chunk(self, stream: str, seq: int, offset: int, data: bytes) -> dict:
+        return {"deployment_id": self.deployment_id, "stream": stream, "seq": seq, "byte_offset": offset} | make_chunk(data)
+
+
+def read_log(db: Session, deployment_id: UUID, stream: str) -> str:
+    """A whole stream, reassembled from its chunks."""
+    return b"".join(
+        chunk_bytes(chunk) for chunk in logs_repo.iter_log_chunks(db, deployment_id, stream)
+    ).decode(errors="replace")
+
+
+def get_log_chunks_for_user(
+    db: Session, deployment_id: UUID, user_id: UUID, stream: Optional[str] = None
+) -> list:
+    """The stored chunks of an owned deployment's streams (or of one); one query."""
+    chunks = logs_repo.get_log_chunks_by_deployment_and_owner(db, deployment_id, user_id, stream)
+    if chunks is None:
+        raise ResourceNotFoundException(detail="Deployment not found")
+    return chunks
+
+
+def read_logs_for_user(db: Session, deployment_id: UUID, user_id: UUID) -> dict[str, bytes]:
+    """Every stream of an owned deployment, reassembled."""
+    streams: dict[str, list[bytes]] = {}
+    for chunk in get_log_chunks_for_user(db, deployment_id, user_id):
+        streams.setdefault(chunk.stream, []).append(chunk_bytes(chunk))
+    return {stream: b"".join(parts) for stream, parts in streams.items()}
+
+
+class LogWindow(NamedTuple):
+    start: int  # byte offset of the first byte of the window
+    end: int  # byte offset after its last byte: where the next read starts
+    size: int  # length of the whole stream
+    chunks: list  # the stored chunks overlapping [start, end)
+    ranged: bool = False  # exactly the bytes of a Range header
+
+    @classmethod
+    def whole(cls, chunks: list) -> "LogWindow":
+        size = chunks[-1].byte_offset + chunks[-1].size if chunks else 0
+        return cls(0, size, size, chunks)
+
+
+class _LineScanner:
+    """
+    Finds line boundaries in a stored stream, reading (and inflating) only the
+    chunks around them, each once.
+    """
+
+    def __init__(self, db: Session, deployment_id: UUID, stream: str):
+        self.db = db
+        self.deployment_id = deployment_id
+        self.stream = stream
+        self._chunks: dict[int, bytes] = {}  # byte offset -> data
+
+    def _chunk_at(self, offset: int) -> tuple[int, bytes]:
+        """(byte offset, data) of the chunk holding byte `offset`, which must exist."""
+        for start, data in self._chunks.items():
+            if start <= offset < start + len(data):
+                return start, data
+        row = logs_repo.get_log_chunks_from_offset(self.db, self.deployment_id, self.stream, offset, limit=1)[0]
+        self._chunks[row.byte_offset] = chunk_bytes(row)
+        return row.byte_offset, self._chunks[row.byte_offset]
+
+    def next_line_start(self, offset: int, limit: int) -> Optional[int]:
+        """The first line start at or after `offset`, if there is one up to `limit`."""
+        if offset == 0:
+            return 0
+        position = offset - 1  # a line starts after each "\n"
+        while position < limit:
+            start, data = self._chunk_at(position)
+            found = data.find(b"\n", position - start)
+            if found >= 0:
+                line_start = start + found + 1
+                return line_start if line_start <= limit else None
+            position = start + len(data)
+        return None
+
+    def last_line_end(self, offset: int, floor: int) -> Optional[int]:
+        """The last line end (just after a "\n") at or before `offset` and after `floor`."""
+        position = offset
+        while position > floor:
+            start, data = self._chunk_at(position - 1)
+            found = data.rfind(b"\n", max(floor - start, 0), position - start)
+            if found >= 0:
+                return start + found + 1
+            position = start
+        return None
+
+    def tail_start(self, lines: int, floor: int, end: int) -> int:
+        """Where the last `lines` lines before `end` start; `floor` if there are fewer after it."""
+        position = end - 1  # the last line's own "\n" starts no line
+        while position > floor:
+            start, data = self._chunk_at(position - 1)
+            low, high = max(floor - start, 0), position - start
+            found = data.count(b"\n", low, high)
+            if found >= lines:
+                for _ in range(lines):
+                    high = data.rfind(b"\n", low, high)
+                return start + high + 1
+            lines -= found
+            position = start
+        return floor
+
+
+def read_log_window(
+    db: Session,
+    deployment_id: UUID,
+    stream: str,
+    since_offset: int = 0,
+    tail: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    byte_range: Optional[str] = None,
+) -> LogWindow:
+    """
+    Part of a stream, cut at line boundaries, with the chunks that hold it;
+    no ownership check.
+
+    - since_offset: skip the bytes before it (the end of an earlier read).
+    - tail: only the last `tail` lines.
+    - max_bytes: at most this many bytes: the first lines that fit, or with
+      `tail` the last ones. A single longer line is cut.
+    - byte_range: a Range header; when it holds one satisfiable byte range,
+      exactly those bytes, and the other arguments are ignored.
+
+    Only the chunks at the window's edges are read to find it.
+    """
+    size = logs_repo.get_log_ends(db, deployment_id).get(stream, (0, 0))[1]
+    requested = parse_range(byte_range, size)
+    if requested is not None:
+        start, end = requested
+    else:
+        start, end = min(since_offset, size), size
+        scanner = _LineScanner(db, deployment_id, stream)
+        if tail is not None:
+            floor = start if max_bytes is None else max(start, end - max_bytes)
+            start = scanner.tail_start(tail, floor, end) if tail else end
+            if start == floor and floor > min(since_offset, size):
+                # max_bytes cut into a line: start with the next whole one
+                start = scanner.next_line_start(floor, end) or floor
+        elif max_bytes is not None and end - start > max_bytes:
+            end = scanner.last_line_end(start + max_bytes, start) or start + max_bytes
+
+    chunks = []
+    if start < end:
+        chunks = logs_repo.get_log_chunks_from_offset(db, deployment_id, stream, start, end=end)
+    return LogWindow(start, end, size, chunks, ranged=requested is not None)
+
+
+def read_log_window_for_user(
+    db: Session,
+    deployment_id: UUID,
+    user_id: UUID,
+    stream: str,
+    since_offset: int = 0,
+    tail: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    byte_range: Optional[str] = None,
+) -> LogWindow:
+    """
+    read_log_window() of an owned deployment. Without window arguments the
+    whole stream is read together with the ownership check, in one query.
+    """
+    if not since_offset and tail is None and max_bytes is None and byte_range is None:
+        return LogWindow.whole(get_log_chunks_for_user(db, deployment_id, user_id, stream))
+    if deployments_repo.get_deployment_by_id_and_owner(db, deployment_id, user_id) is None:
+        raise ResourceNotFoundException(detail="Deployment not found")
+    return read_log_window(db, deployment_id, stream, since_offset, tail, max_bytes, byte_range)
+
+
+def _window_pieces(window: LogWindow) -> Iterator[tuple[object, int, int]]:
+    """(chunk, start, end) of the part of each chunk inside the window."""
+    for chunk in window.chunks:
+        start = max(window.start - chunk.byte_offset, 0)
+        end = min(window.end - chunk.byte_offset, chunk.size)
+        if start < end:
+            yield chunk, start, end
+
+
+def log_as_text(window: LogWindow) -> bytes:
+    """A log window as plain bytes."""
+    return b"".join(
+        chunk_bytes(chunk)[start:end] for chunk, start, end in _window_pieces(window)
+    )
+
+
+def log_as_deflate(window: LogWindow) -> bytes:
+    """
+    A log window as a zlib stream (HTTP `Content-Encoding: deflate`): deflated
+    chunks inside it are copied as stored; only small plain chunks and the
+    parts of chunks at its edges are compressed.
+    """
+    blocks = []
+    for chunk, start, end in _window_pieces(window):
+        if (start, end) == (0, chunk.size):
+            block = chunk.data if chunk.encoding == DEFLATE else compress_block(chunk.data)
+            blocks.append((block, chunk.checksum, chunk.size))
+        else:
+            data = chunk_bytes(chunk)[start:end]
+            blocks.append((compress_block(data), zlib.adler32(data), len(data)))
+    return b"".join(zlib_stream(blocks))
+
+
+class LogTailNotifier:
+    """
+    Wakes the log tails of this process when a deployment's log grows. Writers
+    call announce() in the transaction that adds the lines or changes the
+    status. On Postgres that is a NOTIFY, delivered at commit to the listen()
+    task of every API process, so a rollout run by a worker process wakes the
+    tails too; elsewhere (SQLite, one process) it is a notify() after commit.
+    Tails re-poll in any case, for what a dropped listener missed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[UUID, set[tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self.notifications = 0
+
+    @contextmanager
+    def subscribe(self, deployment_id: UUID) -> Iterator[asyncio.Event]:
+        """An event set on every notify() for the deployment, until the block exits."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subscribers.setdefault(deployment_id, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(deployment_id, set())
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    self._subscribers.pop(deployment_id, None)
+
+    def announce(self, db: Session, deployment_id: UUID) -> None:
+        """Wake the deployment's tails, in every process, once the caller's transaction commits."""
+        if db.get_bind().dialect.name == "postgresql":
+            # Sent at commit, dropped on rollback; the listener of this process relays it too
+            db.execute(select(func.pg_notify(LOG_TAIL_CHANNEL, str(deployment_id))))
+        else:
+            after_commit(db, lambda: self.notify(deployment_id))
+
+    def notify(self, deployment_id: UUID) -> None:
+        """Safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(deployment_id, ()))
+            self.notifications += 1
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The tail's event loop is closed
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            tails = sum(len(subscribers) for subscribers in self._subscribers.values())
+        return {"tails": tails, "notifications": self.notifications}
+
+    async def listen(self, engine: Engine, retry_seconds: float = 5.0) -> None:
+        """
+        Relay the announcements of all processes to this one's tails (Postgres),
+        until cancelled. Listens on a connection of its own, outside the pool,
+        and reconnects retry_seconds after losing it.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                connection = await loop.run_in_executor(None, _listening_connection, engine)
+            except Exception as e:
+                logger.error(f"Log tail listener could not connect: {e}")
+                await asyncio.sleep(retry_seconds)
+                continue
+
+            lost = loop.create_future()
+
+            def relay() -> None:
+                try:
+                    connection.poll()
+                except Exception as e:
+                    if not lost.done():
+                        lost.set_exception(e)
+                    return
+                while connection.notifies:
+                    self.notify(UUID(connection.notifies.pop(0).payload))
+
+            fd = connection.fileno()
+            loop.add_reader(fd, relay)
+            try:
+                await lost
+            except Exception as e:
+                logger.warning(f"Log tail listener lost its connection: {e}")
+            finally:
+                loop.remove_reader(fd)
+                connection.close()
+            await asyncio.sleep(retry_seconds)
+
+
+def _listening_connection(engine: Engine):
+    """A psycopg2 connection, detached from the pool, that LISTENs on LOG_TAIL_CHANNEL."""
+    pooled = engine.raw_connection()
+    pooled.detach()
+    connection = pooled.dbapi_connection
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {LOG_TAIL_CHANNEL}")
+    return connection
+
+
+log_tail_notifier = LogTailNotifier()
+
+register_collector("log_tails", log_tail_notifier.stats)
+
+
+class LogTail(NamedTuple):
+    status: Optional[str]  # None once the deployment is gone
+    # (stream, bytes from the requested offset on, offset after them) of the streams that grew
+    chunks: list[tuple[str, bytes, int]]
+    more: bool  # a stream has more chunks than one read returns
+
+
+def read_log_tail(
+    db: Session, deployment_id: UUID, offsets: dict[str, int], max_chunks: int = TAIL_MAX_CHUNKS
+) -> LogTail:
+    """What each stream holds past its offset; no ownership check (done when the tail starts)."""
+    # Status first: lines committed with a final status are then part of this read
+    status = deployments_repo.get_deployment_status(db, deployment_id)
+    chunks = []
+    more = False
+    for stream in STREAMS:
+        offset = offsets.get(stream, 0)
+        rows = logs_repo.get_log_chunks_from_offset(db, deployment_id, stream, offset, max_chunks + 1)
+        more = more or len(rows) > max_chunks
+        parts = [
+            chunk_bytes(row)[max(offset - row.byte_offset, 0):]
+            for row in rows[:max_chunks]
+            if row.byte_offset + row.size > offset
+        ]
+        if parts:
+            last = rows[:max_chunks][-1]
+            chunks.append((stream, b"".join(parts), last.byte_offset + last.size))
+    return LogTail(status, chunks, more)
+
+
+def format_event_id(offsets: dict[str, int]) -> str:
+    return ",".join(str(offsets.get(stream, 0)) for stream in STREAMS)
+
+
+def parse_event_id(event_id: str) -> dict[str, int]:
+    """Offsets from a Last-Event-ID: the deploy and app stream offsets, comma-separated."""
+    try:
+        offsets = [int(part) for part in event_id.split(",")]
+    except ValueError:
+        offsets = []
+    if len(offsets) != len(STREAMS) or min(offsets) < 0:
+        raise InvalidOperationException(detail="Invalid Last-Event-ID")
+    return dict(zip(STREAMS, offsets))
+
+
+def _log_event(stream: str, data: bytes, offsets: dict[str, int]) -> str:
+    # One "data:" field per line; the client joins them back with newlines
+    lines = data.decode(errors="replace").replace("\r", "").rstrip("\n").split("\n")
+    fields = "".join(f"data: {line}\n" for line in lines)
+    return f"event: {stream}\nid: {format_event_id(offsets)}\n{fields}\n"
+
+
+async def stream_log_events(
+    db: SessionRunner,
+    deployment_id: UUID,
+    offsets: dict[str, int],
+    poll_seconds: float,
+    heartbeat_seconds: float,
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for a deployment's log: what the streams hold past
+    `offsets`, then new lines as they are committed, until the deployment
+    finishes ("end" event, data = final status).
+
+    Each event carries one stream's new lines and, as its id, the offsets of
+    both streams after it; an EventSource that reconnects sends it back as
+    Last-Event-ID and the tail resumes there. Every read runs on its own short
+    session (`db` should be a get_polling_db_runner runner), so between reads
+    the tail holds only its place in the notifier.
+    """
+    offsets = dict(offsets)
+    with log_tail_notifier.subscribe(deployment_id) as woken:
+        last_sent = time.monotonic()
+        while True:
+            woken.clear()
+            tail = await db.run(read_log_tail, deployment_id, offsets)
+            for stream, data, end in tail.chunks:
+                offsets[stream] = end
+                yield _log_event(stream, data, offsets)
+                last_sent = time.monotonic()
+            if tail.more:
+                continue
+            if tail.status is None or tail.status in FINISHED_STATUSES:
+                yield f"event: end\nid: {format_event_id(offsets)}\ndata: {tail.status or 'deleted'}\n\n"
+                return
+
+            try:
+                await asyncio.wait_for(woken.wait(), min(poll_seconds, heartbeat_seconds))
+            except asyncio.TimeoutError:
+                pass
+            if time.monotonic() - last_sent >= heartbeat_seconds:
+                yield ": heartbeat\n\n"
+                last_sent = time.monotonic()
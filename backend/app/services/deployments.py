@@ -1,71 +1,152 @@
+import asyncio
 import time
+from typing import Optional
 from uuid import UUID
 
-from fastapi import BackgroundTasks
 from sqlalchemy.orm import Session
 
-from app.core.database import SessionLocal
+from app.core.config import settings
+from app.core.db_runner import SessionRunner
 from app.core.exceptions import ResourceNotFoundException, InvalidOperationException
+from app.core.pagination import Page, decode_cursor
 from app.models.deployment import Deployment
-from app.schemas.deployment import DeploymentCreate
+from app.schemas.deployment import DeploymentCreate, DeploymentLogsRead
+from app.services import deployment_logs as deployment_logs_service
 from app.services import environments as environments_service
+from app.services import rollout_scheduler
+from app.services.deployment_logs import (
+    APP_STREAM,
+    DEPLOY_STREAM,
+    FINISHED_STATUSES,
+    DeploymentLogWriter,
+    log_tail_notifier,
+)
 import app.repositories.deployments as deployments_repo
 import app.repositories.environments as environments_repo
 
 
-def run_deployment(deployment_id, db_factory=SessionLocal):
-    db: Session = db_factory()
-    try:
-        dep = deployments_repo.get_deployment_by_id(db, deployment_id)
-        if not dep:
-            return
+# The simulated rollout waits this long between its first and last step
+DEPLOY_STEP_SECONDS = 2.0
 
-        env = environments_repo.get_environment_by_id(db, dep.environment_id)
-        if not env:
-            dep.status = "failed"
-            deployments_repo.save_deployment(db, dep)
-            return
 
-        # Simulate "deploying"
-        dep.status = "running"
-        logs = [
-            f"[{time.strftime('%H:%M:%S')}] Starting deployment for version {dep.version}...",
-            f"[{time.strftime('%H:%M:%S')}] Validating environment {env.name}...",
-            f"[{time.strftime('%H:%M:%S')}] Pulling container images...",
-        ]
-        dep.logs = "\n".join(logs)
-        deployments_repo.save_deployment(db, dep)
+def _log(log: DeploymentLogWriter, stream: str, message: str) -> None:
+    log.write(stream, f"[{time.strftime('%H:%M:%S')}] {message}")
+
+
+def begin_rollout(db: Session, deployment_id: UUID) -> Optional[UUID]:
+    """
+    First step of a rollout: mark the deployment running. Returns its
+    environment's id, or None when there is nothing to roll out.
+    """
+    dep = deployments_repo.get_deployment_by_id(db, deployment_id)
+    # Jobs run at least once: a retried job may find its deployment already done
+    if not dep or dep.status in FINISHED_STATUSES:
+        return None
 
-        time.sleep(2)
-
-        # Simulate "app logs"
-        app_logs = [
-            f"[{time.strftime('%H:%M:%S')}] [INFO] Starting application...",
-            f"[{time.strftime('%H:%M:%S')}] [INFO] Initializing app modules...",
-            f"[{time.strftime('%H:%M:%S')}] [DEBUG] Database connection pool initialized.",
-            f"[{time.strftime('%H:%M:%S')}] [INFO] Application listening on port 8080.",
-            f"[{time.strftime('%H:%M:%S')}] [INFO] Health check: OK",
-        ]
-        dep.app_logs = "\n".join(app_logs)
-
-        # In real life: helm upgrade / kubectl apply / etc.
-        logs.extend([
-            f"[{time.strftime('%H:%M:%S')}] Applying Kubernetes manifests...",
-            f"[{time.strftime('%H:%M:%S')}] Deployment successful.",
-            f"[{time.strftime('%H:%M:%S')}] Load balancer updated.",
-        ])
-        dep.status = "succeeded"
-        dep.logs = "\n".join(logs)
-        dep.logs_url = f"/environments/{env.id}/deployments/{dep.id}/logs"
+    env = environments_repo.get_environment_by_id(db, dep.environment_id)
+    if not env:
+        dep.status = "failed"
         deployments_repo.save_deployment(db, dep)
+        DeploymentLogWriter(db, dep.id).seal()
+        log_tail_notifier.announce(db, dep.id)
+        db.commit()
+        return None
+
+    # Latest wins: a deployment queued since this one was gives way to it
+    newer = rollout_scheduler.newer_deployment(db, dep)
+    if newer:
+        rollout_scheduler.supersede(db, dep, newer)
+        db.commit()
+        rollout_scheduler.rollout_stats.record(superseded_on_start=1)
+        return None
+
+    log = DeploymentLogWriter(db, dep.id)
+    # Simulate "deploying"
+    dep.status = "running"
+    _log(log, DEPLOY_STREAM, f"Starting deployment for version {dep.version}...")
+    _log(log, DEPLOY_STREAM, f"Validating environment {env.name}...")
+    _log(log, DEPLOY_STREAM, "Pulling container images...")
+    log.flush()
+    deployments_repo.save_deployment(db, dep)
+    log_tail_notifier.announce(db, dep.id)
+    # Each step commits on its own so progress is visible while the deployment runs
+    db.commit()
+    return env.id
+
+
+def complete_rollout(db: Session, deployment_id: UUID, env_id: UUID) -> None:
+    """Last step of a rollout: write the app's logs and mark the deployment succeeded."""
+    dep = deployments_repo.get_deployment_by_id(db, deployment_id)
+    if not dep:
+        return
+
+    log = DeploymentLogWriter(db, dep.id)
+    # Simulate "app logs"
+    _log(log, APP_STREAM, "[INFO] Starting application...")
+    _log(log, APP_STREAM, "[INFO] Initializing app modules...")
+    _log(log, APP_STREAM, "[DEBUG] Database connection pool initialized.")
+    _log(log, APP_STREAM, "[INFO] Application listening on port 8080.")
+    _log(log, APP_STREAM, "[INFO] Health check: OK")
+
+    # In real life: helm upgrade / kubectl apply / etc.
+    _log(log, DEPLOY_STREAM, "Applying Kubernetes manifests...")
+    _log(log, DEPLOY_STREAM, "Deployment successful.")
+    _log(log, DEPLOY_STREAM, "Load balancer updated.")
+    log.seal()
+    dep.status = "succeeded"
+    dep.logs_url = f"/environments/{env_id}/deployments/{dep.id}/logs"
+    deployments_repo.save_deployment(db, dep)
+    log_tail_notifier.announce(db, dep.id)
+    db.commit()
+
+
+def interrupt_rollout(db: Session, deployment_id: UUID) -> None:
+    dep = deployments_repo.get_deployment_by_id(db, deployment_id)
+    # Cancelled before begin_rollout committed: nothing was started
+    if not dep or dep.status != "running":
+        return
+    log = DeploymentLogWriter(db, deployment_id)
+    _log(log, DEPLOY_STREAM, "Deployment interrupted; it will be retried.")
+    # The retried run appends after the compacted chunks
+    log.seal()
+    log_tail_notifier.announce(db, deployment_id)
+    db.commit()
+
+
+async def run_deployment(
+    deployment_id: UUID, db: SessionRunner, step_seconds: float = DEPLOY_STEP_SECONDS
+) -> None:
+    """
+    Roll a deployment out. Each step is a short unit of DB work that commits
+    on its own (`db` should give every run its own session, as
+    get_polling_db_runner's runners do); between steps the rollout only
+    awaits, holding no thread or connection, so one process can drive
+    thousands at once. Cancelling it (worker shutdown) notes the interruption
+    in the log; the job is retried.
+    """
+    try:
+        env_id = await db.run(begin_rollout, deployment_id)
+        if env_id is None:
+            return
+        await asyncio.sleep(step_seconds)
+    except asyncio.CancelledError:
+        await asyncio.shield(db.run(interrupt_rollout, deployment_id))
+        raise
+    await db.run(complete_rollout, deployment_id, env_id)
+
 
-    finally:
-        db.close()
+def fail_deployment(db: Session, deployment_id: UUID) -> None:
+    """Give up on a deployment whose job is dead-lettered; the caller commits."""
+    dep = deployments_repo.get_deployment_by_id(db, deployment_id)
+    if dep and dep.status not in FINISHED_STATUSES:
+        dep.status = "failed"
+        deployments_repo.save_deployment(db, dep)
+        DeploymentLogWriter(db, deployment_id).seal()
+        log_tail_notifier.announce(db, deployment_id)
 
 
 def create_deployment(
     db: Session,
-    background_tasks: BackgroundTasks,
     env_id: UUID,
     dep_in: DeploymentCreate,
     user_id: UUID,
@@ -85,27 +166,65 @@ def create_deployment(
 
     dep = deployments_repo.create_deployment(db, dep)
 
-    background_tasks.add_task(run_deployment, dep.id, SessionLocal)
+    # Run by a worker once this request commits, after the environment's current rollout
+    rollout_scheduler.schedule_rollout(db, dep)
 
     return dep
 
 
-def list_deployments(db: Session, env_id: UUID, user_id: UUID) -> list[Deployment]:
-    environments_service.get_environment_by_id_for_user(db, env_id, user_id)
-    return deployments_repo.list_deployments_by_environment(db, env_id)
+def list_deployments(
+    db: Session,
+    env_id: UUID,
+    user_id: UUID,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Page[Deployment]:
+    deployments = deployments_repo.list_deployments_by_environment_and_owner(
+        db, env_id, user_id, limit or settings.page_size_default, decode_cursor(cursor)
+    )
+    if deployments is None:
+        raise ResourceNotFoundException(detail="Environment not found")
+    return deployments
 
 
 def get_deployment_by_id(db: Session, deployment_id: UUID, user_id: UUID) -> Deployment:
-    dep = deployments_repo.get_deployment_by_id(db, deployment_id)
+    # Ownership (deployment → env → project → owner) is checked in the same query
+    dep = deployments_repo.get_deployment_by_id_and_owner(db, deployment_id, user_id)
     if not dep:
         raise ResourceNotFoundException(detail="Deployment not found")
+    return dep
 
-    # verify env → project → owner
-    try:
-        environments_service.get_environment_by_id_for_user(
-            db, dep.environment_id, user_id
-        )
-    except ResourceNotFoundException:
-        raise ResourceNotFoundException(detail="Deployment not found")
 
-    return dep
+def get_deployment_logs(
+    db: Session,
+    deployment_id: UUID,
+    user_id: UUID,
+    deploy_since_offset: int = 0,
+    app_since_offset: int = 0,
+    tail: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> DeploymentLogsRead:
+    """
+    Both log streams, or a window of each (see deployment_logs.read_log_window),
+    with the offset to read each from next. An empty stream reads as a placeholder.
+    """
+    since = {DEPLOY_STREAM: deploy_since_offset, APP_STREAM: app_since_offset}
+    if not any(since.values()) and tail is None and max_bytes is None:
+        # Whole streams, read together with the ownership check
+        logs = deployment_logs_service.read_logs_for_user(db, deployment_id, user_id)
+        windows = {stream: (data, len(data), len(data)) for stream, data in logs.items()}
+    else:
+        get_deployment_by_id(db, deployment_id, user_id)
+        windows = {}
+        for stream, since_offset in since.items():
+            window = deployment_logs_service.read_log_window(db, deployment_id, stream, since_offset, tail, max_bytes)
+            windows[stream] = (deployment_logs_service.log_as_text(window), window.end, window.size)
+
+    deploy_logs, deploy_next, deploy_size = windows.get(DEPLOY_STREAM, (b"", 0, 0))
+    app_logs, app_next, app_size = windows.get(APP_STREAM, (b"", 0, 0))
+    return DeploymentLogsRead(
+        deployment_logs=deploy_logs.decode(errors="replace") if deploy_size else "No logs available for this deployment.",
+        app_logs=app_logs.decode(errors="replace") if app_size else "No app logs available yet...",
+        deployment_logs_next_offset=deploy_next,
+        app_logs_next_offset=app_next,
+    )
@@ -1,10 +1,18 @@
 import logging
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
+
+from sqlalchemy.orm import Session
+
 from app.core.config import settings
+from app.core.database import after_commit
 
 logger = logging.getLogger("envctl")
 
+# SMTP is slow blocking I/O: it runs here, never on the event loop or inside a DB step
+_mail_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="email")
+
 
 def _get_verification_link(token: str) -> str:
     return f"{settings.frontend_url}/verify-email?token={token}"
@@ -14,10 +22,11 @@ def _get_reset_link(token: str) -> str:
     return f"{settings.frontend_url}/reset-password?token={token}"
 
 
-def send_verification_email(email: str, token: str) -> str | None:
+def send_verification_email(email: str, token: str, db: Session | None = None) -> str | None:
     """
     Send verification email based on settings.email_mode.
     Returns the link if in 'mock_api' mode, otherwise returns None.
+    With `db`, a real email goes out only once its transaction commits.
     """
     link = _get_verification_link(token)
     mode = settings.email_mode
@@ -32,18 +41,20 @@ def send_verification_email(email: str, token: str) -> str | None:
         logger.info(f"MOCK EMAIL (API): Verification link for {email} prepared for API response.")
         return link
     elif mode == "real":
-        _send_real_email(
+        _queue_real_email(
             email,
             "Verify your email",
             f"Please click here to verify your email: {link}",
+            db,
         )
     
     return None
 
 
-def send_password_reset_email(email: str, token: str) -> str | None:
+def send_password_reset_email(email: str, token: str, db: Session | None = None) -> str | None:
     """
     Send password reset email based on settings.email_mode.
+    With `db`, a real email goes out only once its transaction commits.
     """
     link = _get_reset_link(token)
     mode = settings.email_mode
@@ -57,15 +68,27 @@ def send_password_reset_email(email: str, token: str) -> str | None:
     elif mode == "mock_api":
         return link
     elif mode == "real":
-        _send_real_email(
+        _queue_real_email(
             email,
             "Reset your password",
             f"Please click here to reset your password: {link}",
+            db,
         )
     
     return None
 
 
+def _queue_real_email(to_email: str, subject: str, body: str, db: Session | None) -> None:
+    def send() -> None:
+        _mail_executor.submit(_send_real_email, to_email, subject, body)
+
+    if db is not None:
+        # The link carries a token that only works once the transaction is committed
+        after_commit(db, send)
+    else:
+        send()
+
+
 def _send_real_email(to_email: str, subject: str, body: str):
     """
     Actually send an email using SMTP.
@@ -1,16 +1,17 @@
+from typing import Optional
 from uuid import UUID
 from datetime import datetime, timedelta, timezone
 
 from sqlalchemy.orm import Session
-from fastapi import BackgroundTasks
+from app.core.config import settings
 from app.core.exceptions import ResourceNotFoundException
+from app.core.pagination import Page, decode_cursor
 
 from app.models.environment import Environment
 from app.schemas.environment import EnvironmentCreate
+from app.services import jobs as jobs_service
 from app.services import projects as projects_service
 import app.repositories.environments as environments_repo
-from app.services.provisioning import provision_environment
-from app.core.database import SessionLocal
 
 
 def create_environment_for_project(
@@ -18,7 +19,6 @@ def create_environment_for_project(
     project_id: UUID,
     env_in: EnvironmentCreate,
     user_id: UUID,
-    background_tasks: BackgroundTasks,
 ) -> Environment:
     project = projects_service.get_project_by_id_for_user(db, project_id, user_id)
 
@@ -35,32 +35,34 @@ def create_environment_for_project(
 
     env = environments_repo.create_environment(db, env)
 
-    # fake background provisioning
-    background_tasks.add_task(provision_environment, env.id, SessionLocal)
+    # fake background provisioning, run by a worker once this request commits
+    jobs_service.enqueue_job(db, jobs_service.PROVISION_ENVIRONMENT, {"environment_id": str(env.id)})
 
     return env
 
 
 def get_environments_for_project(
-    db: Session, project_id: UUID, user_id: UUID
-) -> list[Environment]:
-    projects_service.get_project_by_id_for_user(db, project_id, user_id)
-    return environments_repo.get_environments_for_project(db, project_id)
+    db: Session,
+    project_id: UUID,
+    user_id: UUID,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Page[Environment]:
+    environments = environments_repo.get_environments_for_project_and_owner(
+        db, project_id, user_id, limit or settings.page_size_default, decode_cursor(cursor)
+    )
+    if environments is None:
+        raise ResourceNotFoundException(detail="Project not found")
+    return environments
 
 
 def get_environment_by_id_for_user(
     db: Session, env_id: UUID, user_id: UUID
 ) -> Environment:
-    env = environments_repo.get_environment_by_id(db, env_id)
+    # Ownership (env → project → owner) is checked in the same query
+    env = environments_repo.get_environment_by_id_and_owner(db, env_id, user_id)
     if not env:
         raise ResourceNotFoundException(detail="Environment not found")
-
-    # verify ownership via project
-    try:
-        projects_service.get_project_by_id_for_user(db, env.project_id, user_id)
-    except ResourceNotFoundException:
-        raise ResourceNotFoundException(detail="Environment not found")
-
     return env
 
 
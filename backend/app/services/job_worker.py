@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db_runner import SessionRunner, get_polling_db_runner
+from app.core.metrics import register_collector
+from app.services import deployments as deployments_service
+from app.services import jobs as jobs_service
+from app.services import provisioning as provisioning_service
+import app.repositories.jobs as jobs_repo
+
+logger = logging.getLogger("envctl")
+
+
+class JobKind(NamedTuple):
+    # Runs the job: a coroutine of (payload, runner that gives each DB step its own session)
+    run: Callable[[dict, SessionRunner], Awaitable[None]]
+    # Called when the job is dead-lettered, in the same transaction, to fail its subject
+    dead_letter: Optional[Callable[[dict, Session], None]] = None
+    # At most this many jobs of the kind run at once, across all workers
+    max_running: Optional[int] = None
+
+
+JOB_KINDS: dict[str, JobKind] = {
+    jobs_service.RUN_DEPLOYMENT: JobKind(
+        run=lambda payload, db: deployments_service.run_deployment(UUID(payload["deployment_id"]), db),
+        dead_letter=lambda payload, db: deployments_service.fail_deployment(db, UUID(payload["deployment_id"])),
+        max_running=settings.rollout_max_concurrent or None,
+    ),
+    jobs_service.PROVISION_ENVIRONMENT: JobKind(
+        run=lambda payload, db: provisioning_service.provision_environment(UUID(payload["environment_id"]), db),
+        dead_letter=lambda payload, db: provisioning_service.fail_provisioning(db, UUID(payload["environment_id"])),
+    ),
+}
+
+
+class JobWorker:
+    """
+    Claims due jobs from the jobs table and runs them as asyncio tasks, up to
+    `concurrency` at a time. A job awaits between short DB steps, each on its
+    own session, so a job that is waiting holds no thread or connection.
+
+    A claim is a lease: the worker renews it while the job runs, and if the
+    worker dies, another one claims the job again once the lease expires. So
+    a job runs at least once, and handlers must tolerate a second run. The
+    handler's steps are fenced on the claim (jobs_service.FencedRunner): a
+    worker that lost the job stops at its next step and records nothing, and
+    a renewal that finds the job claimed again cancels its handler. A job
+    that raises is retried with exponential backoff; after max_attempts it is
+    dead-lettered (kept with status "dead" and its last error) and its kind's
+    dead_letter hook fails the subject. A job cancelled at shutdown is put
+    back in the queue at once, without backoff.
+
+    Kinds with max_running are claimed apart from the rest, one worker at a
+    time (jobs_repo.lock_claims), up to what the cap leaves.
+    """
+
+    def __init__(
+        self,
+        db: SessionRunner,
+        kinds: dict[str, JobKind],
+        concurrency: int,
+        poll_seconds: float,
+        visibility_timeout_seconds: float,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+        shutdown_grace_seconds: float,
+        worker_id: Optional[str] = None,
+    ):
+        self.db = db
+        self.kinds = kinds
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.visibility_timeout_seconds = visibility_timeout_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.shutdown_grace_seconds = shutdown_grace_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: dict[asyncio.Task, Row] = {}
+        # Tasks inside their job's handler, and those cancelled by renew() for a lost lease
+        self._handling: set[asyncio.Task] = set()
+        self._lost: set[asyncio.Task] = set()
+        # Set in run() when a job ends: its slot is free, and jobs waiting on it
+        # (same concurrency key, or a capped kind) may be claimable
+        self._job_ended: Optional[asyncio.Event] = None
+        self.queue_depth: dict[str, int] = {}
+        self._queue_depth_at = 0.0
+        self.claimed = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.dead = 0
+        self.interrupted = 0
+        self.lease_lost = 0
+
+    def _lease_until(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.visibility_timeout_seconds)
+
+    # Steps run through self.db, each on its own session
+
+    def _claim(self, db: Session, limit: int) -> list[Row]:
+        now = datetime.now(timezone.utc)
+        capped = {name: kind.max_running for name, kind in self.kinds.items() if kind.max_running}
+        jobs = []
+        for name, max_running in capped.items():
+            jobs_repo.lock_claims(db, name)
+            room = min(max_running - jobs_repo.count_running_jobs(db, name, now), limit - len(jobs))
+            if room > 0:
+                jobs += jobs_repo.claim_jobs(db, self.worker_id, now, self._lease_until(), room, kinds=[name])
+        if limit > len(jobs):
+            jobs += jobs_repo.claim_jobs(
+                db, self.worker_id, now, self._lease_until(), limit - len(jobs), except_kinds=list(capped)
+            )
+        if time.monotonic() - self._queue_depth_at >= self.poll_seconds:
+            # Sampled at most once a poll: jobs waiting to run, by kind
+            self.queue_depth = jobs_repo.count_queued_jobs_by_kind(db)
+            self._queue_depth_at = time.monotonic()
+        db.commit()
+        return jobs
+
+    def _renew(self, db: Session, claims: list[tuple[UUID, int]]) -> set[tuple[UUID, int]]:
+        renewed = jobs_repo.renew_leases(db, claims, self._lease_until())
+        db.commit()
+        return renewed
+
+    def _finish(self, db: Session, job: Row) -> None:
+        jobs_repo.finish_job(db, job.id, job.attempts)
+        db.commit()
+
+    def _retry(self, db: Session, job: Row, delay_seconds: float, error: str) -> None:
+        run_after = datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+        jobs_repo.retry_job(db, job.id, job.attempts, run_after, error)
+        db.commit()
+
+    def _dead_letter(self, db: Session, job: Row, kind: Optional[JobKind], error: str) -> None:
+        if jobs_repo.dead_letter_job(db, job.id, job.attempts, error) and kind and kind.dead_letter:
+            kind.dead_letter(job.payload, db)
+        db.commit()
+
+    async def claim(self, limit: int) -> list[Row]:
+        jobs = await self.db.run(self._claim, limit)
+        self.claimed += len(jobs)
+        return jobs
+
+    async def renew(self) -> None:
+        """Extend the leases of the jobs in hand; cancel the handlers of those another worker took."""
+        if not self._tasks:
+            return
+        held = list(self._tasks.items())
+        renewed = await self.db.run(self._renew, [(job.id, job.attempts) for _, job in held])
+        for task, job in held:
+            # Jobs past their handler are being recorded; their claim is checked there
+            if (job.id, job.attempts) not in renewed and task in self._handling:
+                self._lost.add(task)
+                task.cancel()
+
+    async def execute(self, job: Row) -> None:
+        """Run a claimed job and record how it went."""
+        kind = self.kinds.get(job.kind)
+        if kind is None:
+            error = f"Unknown job kind {job.kind!r}"
+        elif job.attempts > job.max_attempts:
+            error = "Lease expired during the last attempt"
+        else:
+            task = asyncio.current_task()
+            try:
+                self._handling.add(task)
+                try:
+                    await kind.run(job.payload, jobs_service.FencedRunner(self.db, job.id, job.attempts))
+                finally:
+                    self._handling.discard(task)
+            except jobs_service.LeaseLost:
+                # The job's new run records the outcome
+                logger.warning(f"Job {job.id} ({job.kind}) lost its lease during attempt {job.attempts}; stopped.")
+                self.lease_lost += 1
+                return
+            except asyncio.CancelledError:
+                if task in self._lost:
+                    # Cancelled by renew(): the job's new run records the outcome
+                    logger.warning(f"Job {job.id} ({job.kind}) lost its lease during attempt {job.attempts}; cancelled.")
+                    self.lease_lost += 1
+                    return
+                # Shutdown: hand the job to the next worker now rather than at lease expiry
+                await asyncio.shield(self.db.run(self._retry, job, 0, "Interrupted by worker shutdown"))
+                self.interrupted += 1
+                raise
+            except Exception as e:
+                logger.exception(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}")
+                error = f"{type(e).__name__}: {e}"
+            else:
+                await self.db.run(self._finish, job)
+                self.succeeded += 1
+                return
+
+        if kind is not None and job.attempts < job.max_attempts:
+            delay = jobs_service.retry_delay_seconds(job.attempts, self.retry_base_seconds, self.retry_max_seconds)
+            await self.db.run(self._retry, job, delay, error)
+            self.retried += 1
+            return
+
+        logger.error(f"Job {job.id} ({job.kind}) dead-lettered after {job.attempts} attempts: {error}")
+        await self.db.run(self._dead_letter, job, kind, error)
+        self.dead += 1
+
+    def _start(self, job: Row) -> None:
+        task = asyncio.create_task(self.execute(job), name=f"job-{job.id}")
+        self._tasks[task] = job
+        task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.pop(task, None)
+        self._lost.discard(task)
+        if self._job_ended is not None:
+            self._job_ended.set()
+        if not task.cancelled() and task.exception() is not None:
+            # Recording the outcome failed: the lease expires and the job runs again
+            logger.error(f"Job {task.get_name()} ended unrecorded: {task.exception()}")
+
+    async def run_once(self) -> int:
+        """Claim one batch of due jobs and run it to the end; the number of jobs run."""
+        jobs = await self.claim(self.concurrency)
+        await asyncio.gather(*(self.execute(job) for job in jobs))
+        return len(jobs)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Claim and run jobs until `stop` is set. Then claim no more, give the
+        jobs in hand shutdown_grace_seconds to finish (leases still renewed),
+        and cancel the rest.
+        """
+        logger.info(f"Job worker {self.worker_id} started ({self.concurrency} at a time).")
+        renew_every = self.visibility_timeout_seconds / 3
+        renewed = time.monotonic()
+        self._job_ended = job_ended = asyncio.Event()
+        with jobs_service.jobs_enqueued.subscribe() as woken:
+            while not stop.is_set():
+                free = self.concurrency - len(self._tasks)
+                jobs = []
+                try:
+                    if self._tasks and time.monotonic() - renewed >= renew_every:
+                        await self.renew()
+                        renewed = time.monotonic()
+                    # Cleared before claiming: a commit or a job ending from now on ends the wait below
+                    woken.clear()
+                    job_ended.clear()
+                    jobs = await self.claim(free) if free else []
+                except Exception as e:
+                    logger.error(f"Job worker could not reach the database: {e}")
+                for job in jobs:
+                    self._start(job)
+                if jobs and len(jobs) == free:
+                    await asyncio.sleep(0)  # Let the new jobs start, then claim again
+                    continue
+
+                # Nothing more to claim for now: wait for a job to end, for a commit in
+                # this process (unless full), for the next poll, or for stop
+                waiters = [asyncio.ensure_future(stop.wait()), asyncio.ensure_future(job_ended.wait())]
+                if len(self._tasks) < self.concurrency:
+                    waiters.append(asyncio.ensure_future(woken.wait()))
+                await asyncio.wait(
+                    waiters, timeout=min(self.poll_seconds, renew_every), return_when=asyncio.FIRST_COMPLETED
+                )
+                for waiter in waiters:
+                    waiter.cancel()
+
+            deadline = time.monotonic() + self.shutdown_grace_seconds
+            while self._tasks and time.monotonic() < deadline:
+                await asyncio.wait(list(self._tasks), timeout=min(renew_every, deadline - time.monotonic()))
+                try:
+                    await self.renew()
+                except Exception as e:
+                    logger.error(f"Job worker could not renew leases: {e}")
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._job_ended = None
+        logger.info(f"Job worker {self.worker_id} stopped.")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "running": len(self._tasks),
+            "claimed": self.claimed,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "dead": self.dead,
+            "interrupted": self.interrupted,
+            "lease_lost": self.lease_lost,
+            "queue_depth": dict(self.queue_depth),
+        }
+
+
+job_worker = JobWorker(
+    db=get_polling_db_runner(),
+    kinds=JOB_KINDS,
+    concurrency=settings.job_worker_concurrency,
+    poll_seconds=settings.job_poll_seconds,
+    visibility_timeout_seconds=settings.job_visibility_timeout_seconds,
+    retry_base_seconds=settings.job_retry_base_seconds,
+    retry_max_seconds=settings.job_retry_max_seconds,
+    shutdown_grace_seconds=settings.job_shutdown_grace_seconds,
+)
+
+register_collector("jobs", job_worker.stats)
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypeVar
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import after_commit
+from app.core.db_runner import SessionRunner
+from app.models.job import Job
+import app.repositories.jobs as jobs_repo
+
+# Job kinds; app.services.job_worker maps each to the function that runs it
+RUN_DEPLOYMENT = "run_deployment"
+PROVISION_ENVIRONMENT = "provision_environment"
+
+T = TypeVar("T")
+
+
+class LeaseLost(Exception):
+    """The worker no longer holds the job: its lease expired and the job was claimed again."""
+
+
+class FencedRunner:
+    """
+    The runner a job's handler gets: every step first checks, in the step's
+    own transaction, that the worker still holds its claim (id and attempts),
+    and keeps the job row locked until the step commits. A worker whose lease
+    was lost stops at its next step with LeaseLost instead of writing next to
+    the job's new run.
+    """
+
+    def __init__(self, db: SessionRunner, job_id: UUID, attempts: int):
+        self.db = db
+        self.job_id = job_id
+        self.attempts = attempts
+
+    def _fenced(self, db: Session, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if not jobs_repo.hold_claim(db, self.job_id, self.attempts):
+            db.rollback()
+            raise LeaseLost(f"Job {self.job_id} was claimed again after attempt {self.attempts}")
+        return fn(db, *args, **kwargs)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self.db.run(self._fenced, fn, *args, **kwargs)
+
+
+class JobsEnqueued:
+    """
+    Wakes the workers of this process when a transaction that enqueued jobs
+    commits, so they pick the jobs up at once; set() is safe from any thread.
+    Workers in other processes find the jobs on their next poll.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Event]:
+        """An event set on every set(), until the block exits."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def set(self) -> None:
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The worker's event loop is closed
+
+
+jobs_enqueued = JobsEnqueued()
+
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: dict,
+    max_attempts: Optional[int] = None,
+    concurrency_key: Optional[str] = None,
+) -> Job:
+    """
+    Queue a job in the caller's transaction: it becomes visible to workers
+    when that commits, and is dropped with it on rollback. Jobs that share a
+    concurrency_key run one at a time, in the order they were queued.
+    """
+    job = jobs_repo.create_job(
+        db,
+        Job(
+            kind=kind,
+            payload=payload,
+            max_attempts=max_attempts or settings.job_max_attempts,
+            concurrency_key=concurrency_key,
+        ),
+    )
+    after_commit(db, jobs_enqueued.set)
+    return job
+
+
+def retry_delay_seconds(attempts: int, base_seconds: float, max_seconds: float) -> float:
+    """Backoff before the next attempt of a job that failed `attempts` times: doubles each time."""
+    return min(base_seconds * 2 ** (attempts - 1), max_seconds)
@@ -1,14 +1,21 @@
+from typing import Optional
 from uuid import UUID
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.exceptions import ResourceNotFoundException
+from app.core.pagination import Page, decode_cursor
 
 from app.models.project import Project
 from app.schemas.project import ProjectCreate
 import app.repositories.projects as projects_repo
 
 
-def get_projects_for_user(db: Session, user_id: UUID) -> list[Project]:
-    return projects_repo.get_projects_by_owner(db, user_id)
+def get_projects_for_user(
+    db: Session, user_id: UUID, cursor: Optional[str] = None, limit: Optional[int] = None
+) -> Page[Project]:
+    return projects_repo.get_projects_by_owner(
+        db, user_id, limit or settings.page_size_default, decode_cursor(cursor)
+    )
 
 
 def create_project_for_user(
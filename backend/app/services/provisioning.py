@@ -1,30 +1,49 @@
-import time
+import asyncio
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 
+from app.core.db_runner import SessionRunner
 import app.repositories.environments as environments_repo
 
+# Simulated provisioning time
+PROVISION_SECONDS = 2.0
 
-def provision_environment(env_id, db_factory):
-    # db_factory will be SessionLocal, to avoid keeping a session across threads
-    db: Session = db_factory()
-    try:
-        env = environments_repo.get_environment_by_id(db, env_id)
 
-        if not env:
-            return
+def environment_exists(db: Session, env_id) -> bool:
+    return environments_repo.get_environment_by_id(db, env_id) is not None
 
-        # simulate work
-        time.sleep(2)
 
-        # fake URL (in real life, from ingress / K8s / etc)
-        env.status = "running"
-        env.base_url = f"https://{env.id}.envctl.local"
+def mark_provisioned(db: Session, env_id) -> None:
+    env = environments_repo.get_environment_by_id(db, env_id)
+    if not env:
+        return
 
-        # optionally set expiry for ephemeral envs
-        if env.type == "ephemeral" and env.expires_at is None:
-            env.expires_at = datetime.now(timezone.utc) + timedelta(hours=24)
+    # fake URL (in real life, from ingress / K8s / etc)
+    env.status = "running"
+    env.base_url = f"https://{env.id}.envctl.local"
 
+    # optionally set expiry for ephemeral envs
+    if env.type == "ephemeral" and env.expires_at is None:
+        env.expires_at = datetime.now(timezone.utc) + timedelta(hours=24)
+
+    environments_repo.save_environment(db, env)
+    db.commit()
+
+
+async def provision_environment(env_id, db: SessionRunner, step_seconds: float = PROVISION_SECONDS) -> None:
+    # Like run_deployment: a session per step, none held while waiting
+    if not await db.run(environment_exists, env_id):
+        return
+
+    # simulate work
+    await asyncio.sleep(step_seconds)
+
+    await db.run(mark_provisioned, env_id)
+
+
+def fail_provisioning(db: Session, env_id) -> None:
+    """Give up on an environment whose provisioning job is dead-lettered; the caller commits."""
+    env = environments_repo.get_environment_by_id(db, env_id)
+    if env and env.status == "provisioning":
+        env.status = "failed"
         environments_repo.save_environment(db, env)
-    finally:
-        db.close()
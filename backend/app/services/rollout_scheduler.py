@@ -0,0 +1,91 @@
+import threading
+import time
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import after_commit
+from app.core.metrics import register_collector
+from app.models.deployment import Deployment
+from app.services import jobs as jobs_service
+from app.services.deployment_logs import DEPLOY_STREAM, FINISHED_STATUSES, DeploymentLogWriter, log_tail_notifier
+import app.repositories.deployments as deployments_repo
+import app.repositories.jobs as jobs_repo
+
+# Rollouts are jobs keyed by environment, so an environment runs one at a time
+# (jobs_repo.claim_jobs). The newest deployment of an environment wins: queuing one
+# drops the rollouts still waiting for that environment, and a rollout that starts
+# after a newer deployment was created gives way to it. The deployments left out are
+# marked "superseded". The job worker caps rollouts across workers at
+# ROLLOUT_MAX_CONCURRENT (JOB_KINDS).
+
+
+def environment_key(env_id: UUID) -> str:
+    return f"environment:{env_id}"
+
+
+class RolloutStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Waiting rollouts dropped when a newer deployment of the environment was queued
+        self.coalesced = 0
+        # Rollouts that found a newer deployment of the environment when they started
+        self.superseded_on_start = 0
+
+    def record(self, coalesced: int = 0, superseded_on_start: int = 0) -> None:
+        with self._lock:
+            self.coalesced += coalesced
+            self.superseded_on_start += superseded_on_start
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "max_concurrent": settings.rollout_max_concurrent,
+                "coalesced": self.coalesced,
+                "superseded_on_start": self.superseded_on_start,
+            }
+
+
+rollout_stats = RolloutStats()
+
+register_collector("rollouts", rollout_stats.stats)
+
+
+def supersede(db: Session, dep: Deployment, newer: Deployment) -> None:
+    """Mark a deployment that will not run as replaced by `newer`; the caller commits."""
+    dep.status = "superseded"
+    deployments_repo.save_deployment(db, dep)
+    log = DeploymentLogWriter(db, dep.id)
+    log.write(
+        DEPLOY_STREAM,
+        f"[{time.strftime('%H:%M:%S')}] Superseded by version {newer.version} (deployment {newer.id}).",
+    )
+    log.seal()
+    log_tail_notifier.announce(db, dep.id)
+
+
+def schedule_rollout(db: Session, dep: Deployment) -> None:
+    """
+    Queue the rollout of a new deployment behind its environment's current
+    one, in the caller's transaction, replacing any rollout still waiting.
+    """
+    key = environment_key(dep.environment_id)
+    replaced = jobs_repo.delete_queued_jobs(db, jobs_service.RUN_DEPLOYMENT, key)
+    for payload in replaced:
+        old = deployments_repo.get_deployment_by_id(db, UUID(payload["deployment_id"]))
+        if old and old.status not in FINISHED_STATUSES:
+            supersede(db, old, dep)
+    if replaced:
+        after_commit(db, lambda: rollout_stats.record(coalesced=len(replaced)))
+
+    jobs_service.enqueue_job(db, jobs_service.RUN_DEPLOYMENT, {"deployment_id": str(dep.id)}, concurrency_key=key)
+
+
+def newer_deployment(db: Session, dep: Deployment) -> Optional[Deployment]:
+    """The environment's newest deployment, if it was created after `dep` and has not failed."""
+    newest = deployments_repo.get_newest_deployment_for_environment(db, dep.environment_id)
+    if newest is None or newest.id == dep.id or newest.status == "failed":
+        return None
+    return newest
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import register_collector
+from app.core.revocation import revocation_list
+import app.repositories.sessions as sessions_repo
+
+logger = logging.getLogger("envctl")
+
+REAPER_LOCK_KEY = zlib.crc32(b"sessions:reaper")
+
+
+@contextmanager
+def sweep_lock(db: Session) -> Iterator[bool]:
+    """
+    One sweep at a time across replicas: a session-level Postgres advisory
+    lock on a connection of its own, tried rather than waited for, since a
+    replica that finds it taken has nothing left to do. SQLite is
+    single-host and needs none.
+    """
+    engine = db.get_bind()
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+
+    with engine.connect() as connection:
+        acquired = connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": REAPER_LOCK_KEY}
+        ).scalar_one()
+        connection.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REAPER_LOCK_KEY})
+                connection.commit()
+
+
+class SessionReaper:
+    """
+    Deletes expired and revoked sessions in bounded batches.
+
+    Each batch is its own short transaction, and the reaper pauses between
+    batches, so it never holds locks for long or saturates the database.
+    Replicas take turns (sweep_lock); the one that finds a sweep running skips.
+    Revoked sessions are kept as long as the revocation list may still need
+    them (token session mode).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int,
+        max_batches: int,
+        pause_seconds: float,
+        revoked_retention_seconds: float,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.pause_seconds = pause_seconds
+        self.revoked_retention_seconds = revoked_retention_seconds
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.rows_reaped = 0
+        self.last_run_rows = 0
+        self.table_rows: int | None = None
+
+    def _reap_in_batches(self, delete_batch: Callable[[Session], int], batches_left: int) -> tuple[int, int]:
+        reaped = 0
+        batches = 0
+        while batches < batches_left:
+            db = self.session_factory()
+            try:
+                deleted = delete_batch(db)
+            finally:
+                db.close()
+
+            reaped += deleted
+            batches += 1
+            if deleted < self.batch_size:
+                break
+            time.sleep(self.pause_seconds)
+        return reaped, batches
+
+    def run_once(self) -> int:
+        # One run at a time per process; a second caller just skips
+        if not self._lock.acquire(blocking=False):
+            return 0
+
+        try:
+            db = self.session_factory()
+            try:
+                with sweep_lock(db) as acquired:
+                    if not acquired:
+                        logger.info("Session reaper skipped: another replica is sweeping.")
+                        return 0
+                    expired, revoked = self._sweep()
+                self.table_rows = sessions_repo.estimate_session_count(db)
+            finally:
+                db.close()
+
+            self.runs += 1
+            self.last_run_rows = expired + revoked
+            self.rows_reaped += self.last_run_rows
+            logger.info(
+                f"Session reaper removed {expired} expired and {revoked} revoked sessions "
+                f"(about {self.table_rows} remaining)."
+            )
+            return self.last_run_rows
+        finally:
+            self._lock.release()
+
+    def _sweep(self) -> tuple[int, int]:
+        now = datetime.now(timezone.utc)
+        revoked_before = now - timedelta(seconds=self.revoked_retention_seconds)
+
+        expired, batches = self._reap_in_batches(
+            lambda db: sessions_repo.delete_expired_sessions(db, now, self.batch_size),
+            self.max_batches,
+        )
+        revoked, _ = self._reap_in_batches(
+            lambda db: sessions_repo.delete_revoked_sessions(db, revoked_before, self.batch_size),
+            self.max_batches - batches,
+        )
+        return expired, revoked
+
+    def stats(self) -> dict[str, int | None]:
+        return {
+            "runs": self.runs,
+            "rows_reaped": self.rows_reaped,
+            "last_run_rows": self.last_run_rows,
+            "table_rows": self.table_rows,
+        }
+
+
+session_reaper = SessionReaper(
+    session_factory=SessionLocal,
+    batch_size=settings.session_reaper_batch_size,
+    max_batches=settings.session_reaper_max_batches,
+    pause_seconds=settings.session_reaper_pause_seconds,
+    revoked_retention_seconds=revocation_list.retention_seconds,
+)
+
+register_collector("session_reaper", session_reaper.stats)
@@ -0,0 +1,106 @@
+"""
+Time spent on the database schema when the app boots, against an up-to-date
+database.
+
+Before: every boot ran Base.metadata.create_all() and then inspected the users,
+deployments and sessions tables for missing columns and indexes. After: the
+schema is migrated by `python -m app.cli migrate` before the deploy and boot
+runs check_schema_version(), a single query. Each boot runs in a fresh
+interpreter, so nothing is cached between them.
+
+--db-latency-ms adds a fixed delay to every statement, standing in for the
+network round trip to a database server (see request_concurrency).
+
+    python -m benchmarks.cold_start [--boots 5] [--db-latency-ms 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.request_concurrency import add_statement_latency
+
+
+def legacy_schema_check(engine) -> None:
+    """What startup did before migrations: create_all plus the per-table column checks."""
+    from sqlalchemy import inspect
+
+    from app.core.database import Base
+
+    Base.metadata.create_all(bind=engine)
+    for table in ("users", "deployments"):
+        inspect(engine).get_columns(table)
+    inspect(engine).get_indexes("sessions")
+
+
+def run_child(mode: str, latency_ms: float) -> None:
+    from sqlalchemy import event
+
+    from app.core.database import engine
+    from app.core.migrations import check_schema_version
+
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_):
+        nonlocal statements
+        statements += 1
+
+    if latency_ms > 0:
+        add_statement_latency(engine, latency_ms)
+
+    started = time.perf_counter()
+    if mode == "legacy":
+        legacy_schema_check(engine)
+    else:
+        check_schema_version(engine)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({"ms": elapsed * 1000, "statements": statements}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--boots", type=int, default=5)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Per-statement delay")
+    parser.add_argument("--child", choices=["legacy", "version-check"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.db_latency_ms)
+        return
+
+    print(f"Schema step at boot, up-to-date database, {args.db_latency_ms:g}ms per statement\n")
+    print(f"{'startup':<40}{'statements':>12}{'median':>10}{'max':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp}/bench.db", "APP_ENV": "production"}
+        subprocess.run([sys.executable, "-m", "app.cli", "migrate"], env=env, check=True, capture_output=True)
+
+        for label, mode in [
+            ("create_all + column checks (before)", "legacy"),
+            ("schema version check (after)", "version-check"),
+        ]:
+            runs = []
+            for _ in range(args.boots):
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.cold_start", "--child", mode,
+                     "--db-latency-ms", str(args.db_latency_ms)],
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            timings = [run["ms"] for run in runs]
+            print(
+                f"{label:<40}{runs[0]['statements']:>12}"
+                f"{statistics.median(timings):>8.1f}ms{max(timings):>8.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
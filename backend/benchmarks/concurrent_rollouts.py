@@ -0,0 +1,197 @@
+"""
+How many rollouts one worker process keeps in flight at once.
+
+Queues N deployments and runs them all, each with the simulated rollout's wait
+between its first and last step (--step-seconds). Before: a thread per rollout
+that holds it for the whole rollout, from a pool of --threads (sessions opened
+per step, as the thread-based worker did). After: the asyncio job worker with
+concurrency N, claiming the queued jobs and awaiting between steps on the
+async engine. Each configuration runs in its own interpreter because settings
+are read at import time.
+
+Wall time close to --step-seconds means every rollout was in flight at once;
+the thread pool needs ceil(N / threads) rounds of it.
+
+    python -m benchmarks.concurrent_rollouts [--levels 100,1000,5000] [--step-seconds 2] [--threads 40]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CONFIGURATIONS = [
+    ("thread per rollout (before)", "threads", {"DATABASE_ASYNC": "false"}),
+    # SQLite has a single writer: more connections only add lock retries
+    ("asyncio worker (after)", "asyncio", {"DATABASE_ASYNC": "true", "DB_POOL_SIZE": "1", "DB_MAX_OVERFLOW": "0"}),
+]
+
+
+def queue_deployments(count: int) -> list:
+    from app.core.database import SessionLocal
+    from app.models.deployment import Deployment
+    from app.models.environment import Environment
+    from app.models.project import Project
+    from app.models.user import User
+    from app.services import rollout_scheduler
+
+    with SessionLocal() as db:
+        user = User(email=f"bench-{count}@example.com", password_hash="-")
+        db.add(user)
+        db.flush()
+        project = Project(name=f"bench-{count}", owner_id=user.id)
+        db.add(project)
+        db.flush()
+        # One environment per rollout: an environment runs one rollout at a time
+        envs = [
+            Environment(project_id=project.id, name=f"bench-{i}", status="running", type="ephemeral")
+            for i in range(count)
+        ]
+        db.add_all(envs)
+        db.flush()
+        deployments = [Deployment(environment_id=env.id, version="v1", status="pending") for env in envs]
+        db.add_all(deployments)
+        db.flush()
+        for dep in deployments:
+            rollout_scheduler.schedule_rollout(db, dep)
+        db.commit()
+        return [dep.id for dep in deployments]
+
+
+def run_with_threads(deployment_ids: list, step_seconds: float, threads: int) -> int:
+    """The thread-based runner: a pool thread is held for each rollout's full duration."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.core.database import SessionLocal
+    from app.services.deployments import begin_rollout, complete_rollout
+
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def rollout(deployment_id) -> None:
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        with SessionLocal() as db:
+            env_id = begin_rollout(db, deployment_id)
+        time.sleep(step_seconds)
+        with SessionLocal() as db:
+            complete_rollout(db, deployment_id, env_id)
+        with lock:
+            in_flight -= 1
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(rollout, deployment_ids))
+    return peak
+
+
+async def run_with_asyncio(count: int, step_seconds: float) -> int:
+    from uuid import UUID
+
+    from app.core.config import settings
+    from app.core.db_runner import get_polling_db_runner
+    from app.services.deployments import run_deployment
+    from app.services.job_worker import JOB_KINDS, JobWorker
+
+    # Without ROLLOUT_MAX_CONCURRENT: the benchmark measures what one worker can drive
+    kinds = {"run_deployment": JOB_KINDS["run_deployment"]._replace(
+        run=lambda payload, db: run_deployment(UUID(payload["deployment_id"]), db, step_seconds=step_seconds),
+        max_running=None,
+    )}
+    worker = JobWorker(
+        db=get_polling_db_runner(),
+        kinds=kinds,
+        concurrency=count,
+        poll_seconds=0.1,
+        visibility_timeout_seconds=settings.job_visibility_timeout_seconds,
+        retry_base_seconds=settings.job_retry_base_seconds,
+        retry_max_seconds=settings.job_retry_max_seconds,
+        shutdown_grace_seconds=0,
+    )
+
+    stop = asyncio.Event()
+    running = asyncio.create_task(worker.run(stop))
+    peak = 0
+    while worker.succeeded + worker.dead < count:
+        peak = max(peak, worker.stats()["running"])
+        await asyncio.sleep(0.01)
+    stop.set()
+    await running
+    if worker.succeeded != count:
+        raise RuntimeError(f"{count - worker.succeeded} rollouts did not succeed: {worker.stats()}")
+    return peak
+
+
+def run_child(mode: str, levels: list[int], step_seconds: float, threads: int) -> None:
+    from app.core.database import async_engine, engine
+    from app.core.migrations import run_migrations
+
+    run_migrations(engine)
+    results = []
+    for level in levels:
+        deployment_ids = queue_deployments(level)
+        started = time.perf_counter()
+        if mode == "threads":
+            peak = run_with_threads(deployment_ids, step_seconds, threads)
+        else:
+            peak = asyncio.run(run_with_asyncio(level, step_seconds))
+            # asyncio.run closes its loop: the async pool's connections belong to it
+            asyncio.run(async_engine.dispose())
+        elapsed = time.perf_counter() - started
+        results.append({
+            "rollouts": level,
+            "seconds": elapsed,
+            "rollouts_per_second": level / elapsed,
+            "peak_in_flight": peak,
+        })
+    print(json.dumps(results))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--levels", default="100,1000,5000", help="Comma-separated rollout counts")
+    parser.add_argument("--step-seconds", type=float, default=2.0, help="Simulated wait inside each rollout")
+    parser.add_argument("--threads", type=int, default=40, help="Thread pool size of the before runner")
+    parser.add_argument("--child", choices=["threads", "asyncio"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    if args.child:
+        run_child(args.child, levels, args.step_seconds, args.threads)
+        return
+
+    print(f"Queued rollouts run by one worker, {args.step_seconds:g}s wait per rollout, {args.threads} threads before\n")
+    print(f"{'configuration':<30}{'rollouts':>10}{'wall':>10}{'rollouts/s':>12}{'peak in flight':>16}")
+    for label, mode, overrides in CONFIGURATIONS:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+                # A connection per thread for the before runner
+                "DB_POOL_SIZE": str(args.threads),
+                "APP_ENV": "production",
+                **overrides,
+            }
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.concurrent_rollouts", "--child", mode,
+                 "--levels", args.levels, "--step-seconds", str(args.step_seconds),
+                 "--threads", str(args.threads)],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        for result in json.loads(output.strip().splitlines()[-1]):
+            print(
+                f"{label:<30}{result['rollouts']:>10}{result['seconds']:>9.1f}s"
+                f"{result['rollouts_per_second']:>12.1f}{result['peak_in_flight']:>16}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Login throughput and latency of unrelated endpoints during a login burst.
+
+Runs the app in-process over httpx's ASGI transport against a throwaway SQLite
+database. A burst of concurrent logins is fired while GET /health is polled,
+once with hashing on the shared request threadpool (before) and once on the
+dedicated password hashing pool (after). Each configuration runs in its own
+interpreter because settings are read at import time.
+
+    python -m benchmarks.login_throughput [--logins 64] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchpassword123"
+
+CONFIGURATIONS = [
+    ("shared threadpool (before)", {"PASSWORD_HASH_WORKERS": "0"}),
+    ("dedicated pool (after)", {"PASSWORD_HASH_WORKERS": "2"}),
+]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_burst(app, logins: int, concurrency: int) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    login_latencies: list[float] = []
+    health_latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    done = asyncio.Event()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def login():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/v1/auth/login",
+                    data={"username": EMAIL, "password": PASSWORD},
+                )
+                login_latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def poll_health():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        poller = asyncio.create_task(poll_health())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await poller
+
+    return {
+        "logins_per_second": logins / elapsed,
+        "login_p99_ms": percentile(login_latencies, 99) * 1000,
+        "health_p50_ms": percentile(health_latencies, 50) * 1000,
+        "health_p99_ms": percentile(health_latencies, 99) * 1000,
+        "statuses": statuses,
+    }
+
+
+def run_child(logins: int, concurrency: int) -> None:
+    from app.core.database import SessionLocal, engine
+    from app.core.migrations import run_migrations
+    from app.core.security import hash_password
+    from app.main import app
+    from app.models.user import User
+
+    run_migrations(engine)
+    with SessionLocal() as db:
+        db.add(User(email=EMAIL, password_hash=hash_password(PASSWORD), is_verified=True))
+        db.commit()
+
+    result = asyncio.run(run_burst(app, logins, concurrency))
+    print(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.logins, args.concurrency)
+        return
+
+    print(f"{args.logins} logins, {args.concurrency} concurrent, /health polled every 10ms\n")
+    print(f"{'configuration':<30}{'logins/s':>10}{'login p99':>12}{'health p50':>12}{'health p99':>12}  statuses")
+    for label, overrides in CONFIGURATIONS:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+                "PASSWORD_HASH_MAX_PENDING": str(args.logins),
+                "APP_ENV": "production",
+                **overrides,
+            }
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.login_throughput", "--child",
+                 "--logins", str(args.logins), "--concurrency", str(args.concurrency)],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{label:<30}{result['logins_per_second']:>10.1f}"
+            f"{result['login_p99_ms']:>10.0f}ms{result['health_p50_ms']:>10.0f}ms"
+            f"{result['health_p99_ms']:>10.0f}ms  {result['statuses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Cost of listing an environment's deployments: the unbounded list the endpoint
+used to return versus keyset pages, at 10k and 1M rows.
+
+Each size gets a throwaway SQLite database, migrated to head and filled with
+deployments of one environment (the worst case for a single list). Timings
+cover what the endpoint does per request: the query, loading rows into the ORM
+and serializing the response body. OFFSET paging is shown for contrast: its
+cost grows with the depth of the page, while a keyset page seeks straight to
+its cursor through the (environment_id, created_at, id) index.
+
+--log-kb gives each deployment's deploy and app log streams that many KB of
+text, in chunks; list pages should cost the same whatever the log size.
+
+The unbounded list at 1M rows takes a few GB of memory and about half a
+minute; lower --full-max-rows to skip it.
+
+    python -m benchmarks.pagination [--sizes 10000,1000000] [--limit 100] [--log-kb 0]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+
+def timed(fn, repeat: int) -> tuple[float, object]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, result
+
+
+def fill(engine, env_id: uuid.UUID, rows: int, log_kb: int) -> None:
+    from sqlalchemy import insert
+
+    from app.models.deployment import Deployment
+    from app.models.deployment_log_chunk import DeploymentLogChunk
+    from app.services.deployment_logs import APP_STREAM, CHUNK_MAX_BYTES, DEPLOY_STREAM, make_chunk
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    log = ("x" * 1023 + "\n").encode() * log_kb
+    pieces = [make_chunk(log[at:at + CHUNK_MAX_BYTES]) for at in range(0, len(log), CHUNK_MAX_BYTES)]
+    batch = 20_000
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch):
+            deployments = [
+                {
+                    "id": uuid.uuid4(),
+                    "environment_id": env_id,
+                    "version": f"build-{i}",
+                    "status": "succeeded",
+                    "logs_url": f"/environments/{env_id}/deployments/{i}/logs",
+                    "created_at": start + timedelta(seconds=i),
+                    "updated_at": start + timedelta(seconds=i),
+                }
+                for i in range(offset, min(offset + batch, rows))
+            ]
+            conn.execute(insert(Deployment), deployments)
+            if pieces:
+                conn.execute(insert(DeploymentLogChunk), [
+                    {
+                        "deployment_id": dep["id"],
+                        "stream": stream,
+                        "seq": seq,
+                        "byte_offset": seq * CHUNK_MAX_BYTES,
+                    }
+                    | piece
+                    for dep in deployments
+                    for stream in (DEPLOY_STREAM, APP_STREAM)
+                    for seq, piece in enumerate(pieces)
+                ])
+
+
+def run_size(rows: int, limit: int, repeat: int, full_max_rows: int, log_kb: int) -> None:
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+
+    from app.core.database import build_engine
+    from app.core.migrations import run_migrations
+    from app.core.pagination import Cursor, newest_first
+    from app.models.deployment import Deployment
+    from app.models.environment import Environment
+    from app.models.project import Project
+    from app.models.user import User
+    from app.repositories.deployments import list_deployments_by_environment_and_owner
+    from app.schemas.deployment import DeploymentRead
+    from pydantic import TypeAdapter
+
+    body = TypeAdapter(list[DeploymentRead])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{tmp}/bench.db", f"bench_{rows}")
+        run_migrations(engine)
+
+        with Session(engine) as db:
+            user = User(email="bench@example.com", password_hash="x", is_verified=True)
+            db.add(user)
+            db.flush()
+            project = Project(name="bench", owner_id=user.id)
+            db.add(project)
+            db.flush()
+            env = Environment(project_id=project.id, name="bench", type="persistent", status="running")
+            db.add(env)
+            db.commit()
+            owner_id, env_id = user.id, env.id
+
+        started = time.perf_counter()
+        fill(engine, env_id, rows, log_kb)
+        print(f"\n{rows:,} deployments, {log_kb}KB of each log (inserted in {time.perf_counter() - started:.1f}s)")
+        print(f"{'request':<42}{'median':>12}{'body':>12}")
+
+        def report(label: str, fn) -> None:
+            def request():
+                with Session(engine) as db:
+                    return body.dump_json(fn(db))
+
+            elapsed, payload = timed(request, repeat)
+            print(f"{label:<42}{elapsed:>10.1f}ms{len(payload) / 1024:>10.0f}KB")
+
+        if rows <= full_max_rows:
+            # What GET /deployments/environments/{id} returned before pagination
+            report("unbounded list (before)", lambda db: db.execute(
+                select(Deployment).where(Deployment.environment_id == env_id)
+                .order_by(Deployment.created_at.desc())
+            ).scalars().all())
+        else:
+            print(f"{'unbounded list (before)':<42}{'skipped (--full-max-rows)':>24}")
+
+        report(f"first page, limit {limit}", lambda db: list_deployments_by_environment_and_owner(
+            db, env_id, owner_id, limit).items)
+
+        depth = int(rows * 0.9)
+        with Session(engine) as db:
+            deep = db.execute(
+                select(Deployment).where(Deployment.environment_id == env_id)
+                .order_by(*newest_first(Deployment)).offset(depth - 1).limit(1)
+            ).scalar_one()
+            cursor = Cursor.of(deep)
+
+        report("page at 90% depth, keyset", lambda db: list_deployments_by_environment_and_owner(
+            db, env_id, owner_id, limit, cursor).items)
+        report(f"page at 90% depth, OFFSET {depth:,}", lambda db: db.execute(
+            select(Deployment).where(Deployment.environment_id == env_id)
+            .order_by(*newest_first(Deployment)).offset(depth).limit(limit)
+        ).scalars().all())
+
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,1000000", help="Comma-separated row counts")
+    parser.add_argument("--limit", type=int, default=100, help="Page size")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median)")
+    parser.add_argument("--log-kb", type=int, default=0, help="Size of each deployment's logs")
+    parser.add_argument("--full-max-rows", type=int, default=1_000_000, help="Skip the unbounded list above this")
+    args = parser.parse_args()
+
+    for rows in (int(size) for size in args.sizes.split(",")):
+        run_size(rows, args.limit, args.repeat, args.full_max_rows, args.log_kb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Request throughput and latency of an authenticated, DB-backed endpoint as the
+number of concurrent requests grows, on a single worker.
+
+Runs the app in-process over httpx's ASGI transport and hammers
+GET /api/v1/projects with a logged-in client, once with handlers on the sync
+engine through the request threadpool (before) and once on the async engine
+(after). Each configuration runs in its own interpreter because settings are
+read at import time.
+
+SQLite answers in microseconds, which hides what the request path does while a
+query is in flight. --db-latency-ms adds a fixed delay to every statement on
+the thread that executes it (the request's worker thread for the sync engine,
+aiosqlite's connection thread for the async one), standing in for the network
+round trip to a database server. Pass --database-url to run against an empty
+Postgres database instead.
+
+    python -m benchmarks.request_concurrency [--levels 10,40,100,200] [--db-latency-ms 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.login_throughput import percentile
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchpassword123"
+PROJECTS = 20
+
+CONFIGURATIONS = [
+    ("sync engine, threadpool (before)", {"DATABASE_ASYNC": "false"}),
+    ("async engine (after)", {"DATABASE_ASYNC": "true"}),
+]
+
+
+async def run_level(client, concurrency: int, requests_per_client: int) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def worker():
+        for _ in range(requests_per_client):
+            started = time.perf_counter()
+            response = await client.get("/api/v1/projects")
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "statuses": statuses,
+    }
+
+
+async def run_sweep(app, levels: list[int], requests_per_client: int) -> list[dict]:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    # https so the secure session cookie is sent back
+    async with httpx.AsyncClient(transport=transport, base_url="https://bench") as client:
+        response = await client.post(
+            "/api/v1/auth/login", data={"username": EMAIL, "password": PASSWORD}
+        )
+        response.raise_for_status()
+
+        # Warm up the pools and the session cache before measuring
+        await run_level(client, max(levels), 1)
+        return [await run_level(client, level, requests_per_client) for level in levels]
+
+
+def add_statement_latency(engine, latency_ms: float) -> None:
+    from sqlalchemy import event
+
+    def delay(_statement):
+        time.sleep(latency_ms / 1000)
+
+    @event.listens_for(engine, "connect")
+    def _install(dbapi_connection, _):
+        if hasattr(dbapi_connection, "run_async"):
+            # aiosqlite: the callback runs on the connection's own thread
+            dbapi_connection.run_async(lambda conn: conn.set_trace_callback(delay))
+        else:
+            dbapi_connection.set_trace_callback(delay)
+
+
+def run_child(levels: list[int], requests_per_client: int, latency_ms: float) -> None:
+    from app.core.database import SessionLocal, async_engine, engine
+    from app.core.migrations import run_migrations
+    from app.core.security import hash_password
+    from app.main import app, lifespan
+    from app.models.project import Project
+    from app.models.user import User
+
+    run_migrations(engine)
+    with SessionLocal() as db:
+        user = User(email=EMAIL, password_hash=hash_password(PASSWORD), is_verified=True)
+        db.add(user)
+        db.flush()
+        db.add_all(Project(name=f"project-{i}", owner_id=user.id) for i in range(PROJECTS))
+        db.commit()
+
+    if latency_ms > 0 and engine.dialect.name == "sqlite":
+        engine.dispose()
+        add_statement_latency(engine, latency_ms)
+        if async_engine is not None:
+            add_statement_latency(async_engine.sync_engine, latency_ms)
+
+    async def main():
+        async with lifespan(app):
+            return await run_sweep(app, levels, requests_per_client)
+
+    print(json.dumps(asyncio.run(main())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--levels", default="10,40,100,200", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests-per-client", type=int, default=20)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Per-statement delay (SQLite only)")
+    parser.add_argument("--database-url", help="Benchmark against this database instead of SQLite")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    if args.child:
+        run_child(levels, args.requests_per_client, args.db_latency_ms)
+        return
+
+    latency = "" if args.database_url else f", {args.db_latency_ms:g}ms per statement"
+    print(f"GET /api/v1/projects ({PROJECTS} rows), {args.requests_per_client} requests per client{latency}\n")
+    print(f"{'configuration':<34}{'clients':>8}{'req/s':>10}{'p50':>10}{'p99':>10}  statuses")
+    for label, overrides in CONFIGURATIONS:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "DATABASE_URL": args.database_url or f"sqlite:///{tmp}/bench.db",
+                # Pool sized to the largest level, so the threadpool is the only cap under test
+                "DB_POOL_SIZE": str(max(levels)),
+                "APP_ENV": "production",
+                "SESSION_REAPER_INTERVAL_SECONDS": "0",
+                **overrides,
+            }
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.request_concurrency", "--child",
+                 "--levels", args.levels, "--requests-per-client", str(args.requests_per_client),
+                 "--db-latency-ms", str(args.db_latency_ms)],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        for result in json.loads(output.strip().splitlines()[-1]):
+            print(
+                f"{label:<34}{result['concurrency']:>8}{result['requests_per_second']:>10.1f}"
+                f"{result['p50_ms']:>8.0f}ms{result['p99_ms']:>8.0f}ms  {result['statuses']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
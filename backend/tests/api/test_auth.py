@@ -97,6 +97,47 @@ def test_login_success(client):
     assert "XSRF-TOKEN" in client.cookies
 
 
+def test_login_cookie_flags_follow_settings(client, monkeypatch):
+    from app.core.config import settings
+
+    auth_headers(client)
+    monkeypatch.setattr(settings, "session_mode", "token")
+
+    for app_env, secure, samesite in (("production", True, "none"), ("local", False, "lax")):
+        monkeypatch.setattr(settings, "app_env", app_env)
+        client.cookies.clear()
+        response = login_user(client)
+        cookies = response.headers.get_list("set-cookie")
+        assert {c.split("=", 1)[0] for c in cookies} == {"envctl-session", "XSRF-TOKEN", "envctl-access"}
+        for cookie in cookies:
+            assert ("; secure" in cookie.lower()) is secure
+            assert f"samesite={samesite}" in cookie.lower()
+
+
+def test_login_rehashes_outdated_password_hash(client):
+    from passlib.hash import argon2
+
+    from app.core.config import settings
+    from app.core.database import get_db
+    from app.main import app
+    from app.models.user import User
+
+    db = next(app.dependency_overrides.get(get_db, get_db)())
+    old_hash = argon2.using(time_cost=1, memory_cost=19456, parallelism=1).hash(
+        "testpassword123"
+    )
+    user = User(email="test@example.com", password_hash=old_hash, is_verified=True)
+    db.add(user)
+    db.commit()
+
+    response = login_user(client)
+    assert response.status_code == status.HTTP_200_OK
+
+    db.refresh(user)
+    assert user.password_hash != old_hash
+    assert f"t={settings.argon2_time_cost}" in user.password_hash
+
+
 def test_login_unverified(client):
     register_user(client)
     # User is registered but not verified by default
@@ -114,6 +155,45 @@ def test_login_wrong_password(client):
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+def test_login_lockout_after_repeated_failures(client):
+    from app.core.database import get_db
+    from app.main import app
+    from app.repositories.users import get_user_by_email
+
+    register_user(client)
+    db = next(app.dependency_overrides.get(get_db, get_db)())
+    user = get_user_by_email(db, "test@example.com")
+    user.is_verified = True
+    db.commit()
+
+    # A single failure is only counted in memory, not written to the users row
+    login_user(client, password="wrongpassword")
+    db.refresh(user)
+    assert user.failed_login_attempts == 0
+
+    for _ in range(4):
+        login_user(client, password="wrongpassword")
+    db.refresh(user)
+    assert user.lockout_until is not None
+
+    response = login_user(client)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_login_throttled_before_hashing(client):
+    from app.core.config import settings
+    from app.core.password_hashing import password_hasher
+
+    for _ in range(settings.login_account_burst):
+        login_user(client, email="nobody@example.com")
+
+    completed = password_hasher.completed
+    response = login_user(client, email="nobody@example.com")
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert "Retry-After" in response.headers
+    assert password_hasher.completed == completed
+
+
 def test_login_nonexistent_user(client):
     response = login_user(client, email="nobody@example.com")
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
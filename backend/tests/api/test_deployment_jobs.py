@@ -0,0 +1,58 @@
+import time
+
+import httpx
+from fastapi import status
+from sqlalchemy import select
+
+from app.models.environment import Environment
+from app.models.job import Job
+from app.models.project import Project
+from app.repositories.users import get_user_by_email
+from tests.api.test_auth import auth_headers
+
+
+def test_create_deployment_queues_the_rollout_instead_of_running_it(client, test_db):
+    # The session cookie is Secure outside APP_ENV=local, and then only sent back over https
+    client.base_url = httpx.URL("https://testserver")
+    headers = auth_headers(client)
+    user = get_user_by_email(test_db, "test@example.com")
+    project = Project(name="p", owner_id=user.id)
+    test_db.add(project)
+    test_db.flush()
+    env = Environment(project_id=project.id, name="e", type="persistent", status="running")
+    test_db.add(env)
+    test_db.commit()
+
+    started = time.monotonic()
+    response = client.post(f"/api/v1/deployments/environments/{env.id}", json={"version": "v1"}, headers=headers)
+    elapsed = time.monotonic() - started
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["status"] == "pending"
+    # The simulated rollout takes seconds; the request only inserts it and its job
+    assert elapsed < 1
+    job = test_db.execute(select(Job)).scalar_one()
+    assert (job.kind, job.payload) == ("run_deployment", {"deployment_id": response.json()["id"]})
+
+
+def test_newer_deployment_supersedes_the_one_still_queued(client, test_db):
+    client.base_url = httpx.URL("https://testserver")
+    headers = auth_headers(client)
+    user = get_user_by_email(test_db, "test@example.com")
+    project = Project(name="p", owner_id=user.id)
+    test_db.add(project)
+    test_db.flush()
+    env = Environment(project_id=project.id, name="e", type="persistent", status="running")
+    test_db.add(env)
+    test_db.commit()
+
+    first = client.post(f"/api/v1/deployments/environments/{env.id}", json={"version": "v1"}, headers=headers)
+    second = client.post(f"/api/v1/deployments/environments/{env.id}", json={"version": "v2"}, headers=headers)
+    assert second.status_code == status.HTTP_201_CREATED
+
+    response = client.get(f"/api/v1/deployments/{first.json()['id']}")
+    assert response.json()["status"] == "superseded"
+    # Only the newest rollout is left to run
+    job = test_db.execute(select(Job)).scalar_one()
+    assert job.payload == {"deployment_id": second.json()["id"]}
+    assert job.concurrency_key == f"environment:{env.id}"
@@ -0,0 +1,176 @@
+import zlib
+
+import httpx
+import pytest
+from fastapi import status
+
+from app.models.deployment import Deployment
+from app.models.environment import Environment
+from app.models.project import Project
+from app.repositories.users import get_user_by_email
+from app.services.deployment_logs import APP_STREAM, DEPLOY_STREAM, DeploymentLogWriter
+from tests.api.test_auth import auth_headers
+
+
+@pytest.fixture
+def finished_deployment(client, test_db):
+    # The session cookie is Secure outside APP_ENV=local, and then only sent back over https
+    client.base_url = httpx.URL("https://testserver")
+    auth_headers(client)
+    user = get_user_by_email(test_db, "test@example.com")
+    project = Project(name="p", owner_id=user.id)
+    test_db.add(project)
+    test_db.flush()
+    env = Environment(project_id=project.id, name="e", type="persistent", status="running")
+    test_db.add(env)
+    test_db.flush()
+    dep = Deployment(environment_id=env.id, version="v1", status="succeeded")
+    test_db.add(dep)
+    test_db.flush()
+
+    log = DeploymentLogWriter(test_db, dep.id)
+    log.write(DEPLOY_STREAM, "pulling images")
+    log.write(APP_STREAM, "listening on 8080")
+    log.flush()
+    log.write(DEPLOY_STREAM, "rollout done")
+    log.flush()
+    test_db.commit()
+    return client, dep
+
+
+def parse_events(body: str) -> list[dict]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields: dict = {}
+        for line in block.split("\n"):
+            name, _, value = line.partition(": ")
+            if name == "data":
+                fields["data"] = fields["data"] + "\n" + value if "data" in fields else value
+            elif name:
+                fields[name] = value
+        events.append(fields)
+    return events
+
+
+def test_events_replay_the_log_and_end_with_the_deployment(finished_deployment):
+    client, dep = finished_deployment
+
+    response = client.get(f"/api/v1/deployments/{dep.id}/logs/events")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    deploy_end = len("pulling images\nrollout done\n")
+    app_end = len("listening on 8080\n")
+    assert parse_events(response.text) == [
+        {"event": "deploy", "id": f"{deploy_end},0", "data": "pulling images\nrollout done"},
+        {"event": "app", "id": f"{deploy_end},{app_end}", "data": "listening on 8080"},
+        {"event": "end", "id": f"{deploy_end},{app_end}", "data": "succeeded"},
+    ]
+
+
+def test_events_resume_from_the_last_event_id(finished_deployment):
+    client, dep = finished_deployment
+    offset = len("pulling images\n")
+
+    response = client.get(
+        f"/api/v1/deployments/{dep.id}/logs/events", headers={"Last-Event-ID": f"{offset},0"}
+    )
+    events = parse_events(response.text)
+    assert [(event["event"], event["data"]) for event in events] == [
+        ("deploy", "rollout done"),
+        ("app", "listening on 8080"),
+        ("end", "succeeded"),
+    ]
+
+    response = client.get(f"/api/v1/deployments/{dep.id}/logs/events", params={"deploy_offset": offset, "app_offset": len("listening on 8080\n")})
+    assert [event["event"] for event in parse_events(response.text)] == ["deploy", "end"]
+
+
+def test_events_are_refused_before_streaming(finished_deployment):
+    client, dep = finished_deployment
+
+    response = client.get(f"/api/v1/deployments/{dep.id}/logs/events", headers={"Last-Event-ID": "nope"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    auth_headers(client, email="other@example.com")
+    response = client.get(f"/api/v1/deployments/{dep.id}/logs/events")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_log_stream_is_served_deflated_or_plain(finished_deployment, test_db):
+    client, dep = finished_deployment
+    log = DeploymentLogWriter(test_db, dep.id)
+    for i in range(100):
+        log.write(DEPLOY_STREAM, f"[12:00:00] INFO applying manifest {i}")
+    log.flush()
+    test_db.commit()
+    url = f"/api/v1/deployments/{dep.id}/logs/{DEPLOY_STREAM}"
+    text = "pulling images\nrollout done\n" + "".join(f"[12:00:00] INFO applying manifest {i}\n" for i in range(100))
+
+    with client.stream("GET", url, headers={"Accept-Encoding": "gzip, deflate"}) as response:
+        assert response.headers["content-encoding"] == "deflate"
+        body = b"".join(response.iter_raw())
+    assert zlib.decompress(body).decode() == text
+    assert len(body) < len(text) / 4
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip, deflate;q=0"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-type"] == "text/plain; charset=utf-8"
+    assert response.text == text
+
+    assert client.get(f"/api/v1/deployments/{dep.id}/logs/other").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_log_stream_windows_report_their_offsets(finished_deployment):
+    client, dep = finished_deployment
+    url = f"/api/v1/deployments/{dep.id}/logs/{DEPLOY_STREAM}"
+    first = len("pulling images\n")
+    size = len("pulling images\nrollout done\n")
+
+    response = client.get(url, params={"tail": 1})
+    assert response.text == "rollout done\n"
+    assert (response.headers["x-log-offset"], response.headers["x-next-offset"]) == (str(first), str(size))
+
+    response = client.get(url, params={"max_bytes": 20})
+    assert response.text == "pulling images\n"
+    response = client.get(url, params={"since_offset": response.headers["x-next-offset"]})
+    assert response.text == "rollout done\n"
+
+
+def test_log_stream_serves_byte_ranges(finished_deployment):
+    client, dep = finished_deployment
+    url = f"/api/v1/deployments/{dep.id}/logs/{DEPLOY_STREAM}"
+    size = len("pulling images\nrollout done\n")
+
+    response = client.get(url, headers={"Range": "bytes=8-13", "Accept-Encoding": "deflate"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.headers["content-range"] == f"bytes 8-13/{size}"
+    assert "content-encoding" not in response.headers
+    assert response.text == "images"
+
+    response = client.get(url, headers={"Range": "bytes=-5"})
+    assert response.text == "done\n"
+
+    response = client.get(url, headers={"Range": "bytes=0-1,4-5"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text == "pulling images\nrollout done\n"
+
+    response = client.get(url, headers={"Range": f"bytes={size}-"})
+    assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+    assert response.headers["content-range"] == f"bytes */{size}"
+
+
+def test_json_logs_tail_and_resume(finished_deployment):
+    client, dep = finished_deployment
+    url = f"/api/v1/deployments/{dep.id}/logs"
+
+    logs = client.get(url, params={"tail": 1}).json()
+    assert logs["deployment_logs"] == "rollout done\n"
+    assert logs["app_logs"] == "listening on 8080\n"
+
+    logs = client.get(url, params={
+        "deploy_since_offset": logs["deployment_logs_next_offset"],
+        "app_since_offset": logs["app_logs_next_offset"],
+    }).json()
+    assert (logs["deployment_logs"], logs["app_logs"]) == ("", "")
+    assert logs["deployment_logs_next_offset"] == len("pulling images\nrollout done\n")
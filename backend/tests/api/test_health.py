@@ -5,3 +5,9 @@ def test_health(client):
     response = client.get("/health")
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"status": "ok"}
+
+
+def test_metrics(client):
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert "hits" in response.json()["session_cache"]
@@ -0,0 +1,102 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from fastapi import status
+
+from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.models.deployment import Deployment
+from app.models.environment import Environment
+from app.models.project import Project
+from app.repositories.users import get_user_by_email
+from tests.api.test_auth import auth_headers
+
+
+@pytest.fixture
+def user_client(client, test_db):
+    # The session cookie is Secure outside APP_ENV=local, and then only sent back over https
+    client.base_url = httpx.URL("https://testserver")
+    auth_headers(client)
+    return client, get_user_by_email(test_db, "test@example.com")
+
+
+def fetch_all(client, url, limit):
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": limit} | ({"cursor": cursor} if cursor else {})
+        response = client.get(url, params=params)
+        assert response.status_code == status.HTTP_200_OK
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+
+
+def test_projects_are_paged_newest_first(user_client, test_db):
+    client, user = user_client
+    projects = [Project(name=f"p{i}", owner_id=user.id) for i in range(5)]
+    for project in projects:
+        test_db.add(project)
+        test_db.flush()
+    test_db.commit()
+
+    pages = fetch_all(client, "/api/v1/projects", limit=2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [p["name"] for page in pages for p in page] == ["p4", "p3", "p2", "p1", "p0"]
+
+
+def test_unpaged_request_returns_first_page_without_cursor(user_client, test_db):
+    client, user = user_client
+    test_db.add_all(Project(name=f"p{i}", owner_id=user.id) for i in range(3))
+    test_db.commit()
+
+    response = client.get("/api/v1/projects")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 3
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_rows_with_equal_created_at_are_neither_skipped_nor_repeated(user_client, test_db):
+    client, user = user_client
+    project = Project(name="p", owner_id=user.id)
+    test_db.add(project)
+    test_db.flush()
+    env = Environment(project_id=project.id, name="e", type="persistent", status="running")
+    test_db.add(env)
+    test_db.flush()
+    same_instant = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    deployments = [Deployment(environment_id=env.id, version=f"v{i}", created_at=same_instant) for i in range(7)]
+    test_db.add_all(deployments)
+    test_db.commit()
+
+    pages = fetch_all(client, f"/api/v1/deployments/environments/{env.id}", limit=3)
+
+    ids = [d["id"] for page in pages for d in page]
+    assert sorted(ids) == sorted(str(d.id) for d in deployments)
+    assert len(set(ids)) == len(ids)
+
+
+def test_empty_page_of_owned_parent_is_not_a_404(user_client, test_db):
+    client, user = user_client
+    project = Project(name="p", owner_id=user.id)
+    test_db.add(project)
+    test_db.commit()
+
+    response = client.get(f"/api/v1/environments/projects/{project.id}", params={"limit": 1})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+
+
+def test_invalid_cursor_and_limit_are_rejected(user_client):
+    client, _ = user_client
+
+    response = client.get("/api/v1/projects", params={"cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = client.get("/api/v1/projects", params={"limit": settings.page_size_max + 1})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
@@ -7,6 +7,19 @@ from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.core.database import Base, get_db
+from app.core.config import settings
+from app.core.db_runner import (
+    ThreadedSessionPerRunRunner,
+    get_db_runner,
+    get_polling_db_runner,
+    get_read_db_runner,
+    get_threaded_db_runner,
+)
+from app.core.last_seen import last_seen_buffer
+from app.core.rate_limit import login_ip_limiter, login_account_limiter
+from app.core.revocation import revocation_list
+from app.services.job_worker import job_worker
+from app.services.session_reaper import session_reaper
 
 # Suppress 3rd party deprecation warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning, module="passlib")
@@ -24,6 +37,14 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Background flushes and syncs must use the test database, not the app's default one
+last_seen_buffer.session_factory = TestingSessionLocal
+revocation_list.session_factory = TestingSessionLocal
+session_reaper.session_factory = TestingSessionLocal
+job_worker.db = ThreadedSessionPerRunRunner(TestingSessionLocal)
+# Tests run queued jobs themselves (job_worker.run_once), not in a worker task started with the app
+settings.jobs_in_process = False
+
 
 @pytest.fixture(scope="function")
 def test_db():
@@ -45,6 +66,13 @@ def client(test_db):
             pass  # db is closed in test_db fixture
 
     app.dependency_overrides[get_db] = override_get_db
+    # Routes run on the sync test session, whatever DATABASE_ASYNC says
+    app.dependency_overrides[get_db_runner] = get_threaded_db_runner
+    app.dependency_overrides[get_read_db_runner] = get_threaded_db_runner
+    app.dependency_overrides[get_polling_db_runner] = lambda: ThreadedSessionPerRunRunner(TestingSessionLocal)
+    # Every test client shares one IP; start each test with full login buckets
+    login_ip_limiter.clear()
+    login_account_limiter.clear()
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
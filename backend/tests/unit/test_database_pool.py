@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import StaticPool
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import build_engine
+from app.core.metrics import Histogram
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram([1, 10])
+    for value in (0.5, 5, 50):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 3
+    assert snapshot["buckets"] == {"le_1": 1, "le_10": 2, "le_inf": 3}
+
+
+@pytest.fixture
+def pool_engine():
+    """build_engine, with its collector removed afterwards so /metrics tests never see it."""
+    built = []
+
+    def build(database_url: str, name: str):
+        engine = build_engine(database_url, name)
+        built.append((engine, name))
+        return engine
+
+    yield build
+    for engine, name in built:
+        metrics.unregister_collector(f"db_pool_{name}")
+        engine.dispose()
+
+
+def test_sqlite_memory_uses_static_pool(pool_engine):
+    engine = pool_engine("sqlite://", "test_memory")
+    assert isinstance(engine.pool, StaticPool)
+    assert metrics.collect()["db_pool_test_memory"] == {"pool": "StaticPool"}
+
+
+def test_file_pool_reports_checkouts_and_timeouts(tmp_path, monkeypatch, pool_engine):
+    monkeypatch.setattr(settings, "db_pool_size", 1)
+    monkeypatch.setattr(settings, "db_max_overflow", 0)
+    monkeypatch.setattr(settings, "db_pool_timeout_seconds", 0.05)
+    engine = pool_engine(f"sqlite:///{tmp_path / 'pool.db'}", "test_file")
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        stats = metrics.collect()["db_pool_test_file"]
+        assert stats["checked_out"] == 1
+
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    stats = metrics.collect()["db_pool_test_file"]
+    assert stats["checked_out"] == 0
+    assert stats["timeouts"] == 1
+    assert stats["checkout_wait_ms"]["count"] == 2
+
+
+def test_pool_collectors_are_removed_after_the_test():
+    assert not [name for name in metrics.collect() if name.startswith("db_pool_test_")]
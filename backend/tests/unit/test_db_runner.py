@@ -0,0 +1,46 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, async_database_url
+from app.core.db_runner import AsyncSessionRunner, ThreadedSessionRunner
+from app.models.user import User
+import app.repositories.users as users_repo
+
+
+def test_async_database_url_maps_drivers():
+    assert str(async_database_url("sqlite:///./envctl.db")) == "sqlite+aiosqlite:///./envctl.db"
+    assert (
+        async_database_url("postgresql+psycopg2://u:p@db/envctl").drivername
+        == "postgresql+asyncpg"
+    )
+    # A second in-memory engine would be a different, empty database
+    assert async_database_url("sqlite://") is None
+
+
+def test_runners_run_the_same_repository_code(tmp_path):
+    url = f"sqlite:///{tmp_path / 'runner.db'}"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(bind=sync_engine)
+    async_engine = create_async_engine(async_database_url(url))
+
+    async def scenario():
+        async with async_sessionmaker(async_engine, expire_on_commit=False)() as session:
+            runner = AsyncSessionRunner(session)
+            await runner.run(users_repo.create_user, User(email="a@example.com", password_hash="x"))
+            found = await runner.run(users_repo.get_user_by_email, "a@example.com")
+            await session.commit()
+        await async_engine.dispose()
+
+        with sessionmaker(bind=sync_engine)() as db:
+            threaded = await ThreadedSessionRunner(db).run(
+                users_repo.get_user_by_email, "a@example.com"
+            )
+        return found, threaded
+
+    found, threaded = asyncio.run(scenario())
+    assert found.email == "a@example.com"
+    assert threaded.id == found.id
+    sync_engine.dispose()
@@ -0,0 +1,345 @@
+import asyncio
+import zlib
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db_runner import ThreadedSessionPerRunRunner
+from app.core.deflate import accepts_deflate
+from app.core.exceptions import ResourceNotFoundException
+from app.models.deployment import Deployment
+from app.models.deployment_log_chunk import DeploymentLogChunk
+from app.models.environment import Environment
+from app.models.project import Project
+from app.models.user import User
+from app.services.deployment_logs import (
+    APP_STREAM,
+    DEPLOY_STREAM,
+    DeploymentLogWriter,
+    LogWindow,
+    log_as_deflate,
+    log_as_text,
+    log_tail_notifier,
+    read_log,
+    read_log_window,
+    stream_log_events,
+)
+from app.services.deployments import fail_deployment, get_deployment_logs, interrupt_rollout, run_deployment
+
+
+@pytest.fixture
+def deployment(test_db):
+    user = User(email="t@t.com", password_hash="pw")
+    test_db.add(user)
+    test_db.commit()
+    project = Project(name="p1", owner_id=user.id)
+    test_db.add(project)
+    test_db.commit()
+    env = Environment(project_id=project.id, name="e1", status="running", type="ephemeral")
+    test_db.add(env)
+    test_db.commit()
+    dep = Deployment(environment_id=env.id, version="v1", status="pending")
+    test_db.add(dep)
+    test_db.commit()
+    return dep
+
+
+def test_appending_writes_only_the_new_lines(test_db, deployment):
+    log = DeploymentLogWriter(test_db, deployment.id)
+    for i in range(1000):
+        log.write(DEPLOY_STREAM, f"line {i}")
+        log.flush()
+    test_db.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, *args):
+        statements.append((statement.split()[0].upper(), parameters))
+
+    event.listen(test_db.get_bind(), "before_cursor_execute", record)
+    try:
+        log.write(DEPLOY_STREAM, "line 1000")
+        log.write(APP_STREAM, "app line")
+        log.flush()
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", record)
+
+    # One INSERT carrying the two new lines; the 1000 stored chunks are not read or rewritten
+    assert [kind for kind, _ in statements] == ["INSERT"]
+    rows = statements[0][1]
+    values = [value for row in rows for value in row] if isinstance(rows, list) else list(rows)
+    assert b"line 1000\n" in values and b"app line\n" in values
+    test_db.commit()
+
+    assert read_log(test_db, deployment.id, DEPLOY_STREAM) == "".join(f"line {i}\n" for i in range(1001))
+    assert read_log(test_db, deployment.id, APP_STREAM) == "app line\n"
+
+
+def test_buffered_lines_are_cut_into_ordered_chunks(test_db, deployment):
+    log = DeploymentLogWriter(test_db, deployment.id, max_chunk_bytes=32)
+    lines = [f"step {i:03d} passed" for i in range(20)]  # 16 bytes with the newline
+    for line in lines:
+        log.write(DEPLOY_STREAM, line)
+    log.flush()
+    test_db.commit()
+
+    chunks = test_db.execute(
+        select(DeploymentLogChunk.seq, DeploymentLogChunk.byte_offset, DeploymentLogChunk.data)
+        .where(DeploymentLogChunk.deployment_id == deployment.id)
+        .order_by(DeploymentLogChunk.seq)
+    ).all()
+    assert [chunk.seq for chunk in chunks] == list(range(10))
+    assert [chunk.byte_offset for chunk in chunks] == [32 * i for i in range(10)]
+    assert read_log(test_db, deployment.id, DEPLOY_STREAM) == "".join(line + "\n" for line in lines)
+
+
+def test_a_new_writer_resumes_after_the_stored_chunks(test_db, deployment):
+    first = DeploymentLogWriter(test_db, deployment.id)
+    first.write(DEPLOY_STREAM, "first run")
+    first.flush()
+    test_db.commit()
+
+    second = DeploymentLogWriter(test_db, deployment.id)
+    second.write(DEPLOY_STREAM, "second run")
+    second.flush()
+    test_db.commit()
+
+    last = test_db.execute(
+        select(DeploymentLogChunk).where(DeploymentLogChunk.seq == 1)
+    ).scalar_one()
+    assert last.byte_offset == len("first run\n")
+    assert read_log(test_db, deployment.id, DEPLOY_STREAM) == "first run\nsecond run\n"
+
+
+def test_run_deployment_logs_are_read_back_for_the_owner(test_db, deployment):
+    owner_id = test_db.get(Project, test_db.get(Environment, deployment.environment_id).project_id).owner_id
+
+    assert get_deployment_logs(test_db, deployment.id, owner_id).app_logs == "No app logs available yet..."
+
+    runner = ThreadedSessionPerRunRunner(sessionmaker(bind=test_db.get_bind()))
+    asyncio.run(run_deployment(deployment.id, runner, step_seconds=0))
+
+    test_db.expire_all()
+    logs = get_deployment_logs(test_db, deployment.id, owner_id)
+    assert logs.deployment_logs.splitlines()[0].endswith("Starting deployment for version v1...")
+    assert logs.deployment_logs.splitlines()[-1].endswith("Load balancer updated.")
+    assert len(logs.app_logs.splitlines()) == 5
+
+    other = User(email="o@t.com", password_hash="pw")
+    test_db.add(other)
+    test_db.commit()
+    with pytest.raises(ResourceNotFoundException):
+        get_deployment_logs(test_db, deployment.id, other.id)
+
+
+def test_tail_pushes_committed_lines_and_ends_with_the_deployment(test_db, deployment):
+    runner = ThreadedSessionPerRunRunner(sessionmaker(bind=test_db.get_bind()))
+    log = DeploymentLogWriter(test_db, deployment.id)
+    log.write(DEPLOY_STREAM, "first")
+    log.flush()
+    deployment.status = "running"
+    test_db.commit()
+
+    async def scenario():
+        # Polls are an hour apart: only the notifier can wake the tail in time
+        events = stream_log_events(runner, deployment.id, {}, poll_seconds=3600, heartbeat_seconds=3600)
+        first = await events.__anext__()
+        waiting = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        assert log_tail_notifier.stats()["tails"] == 1
+
+        log.write(APP_STREAM, "second")
+        log.flush()
+        log_tail_notifier.announce(test_db, deployment.id)
+        test_db.commit()
+        second = await asyncio.wait_for(waiting, 5)
+
+        deployment.status = "succeeded"
+        log_tail_notifier.announce(test_db, deployment.id)
+        test_db.commit()
+        end = await asyncio.wait_for(events.__anext__(), 5)
+        with pytest.raises(StopAsyncIteration):
+            await events.__anext__()
+        return first, second, end
+
+    first, second, end = asyncio.run(scenario())
+    assert first == "event: deploy\nid: 6,0\ndata: first\n\n"
+    assert second == "event: app\nid: 6,7\ndata: second\n\n"
+    assert end == "event: end\nid: 6,7\ndata: succeeded\n\n"
+    assert log_tail_notifier.stats()["tails"] == 0
+
+
+def test_announcements_are_sent_on_commit_only(test_db, deployment):
+    before = log_tail_notifier.stats()["notifications"]
+    log_tail_notifier.announce(test_db, deployment.id)
+    test_db.rollback()
+    assert log_tail_notifier.stats()["notifications"] == before
+
+    log_tail_notifier.announce(test_db, deployment.id)
+    assert log_tail_notifier.stats()["notifications"] == before
+    test_db.commit()
+    assert log_tail_notifier.stats()["notifications"] == before + 1
+
+
+def test_idle_tail_sends_heartbeats(test_db, deployment):
+    runner = ThreadedSessionPerRunRunner(sessionmaker(bind=test_db.get_bind()))
+
+    async def scenario():
+        events = stream_log_events(runner, deployment.id, {}, poll_seconds=0.01, heartbeat_seconds=0.05)
+        try:
+            return await asyncio.wait_for(events.__anext__(), 5)
+        finally:
+            await events.aclose()
+
+    assert asyncio.run(scenario()) == ": heartbeat\n\n"
+
+
+def test_large_chunks_are_stored_deflated(test_db, deployment):
+    lines = [f"[12:00:{i % 60:02d}] INFO health check {i} ok" for i in range(200)]
+    log = DeploymentLogWriter(test_db, deployment.id)
+    for line in lines:
+        log.write(APP_STREAM, line)
+    log.write(DEPLOY_STREAM, "short")
+    log.flush()
+    test_db.commit()
+
+    stored = {
+        chunk.stream: chunk
+        for chunk in test_db.execute(select(DeploymentLogChunk)).scalars()
+    }
+    text = "".join(line + "\n" for line in lines)
+    assert stored[APP_STREAM].encoding == "deflate"
+    assert stored[APP_STREAM].size == len(text)
+    assert len(stored[APP_STREAM].data) < len(text) / 4
+    assert stored[DEPLOY_STREAM].encoding is None
+    assert read_log(test_db, deployment.id, APP_STREAM) == text
+
+
+def test_seal_compacts_small_chunks_without_moving_offsets(test_db, deployment):
+    log = DeploymentLogWriter(test_db, deployment.id, max_chunk_bytes=4096)
+    lines = [f"step {i:04d}: applied manifest" for i in range(400)]  # 28 bytes each
+    for line in lines:
+        log.write(DEPLOY_STREAM, line)
+        log.flush()
+    log.seal()
+    test_db.commit()
+
+    chunks = test_db.execute(
+        select(DeploymentLogChunk).order_by(DeploymentLogChunk.seq)
+    ).scalars().all()
+    assert [(chunk.seq, chunk.byte_offset, chunk.size) for chunk in chunks] == [
+        (0, 0, 4088), (1, 4088, 4088), (2, 8176, 3024)
+    ]
+    assert all(chunk.encoding == "deflate" for chunk in chunks)
+    assert read_log(test_db, deployment.id, DEPLOY_STREAM) == "".join(line + "\n" for line in lines)
+
+    # Appending after the seal continues at the same offset
+    log.write(DEPLOY_STREAM, "done")
+    log.flush()
+    test_db.commit()
+    assert read_log(test_db, deployment.id, DEPLOY_STREAM).endswith("applied manifest\ndone\n")
+
+
+@pytest.mark.parametrize("end_rollout", [interrupt_rollout, fail_deployment])
+def test_rollouts_that_stop_early_are_sealed_too(test_db, deployment, end_rollout):
+    deployment.status = "running"
+    log = DeploymentLogWriter(test_db, deployment.id)
+    for i in range(50):
+        log.write(DEPLOY_STREAM, f"step {i}")
+        log.flush()
+    test_db.commit()
+
+    end_rollout(test_db, deployment.id)
+    test_db.commit()
+
+    chunks = test_db.execute(select(DeploymentLogChunk)).scalars().all()
+    assert len(chunks) == 1
+    assert read_log(test_db, deployment.id, DEPLOY_STREAM).startswith("step 0\nstep 1\n")
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate", True),
+    ("*", True),
+    ("deflate;q=0.5", True),
+    ("*;q=0, deflate", True),
+    ("deflate;q=0, *", False),
+    ("gzip, deflate;q=0", False),
+    ("deflate;q=high", False),
+    ("gzip", False),
+    (None, False),
+])
+def test_named_deflate_outweighs_the_wildcard(accept_encoding, expected):
+    assert accepts_deflate(accept_encoding) is expected
+
+
+def test_deflate_response_copies_the_stored_blocks(test_db, deployment):
+    log = DeploymentLogWriter(test_db, deployment.id)
+    log.write(DEPLOY_STREAM, "x" * 5000)
+    log.flush()
+    log.write(DEPLOY_STREAM, "tail line")
+    log.flush()
+    test_db.commit()
+
+    chunks = test_db.execute(
+        select(DeploymentLogChunk).order_by(DeploymentLogChunk.seq)
+    ).scalars().all()
+    window = LogWindow.whole(chunks)
+    body = log_as_deflate(window)
+
+    assert chunks[0].encoding == "deflate" and chunks[0].data in body
+    assert zlib.decompress(body) == log_as_text(window) == ("x" * 5000 + "\ntail line\n").encode()
+
+
+@pytest.fixture
+def long_log(test_db, deployment):
+    # 300 lines of 16 bytes in chunks of 256 bytes, most of them deflated
+    log = DeploymentLogWriter(test_db, deployment.id, max_chunk_bytes=256)
+    for i in range(300):
+        log.write(DEPLOY_STREAM, f"line {i:05d} ....")
+    log.flush()
+    log.max_chunk_bytes = 4096
+    log.seal()
+    test_db.commit()
+    return b"".join(f"line {i:05d} ....\n".encode() for i in range(300))
+
+
+def test_log_window_tail_reads_only_the_last_chunk(test_db, deployment, long_log):
+    deployment_id = deployment.id
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_db.get_bind(), "before_cursor_execute", record)
+    try:
+        window = read_log_window(test_db, deployment_id, DEPLOY_STREAM, tail=3)
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", record)
+
+    assert log_as_text(window) == long_log[-48:]
+    assert (window.start, window.end, window.size) == (len(long_log) - 48, len(long_log), len(long_log))
+    # The stream's length, the last chunk to count lines back in, then the window's chunks
+    assert len(statements) == 3
+    assert len(window.chunks) == 1
+
+
+def test_log_window_bounds_and_resumes_on_line_boundaries(test_db, deployment, long_log):
+    window = read_log_window(test_db, deployment.id, DEPLOY_STREAM, since_offset=4090, max_bytes=100)
+    # Starts where asked, ends on the last whole line that fits, across a chunk boundary
+    assert (window.start, window.end) == (4090, 4176)
+    assert log_as_text(window) == long_log[4090:4176]
+    assert zlib.decompress(log_as_deflate(window)) == long_log[4090:4176]
+
+    window = read_log_window(test_db, deployment.id, DEPLOY_STREAM, since_offset=window.end)
+    assert log_as_text(window) == long_log[4176:]
+
+    window = read_log_window(test_db, deployment.id, DEPLOY_STREAM, tail=100, max_bytes=40)
+    assert log_as_text(window) == long_log[-32:]
+
+    window = read_log_window(test_db, deployment.id, DEPLOY_STREAM, since_offset=len(long_log) - 20, tail=5)
+    assert log_as_text(window) == long_log[-20:]
+
+    window = read_log_window(test_db, deployment.id, DEPLOY_STREAM, max_bytes=10)
+    assert log_as_text(window) == long_log[:10]
@@ -1,8 +1,24 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db_runner import ThreadedSessionPerRunRunner
+from app.core.exceptions import ResourceNotFoundException
 from app.models.deployment import Deployment
 from app.models.environment import Environment
 from app.models.project import Project
 from app.models.user import User
-from app.services.deployments import run_deployment
+from app.services.deployment_logs import DEPLOY_STREAM, DeploymentLogWriter, read_log
+from app.services.deployments import (
+    begin_rollout,
+    get_deployment_by_id,
+    get_deployment_logs,
+    list_deployments,
+    run_deployment,
+)
+from tests.unit.test_unit_of_work import StatementLog
 
 
 def test_run_deployment_success(test_db):
@@ -26,17 +42,9 @@ def test_run_deployment_success(test_db):
     test_db.commit()
     dep_id = dep.id
 
-    # Needs a db_factory that returns the session
-    def db_factory():
-        return test_db
-
-    # execute
-    original_close = test_db.close
-    test_db.close = lambda: None
-    try:
-        run_deployment(deployment_id=dep_id, db_factory=db_factory)
-    finally:
-        test_db.close = original_close
+    # execute: each step gets its own session on the test database
+    runner = ThreadedSessionPerRunRunner(sessionmaker(bind=test_db.get_bind()))
+    asyncio.run(run_deployment(deployment_id=dep_id, db=runner, step_seconds=0))
 
     # verify
     test_db.refresh(dep)
@@ -71,15 +79,124 @@ def test_run_deployment_failed_env_not_found(test_db):
 
     dep_id = dep.id
 
-    def db_factory():
-        return test_db
+    runner = ThreadedSessionPerRunRunner(sessionmaker(bind=test_db.get_bind()))
+    asyncio.run(run_deployment(deployment_id=dep_id, db=runner, step_seconds=0))
+
+    test_db.refresh(dep)
+    assert dep.status == "failed"
+
+
+def test_cancelled_rollout_notes_the_interruption_and_stays_running(test_db):
+    user = User(email="t@t.com", password_hash="pw")
+    test_db.add(user)
+    test_db.commit()
+    project = Project(name="p1", owner_id=user.id)
+    test_db.add(project)
+    test_db.commit()
+    env = Environment(project_id=project.id, name="e1", status="running", type="ephemeral")
+    test_db.add(env)
+    test_db.commit()
+    dep = Deployment(environment_id=env.id, version="v1", status="pending")
+    test_db.add(dep)
+    test_db.commit()
+    dep_id = dep.id
+    begun = asyncio.Event()
+
+    class Runner(ThreadedSessionPerRunRunner):
+        # The tests share one connection, so a status read before begin_rollout
+        # commits sees its uncommitted write: wait for the step to return instead
+        async def run(self, fn, *args, **kwargs):
+            result = await super().run(fn, *args, **kwargs)
+            if fn is begin_rollout:
+                begun.set()
+            return result
+
+    runner = Runner(sessionmaker(bind=test_db.get_bind()))
+
+    async def cancel_mid_rollout():
+        task = asyncio.create_task(run_deployment(dep_id, runner, step_seconds=60))
+        await asyncio.wait_for(begun.wait(), 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_mid_rollout())
+
+    test_db.expire_all()
+    # Left for the retried job, which picks the rollout up again
+    assert test_db.get(Deployment, dep_id).status == "running"
+    assert read_log(test_db, dep_id, DEPLOY_STREAM).splitlines()[-1].endswith(
+        "Deployment interrupted; it will be retried."
+    )
+
+
+def test_deployment_reads_check_ownership_in_one_query(test_db):
+    owner = User(email="owner@t.com", password_hash="pw")
+    other = User(email="other@t.com", password_hash="pw")
+    test_db.add_all([owner, other])
+    test_db.commit()
+
+    project = Project(name="p1", owner_id=owner.id)
+    test_db.add(project)
+    test_db.commit()
+
+    env = Environment(project_id=project.id, name="e1", status="running", type="ephemeral")
+    empty_env = Environment(project_id=project.id, name="e2", status="running", type="ephemeral")
+    test_db.add_all([env, empty_env])
+    test_db.commit()
+
+    dep = Deployment(environment_id=env.id, version="v1", status="pending")
+    test_db.add(dep)
+    test_db.commit()
+    owner_id, other_id, env_id, empty_env_id, dep_id = owner.id, other.id, env.id, empty_env.id, dep.id
+    test_db.expunge_all()
+
+    with StatementLog(test_db.get_bind()) as log:
+        assert get_deployment_by_id(test_db, dep_id, owner_id).id == dep_id
+        assert [d.id for d in list_deployments(test_db, env_id, owner_id).items] == [dep_id]
+        assert list_deployments(test_db, empty_env_id, owner_id).items == []
+    assert log.statements == ["SELECT", "SELECT", "SELECT"]
+
+    with pytest.raises(ResourceNotFoundException):
+        get_deployment_by_id(test_db, dep_id, other_id)
+    with pytest.raises(ResourceNotFoundException):
+        list_deployments(test_db, env_id, other_id)
+
 
-    original_close = test_db.close
-    test_db.close = lambda: None
+def test_log_chunks_are_read_only_by_the_logs_query(test_db):
+    user = User(email="t@t.com", password_hash="pw")
+    test_db.add(user)
+    test_db.commit()
+    project = Project(name="p1", owner_id=user.id)
+    test_db.add(project)
+    test_db.commit()
+    env = Environment(project_id=project.id, name="e1", status="running", type="ephemeral")
+    test_db.add(env)
+    test_db.commit()
+    dep = Deployment(environment_id=env.id, version="v1", status="succeeded")
+    test_db.add(dep)
+    test_db.commit()
+    log = DeploymentLogWriter(test_db, dep.id)
+    log.write(DEPLOY_STREAM, "x" * 100_000)
+    log.flush()
+    test_db.commit()
+    user_id, env_id, dep_id = user.id, env.id, dep.id
+    test_db.expunge_all()
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_db.get_bind(), "before_cursor_execute", record)
     try:
-        run_deployment(deployment_id=dep_id, db_factory=db_factory)
+        assert [d.id for d in list_deployments(test_db, env_id, user_id).items] == [dep_id]
+        assert get_deployment_by_id(test_db, dep_id, user_id).id == dep_id
+        reads = len(statements)
+        logs = get_deployment_logs(test_db, dep_id, user_id)
     finally:
-        test_db.close = original_close
+        event.remove(test_db.get_bind(), "before_cursor_execute", record)
 
-    test_db.refresh(dep)
-    assert dep.status == "failed"
+    assert not any("deployment_log_chunks" in statement for statement in statements[:reads])
+    assert any("deployment_log_chunks" in statement for statement in statements[reads:])
+    assert logs.deployment_logs == "x" * 100_000 + "\n"
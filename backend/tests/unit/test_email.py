@@ -0,0 +1,40 @@
+import threading
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.services import email as email_service
+
+
+def test_real_email_is_sent_off_thread_after_commit(test_db, monkeypatch):
+    sent = []
+    done = threading.Event()
+
+    def fake_send(to_email, subject, body):
+        sent.append((to_email, threading.current_thread().name))
+        done.set()
+
+    monkeypatch.setattr(settings, "email_mode", "real")
+    monkeypatch.setattr(email_service, "_send_real_email", fake_send)
+
+    assert email_service.send_verification_email("a@example.com", "token", test_db) is None
+    assert sent == []
+
+    test_db.commit()
+    assert done.wait(5)
+    assert sent[0][0] == "a@example.com"
+    assert sent[0][1].startswith("email")
+
+
+def test_real_email_is_dropped_on_rollback(test_db, monkeypatch):
+    sent = []
+    monkeypatch.setattr(settings, "email_mode", "real")
+    monkeypatch.setattr(email_service, "_send_real_email", lambda *args: sent.append(args))
+
+    test_db.execute(text("SELECT 1"))
+    email_service.send_verification_email("a@example.com", "token", test_db)
+    test_db.rollback()
+    test_db.commit()
+
+    email_service._mail_executor.submit(lambda: None).result()
+    assert sent == []
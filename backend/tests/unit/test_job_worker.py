@@ -0,0 +1,282 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db_runner import ThreadedSessionPerRunRunner
+from app.models.deployment import Deployment
+from app.models.environment import Environment
+from app.models.job import Job
+from app.models.project import Project
+from app.models.user import User
+from app.repositories import jobs as jobs_repo
+from app.schemas.deployment import DeploymentCreate
+from app.services import jobs as jobs_service
+from app.services.deployment_logs import DEPLOY_STREAM, DeploymentLogWriter, read_log
+from app.services.deployments import begin_rollout, create_deployment, run_deployment
+from app.services.job_worker import JOB_KINDS, JobKind, JobWorker
+
+
+def make_worker(test_db, kinds=JOB_KINDS) -> JobWorker:
+    # One job at a time: the test database is a single shared connection
+    return JobWorker(
+        db=ThreadedSessionPerRunRunner(sessionmaker(bind=test_db.get_bind())),
+        kinds=kinds,
+        concurrency=1,
+        poll_seconds=0.01,
+        visibility_timeout_seconds=60,
+        retry_base_seconds=0,
+        retry_max_seconds=60,
+        shutdown_grace_seconds=0,
+        worker_id="w1",
+    )
+
+
+@pytest.fixture
+def env(test_db):
+    user = User(email="t@t.com", password_hash="pw")
+    test_db.add(user)
+    test_db.commit()
+    project = Project(name="p1", owner_id=user.id)
+    test_db.add(project)
+    test_db.commit()
+    env = Environment(project_id=project.id, name="e1", status="running", type="ephemeral")
+    test_db.add(env)
+    test_db.commit()
+    return env
+
+
+def test_deployment_is_queued_with_the_request_and_run_by_a_worker(test_db, env):
+    owner_id = test_db.get(Project, env.project_id).owner_id
+
+    create_deployment(test_db, env.id, DeploymentCreate(version="v1"), owner_id)
+    test_db.rollback()
+    assert test_db.execute(select(Job)).scalars().all() == []
+
+    async def enqueue_and_wait():
+        with jobs_service.jobs_enqueued.subscribe() as woken:
+            dep = create_deployment(test_db, env.id, DeploymentCreate(version="v2"), owner_id)
+            test_db.commit()
+            await asyncio.wait_for(woken.wait(), 1)
+            return dep.id
+
+    dep_id = asyncio.run(enqueue_and_wait())
+    job = test_db.execute(select(Job)).scalar_one()
+    assert (job.kind, job.payload, job.status) == ("run_deployment", {"deployment_id": str(dep_id)}, "queued")
+
+    kinds = {"run_deployment": JOB_KINDS["run_deployment"]._replace(
+        run=lambda payload, db: run_deployment(UUID(payload["deployment_id"]), db, step_seconds=0)
+    )}
+    assert asyncio.run(make_worker(test_db, kinds).run_once()) == 1
+    test_db.expire_all()
+    assert test_db.get(Deployment, dep_id).status == "succeeded"
+    # Finished jobs leave the table
+    assert test_db.execute(select(Job)).scalars().all() == []
+
+
+def test_failing_job_is_retried_with_backoff_then_dead_lettered(test_db, env):
+    dep = Deployment(environment_id=env.id, version="v1", status="pending")
+    test_db.add(dep)
+    test_db.commit()
+    dep_id = dep.id
+
+    async def broken(payload, db):
+        raise RuntimeError("registry unreachable")
+
+    kinds = {"run_deployment": JobKind(run=broken, dead_letter=JOB_KINDS["run_deployment"].dead_letter)}
+    worker = make_worker(test_db, kinds)
+    jobs_service.enqueue_job(test_db, "run_deployment", {"deployment_id": str(dep_id)}, max_attempts=3)
+    test_db.commit()
+
+    for attempt in (1, 2):
+        assert asyncio.run(worker.run_once()) == 1
+        job = test_db.execute(select(Job)).scalar_one()
+        test_db.refresh(job)
+        assert (job.status, job.attempts, job.last_error) == ("queued", attempt, "RuntimeError: registry unreachable")
+
+    assert asyncio.run(worker.run_once()) == 1
+    test_db.expire_all()
+    job = test_db.execute(select(Job)).scalar_one()
+    assert (job.status, job.attempts) == ("dead", 3)
+    assert test_db.get(Deployment, dep_id).status == "failed"
+    assert asyncio.run(worker.run_once()) == 0
+    assert worker.stats() == {
+        "concurrency": 1, "running": 0, "claimed": 3, "succeeded": 0, "retried": 2, "dead": 1, "interrupted": 0, "lease_lost": 0,
+        "queue_depth": {},
+    }
+
+    assert jobs_repo.requeue_dead_jobs(test_db, datetime.now(timezone.utc)) == 1
+    test_db.commit()
+    test_db.refresh(job)
+    assert (job.status, job.attempts) == ("queued", 0)
+
+
+def test_shutdown_cancels_jobs_past_the_grace_period_and_requeues_them(test_db, env):
+    dep = Deployment(environment_id=env.id, version="v1", status="pending")
+    test_db.add(dep)
+    test_db.commit()
+    dep_id = dep.id
+    jobs_service.enqueue_job(test_db, "run_deployment", {"deployment_id": str(dep_id)})
+    test_db.commit()
+
+    begun = asyncio.Event()
+
+    class Runner:
+        # The tests share one connection, so a read before begin_rollout commits
+        # sees its uncommitted write: wait for the step to return instead
+        def __init__(self, db):
+            self.db = db
+
+        async def run(self, fn, *args):
+            result = await self.db.run(fn, *args)
+            if fn is begin_rollout:
+                begun.set()
+            return result
+
+    kinds = {"run_deployment": JobKind(
+        run=lambda payload, db: run_deployment(UUID(payload["deployment_id"]), Runner(db), step_seconds=60)
+    )}
+    worker = make_worker(test_db, kinds)
+
+    async def start_then_stop():
+        stop = asyncio.Event()
+        running = asyncio.create_task(worker.run(stop))
+        await asyncio.wait_for(begun.wait(), 5)
+        stop.set()
+        await asyncio.wait_for(running, 5)
+
+    asyncio.run(start_then_stop())
+
+    test_db.expire_all()
+    job = test_db.execute(select(Job)).scalar_one()
+    # Due again at once, for this or another worker
+    assert (job.status, job.attempts, job.last_error) == ("queued", 1, "Interrupted by worker shutdown")
+    assert job.run_after.replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc)
+    assert worker.stats()["interrupted"] == 1
+    assert test_db.get(Deployment, dep_id).status == "running"
+
+
+def test_backoff_doubles_up_to_the_cap():
+    assert [jobs_service.retry_delay_seconds(n, 5, 60) for n in (1, 2, 3, 4, 5)] == [5, 10, 20, 40, 60]
+
+
+def test_expired_lease_is_taken_over_and_fences_the_first_worker(test_db):
+    jobs_service.enqueue_job(test_db, "noop", {}, max_attempts=5)
+    test_db.commit()
+    now = datetime.now(timezone.utc)
+
+    [first] = jobs_repo.claim_jobs(test_db, "w1", now, now + timedelta(seconds=30), 10)
+    test_db.commit()
+    # Leased: nobody else gets it
+    assert jobs_repo.claim_jobs(test_db, "w2", now + timedelta(seconds=10), now + timedelta(seconds=40), 10) == []
+
+    later = now + timedelta(seconds=31)
+    [second] = jobs_repo.claim_jobs(test_db, "w2", later, later + timedelta(seconds=30), 10)
+    test_db.commit()
+    assert (first.id, first.attempts, second.attempts) == (second.id, 1, 2)
+
+    # The first worker's claim is stale: it can no longer finish or fail the job
+    assert not jobs_repo.finish_job(test_db, first.id, first.attempts)
+    assert not jobs_repo.dead_letter_job(test_db, first.id, first.attempts, "late")
+    assert jobs_repo.finish_job(test_db, second.id, second.attempts)
+    test_db.commit()
+
+
+def test_worker_that_lost_its_lease_writes_nothing_more(test_db, env):
+    dep = Deployment(environment_id=env.id, version="v1", status="pending")
+    test_db.add(dep)
+    test_db.commit()
+    dep_id = dep.id
+    jobs_service.enqueue_job(test_db, "run_deployment", {"deployment_id": str(dep_id)})
+    test_db.commit()
+
+    taken_over = asyncio.Event()
+
+    async def rollout_outlived_by_its_lease(payload, db):
+        await db.run(begin_deployment_step, dep_id)
+        await taken_over.wait()
+        # The next step of the stale run is refused before it writes
+        await db.run(begin_deployment_step, dep_id)
+
+    def begin_deployment_step(db, deployment_id):
+        log = DeploymentLogWriter(db, deployment_id)
+        log.write(DEPLOY_STREAM, "step")
+        log.flush()
+        db.commit()
+
+    worker = make_worker(test_db, {"run_deployment": JobKind(run=rollout_outlived_by_its_lease)})
+
+    async def run_and_take_over():
+        [job] = await worker.claim(1)
+        running = asyncio.create_task(worker.execute(job))
+        while read_log(test_db, dep_id, DEPLOY_STREAM) == "":
+            await asyncio.sleep(0.01)
+        # The lease expired and another worker claimed the job
+        later = datetime.now(timezone.utc) + timedelta(seconds=120)
+        jobs_repo.claim_jobs(test_db, "w2", later, later + timedelta(seconds=60), 1)
+        test_db.commit()
+        taken_over.set()
+        await asyncio.wait_for(running, 5)
+
+    asyncio.run(run_and_take_over())
+
+    assert read_log(test_db, dep_id, DEPLOY_STREAM).splitlines() == ["step"]
+    test_db.expire_all()
+    job = test_db.execute(select(Job)).scalar_one()
+    assert (job.status, job.attempts, job.locked_by) == ("running", 2, "w2")
+    assert worker.stats()["lease_lost"] == 1
+    assert worker.stats()["retried"] == 0
+
+
+def test_renewal_cancels_a_job_another_worker_took_over(test_db):
+    jobs_service.enqueue_job(test_db, "wait", {})
+    test_db.commit()
+
+    async def wait_forever(payload, db):
+        await asyncio.Event().wait()
+
+    worker = make_worker(test_db, {"wait": JobKind(run=wait_forever)})
+    worker.visibility_timeout_seconds = 0.3  # Renewed every 0.1s
+
+    async def take_over_while_running():
+        stop = asyncio.Event()
+        running = asyncio.create_task(worker.run(stop))
+        while worker.stats()["running"] == 0:
+            await asyncio.sleep(0.01)
+        later = datetime.now(timezone.utc) + timedelta(seconds=1)
+        jobs_repo.claim_jobs(test_db, "w2", later, later + timedelta(seconds=60), 1)
+        test_db.commit()
+        while worker.stats()["running"]:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await asyncio.wait_for(running, 5)
+
+    asyncio.run(asyncio.wait_for(take_over_while_running(), 5))
+
+    test_db.expire_all()
+    job = test_db.execute(select(Job)).scalar_one()
+    # Left to the worker that took it over
+    assert (job.status, job.attempts, job.locked_by, job.last_error) == ("running", 2, "w2", None)
+    assert worker.stats()["lease_lost"] == 1
+    assert worker.stats()["interrupted"] == 0
+
+
+def test_postgres_claim_skips_rows_locked_by_other_workers():
+    now = datetime.now(timezone.utc)
+
+    class Capture:
+        def execute(self, statement, *args, **kwargs):
+            self.sql = str(statement.compile(dialect=postgresql.dialect()))
+            return self
+
+        def all(self):
+            return []
+
+    db = Capture()
+    jobs_repo.claim_jobs(db, "w1", now, now, 10)
+    assert "FOR UPDATE SKIP LOCKED" in db.sql
+    assert "RETURNING" in db.sql
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.last_seen import LastSeenBuffer
+from app.core.security import generate_session_id, hash_token
+from app.models.session import Session as SessionModel
+from app.models.user import User
+
+
+def create_sessions(test_db, count):
+    user = User(email="t@t.com", password_hash="pw", is_verified=True)
+    test_db.add(user)
+    test_db.commit()
+
+    hashes = []
+    for _ in range(count):
+        session_hash = hash_token(generate_session_id())
+        test_db.add(
+            SessionModel(
+                user_id=user.id,
+                session_id_hash=session_hash,
+                expires_at=datetime.now(timezone.utc) + timedelta(days=1),
+                last_seen_at=datetime(2020, 1, 1, tzinfo=timezone.utc),
+            )
+        )
+        hashes.append(session_hash)
+    test_db.commit()
+    return hashes
+
+
+def make_buffer(test_db, **overrides):
+    options = {
+        "session_factory": sessionmaker(bind=test_db.get_bind()),
+        "flush_interval_seconds": 3600,
+        "max_entries": 100,
+        "min_delta_seconds": 60,
+    }
+    options.update(overrides)
+    return LastSeenBuffer(**options)
+
+
+def last_seen_of(test_db, session_hash):
+    test_db.expire_all()
+    record = (
+        test_db.query(SessionModel)
+        .filter(SessionModel.session_id_hash == session_hash)
+        .one()
+    )
+    return record.last_seen_at.replace(tzinfo=timezone.utc)
+
+
+def test_flush_writes_all_pending_sessions(test_db):
+    hashes = create_sessions(test_db, 3)
+    buffer = make_buffer(test_db)
+    now = datetime.now(timezone.utc)
+
+    for session_hash in hashes:
+        buffer.touch(session_hash, now)
+    assert buffer.stats()["pending"] == 3
+
+    assert buffer.flush() == 3
+    for session_hash in hashes:
+        assert last_seen_of(test_db, session_hash) == now
+    assert buffer.stats()["pending"] == 0
+
+
+def test_touch_within_min_delta_is_skipped(test_db):
+    (session_hash,) = create_sessions(test_db, 1)
+    buffer = make_buffer(test_db)
+    now = datetime.now(timezone.utc)
+
+    buffer.touch(session_hash, now)
+    buffer.touch(session_hash, now + timedelta(seconds=30))
+    assert buffer.stats()["skipped"] == 1
+
+    buffer.flush()
+    assert last_seen_of(test_db, session_hash) == now
+
+
+def test_max_entries_wakes_the_flusher_instead_of_flushing_inline(test_db):
+    hashes = create_sessions(test_db, 2)
+    buffer = make_buffer(test_db, max_entries=2)
+    now = datetime.now(timezone.utc)
+
+    async def flusher():
+        loop = asyncio.get_running_loop()
+        waiting = asyncio.ensure_future(buffer.wait_until_due(3600))
+        await asyncio.sleep(0)
+        # Requests touch from the threadpool; the second one makes a flush due
+        for session_hash in hashes:
+            await loop.run_in_executor(None, buffer.touch, session_hash, now)
+        await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(flusher())
+    # The touches themselves wrote nothing
+    assert buffer.stats()["flushes"] == 0
+    assert buffer.stats()["pending"] == 2
+
+    assert buffer.flush() == 2
+    assert buffer.stats() == {
+        "pending": 0,
+        "skipped": 0,
+        "flushes": 1,
+        "flushed_rows": 2,
+        "failed_flushes": 0,
+    }
+    assert last_seen_of(test_db, hashes[1]) == now
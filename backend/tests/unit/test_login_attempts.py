@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import fakeredis
+
+from app.core.config import settings
+from app.core.login_attempts import InMemoryLoginAttemptStore, RedisLoginAttemptStore
+from app.core.security import hash_password
+from app.models.user import User
+from app.services import auth as auth_service
+
+
+def test_failures_slide_out_of_window():
+    now = [0.0]
+    store = InMemoryLoginAttemptStore(window_seconds=60, clock=lambda: now[0])
+
+    assert store.record_failure("user:a") == 1
+    now[0] = 30.0
+    assert store.record_failure("user:a") == 2
+
+    now[0] = 61.0
+    assert store.failures("user:a") == 1
+    now[0] = 91.0
+    assert store.failures("user:a") == 0
+    assert store.stats() == {"tracked_keys": 0}
+
+
+def test_reset_and_key_cap():
+    store = InMemoryLoginAttemptStore(window_seconds=60, max_keys=2)
+
+    store.record_failure("user:a")
+    store.record_failure("user:b")
+    store.record_failure("user:c")
+    assert store.failures("user:a") == 0
+    assert store.stats() == {"tracked_keys": 2}
+
+    store.reset("user:b")
+    assert store.failures("user:b") == 0
+
+
+def test_redis_store_slides_window_and_resets():
+    now = [1000.0]
+    client = fakeredis.FakeRedis()
+    store = RedisLoginAttemptStore(client, window_seconds=60, clock=lambda: now[0])
+
+    assert store.record_failure("user:a") == 1
+    now[0] = 1030.0
+    assert store.record_failure("user:a") == 2
+    assert store.failures("user:b") == 0
+
+    now[0] = 1060.0
+    assert store.failures("user:a") == 1
+    assert store.record_failure("user:a") == 2
+    # Old attempts are trimmed on write and the key expires with the window
+    assert client.zcard("envctl:login:user:a") == 2
+    assert 0 < client.ttl("envctl:login:user:a") <= 61
+
+    store.reset("user:a")
+    assert store.failures("user:a") == 0
+    assert not client.exists("envctl:login:user:a")
+    assert store.stats() == {}
+
+
+def test_store_calls_stay_off_the_event_loop(test_db, monkeypatch):
+    user = User(email="t@t.com", password_hash=hash_password("right"), is_verified=True)
+    test_db.add(user)
+    test_db.commit()
+
+    class RecordingStore(InMemoryLoginAttemptStore):
+        def record_failure(self, key):
+            threads.append(threading.get_ident())
+            return super().record_failure(key)
+
+        def reset(self, key):
+            threads.append(threading.get_ident())
+            super().reset(key)
+
+    class OnLoopRunner:
+        # As AsyncSession.run_sync does: DB steps run on the event loop's thread
+        async def run(self, fn, *args):
+            return fn(test_db, *args)
+
+    threads = []
+    monkeypatch.setattr(auth_service, "login_attempts", RecordingStore(window_seconds=60))
+    monkeypatch.setattr(settings, "login_max_failed_attempts", 2)
+
+    async def log_in(passwords):
+        results = [await auth_service.authenticate_user(OnLoopRunner(), "t@t.com", p) for p in passwords]
+        return [found is not None for found, _, _ in results], threading.get_ident()
+
+    logged_in, loop_thread = asyncio.run(log_in(["wrong", "right", "wrong", "wrong"]))
+    assert logged_in == [False, True, False, False]
+    test_db.refresh(user)
+    assert user.lockout_until is not None
+    # failure, reset on success, two failures, reset after the lockout
+    assert len(threads) == 5
+    assert loop_thread not in threads
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.database import Base
+from app.core.migrations import (
+    SchemaVersionError,
+    check_schema_version,
+    current_revision,
+    head_revision,
+    run_migrations,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_startup_check_rejects_unmigrated_database(engine):
+    with pytest.raises(SchemaVersionError, match="app.cli migrate"):
+        check_schema_version(engine)
+
+
+def test_migrations_create_the_model_schema(engine):
+    assert run_migrations(engine) == head_revision()
+    assert check_schema_version(engine) == head_revision()
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert columns == set(table.columns.keys()), table.name
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+
+    # A second run finds nothing to do
+    assert run_migrations(engine) == head_revision()
+
+
+def test_migrations_upgrade_a_database_at_an_older_revision(engine):
+    assert run_migrations(engine, "0001") == "0001"
+    with pytest.raises(SchemaVersionError):
+        check_schema_version(engine)
+
+    assert run_migrations(engine) == head_revision()
+
+
+def test_revision_read_leaves_no_transaction_open(engine):
+    # Alembic must open the migration transaction itself (autocommit_block in 0002, 0003)
+    with engine.connect() as connection:
+        assert current_revision(connection) is None
+        assert not connection.in_transaction()
+
+    run_migrations(engine, "0001")
+    with engine.connect() as connection:
+        assert current_revision(connection) == "0001"
+        assert not connection.in_transaction()
+
+
+def test_migrations_adopt_database_from_before_migrations(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE users (id CHAR(32) PRIMARY KEY, email VARCHAR(255) NOT NULL, "
+            "password_hash VARCHAR(255) NOT NULL, created_at DATETIME NOT NULL, updated_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO users (id, email, password_hash, created_at) "
+            "VALUES ('0123456789abcdef0123456789abcdef', 'old@example.com', 'x', '2024-01-01')"
+        ))
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT email, is_verified, failed_login_attempts FROM users")).one()
+    assert tuple(row) == ("old@example.com", 0, 0)
+    assert "sessions" in inspect(engine).get_table_names()
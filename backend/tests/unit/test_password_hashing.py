@@ -0,0 +1,54 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.exceptions import ServiceUnavailableException
+from app.core.password_hashing import PasswordHashingPool
+
+
+def test_hash_and_verify_on_dedicated_pool():
+    pool = PasswordHashingPool(executor_kind="thread", workers=1, max_pending=4)
+
+    async def scenario():
+        hashed = await pool.hash("correct horse")
+        assert await pool.verify("correct horse", hashed)
+        assert not await pool.verify("wrong horse", hashed)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert pool.stats()["completed"] == 3
+    assert pool.stats()["pending"] == 0
+
+
+def test_rejects_when_queue_is_full():
+    pool = PasswordHashingPool(executor_kind="thread", workers=1, max_pending=1)
+
+    async def scenario():
+        in_flight = asyncio.ensure_future(pool.hash("first password"))
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceUnavailableException):
+            await pool.hash("second password")
+        await in_flight
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert pool.stats()["rejected"] == 1
+
+
+def test_failed_submit_frees_its_slot():
+    pool = PasswordHashingPool(executor_kind="thread", workers=1, max_pending=1)
+    pool._executor = ThreadPoolExecutor(max_workers=1)
+    pool._executor.shutdown()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.hash("any password"))
+
+    assert pool.stats()["pending"] == 0
+    assert pool.stats()["completed"] == 0
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.core.query_plans import QueryPlanAdvisor, postgres_seq_scans, sqlite_full_scans
+from app.models.deployment import Deployment
+from app.models.environment import Environment
+from app.models.project import Project
+from app.models.user import User
+from app.repositories.deployments import get_deployment_by_id_and_owner, list_deployments_by_environment_and_owner
+from app.repositories.environments import get_environment_by_id_and_owner, get_environments_for_project_and_owner
+from app.repositories.projects import get_projects_by_owner
+from app.repositories.users import get_user_by_verification_token_hash
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_sqlite_plan_flags_plain_scans_only():
+    plan = [
+        (2, 0, 0, "SCAN projects_1"),
+        (4, 0, 0, "SEARCH users USING INDEX ix_users_email (email=?)"),
+        (6, 0, 0, "SCAN sessions USING COVERING INDEX ix_sessions_expires_at"),
+    ]
+    statement = "SELECT * FROM projects AS projects_1 JOIN users ON users.id = projects_1.owner_id"
+    assert sqlite_full_scans(plan, statement) == ["projects"]
+
+
+def test_postgres_plan_finds_nested_seq_scans():
+    plan = [{"Plan": {"Node Type": "Hash Join", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "projects"},
+        {"Node Type": "Index Scan", "Relation Name": "users"},
+    ]}}]
+    assert postgres_seq_scans(plan) == ["projects"]
+
+
+def test_lookups_by_foreign_key_use_indexes(session_factory):
+    advisor = QueryPlanAdvisor(min_rows=1)
+    with session_factory() as db:
+        advisor.install(db.get_bind())
+        user = User(email="t@t.com", password_hash="pw", verification_token_hash="token")
+        db.add(user)
+        db.flush()
+        project = Project(name="p1", owner_id=user.id)
+        db.add(project)
+        db.flush()
+        environment = Environment(project_id=project.id, name="dev", type="ephemeral")
+        db.add(environment)
+        db.flush()
+        deployment = Deployment(environment_id=environment.id, version="v1")
+        db.add(deployment)
+        db.commit()
+
+        get_projects_by_owner(db, user.id, limit=10)
+        get_environments_for_project_and_owner(db, project.id, user.id, limit=10)
+        get_environment_by_id_and_owner(db, environment.id, user.id)
+        list_deployments_by_environment_and_owner(db, environment.id, user.id, limit=10)
+        get_deployment_by_id_and_owner(db, deployment.id, user.id)
+        get_user_by_verification_token_hash(db, "token")
+
+    stats = advisor.stats()
+    assert stats["statements_explained"] >= 6
+    assert stats["sequential_scans"] == []
+
+
+def test_scan_of_large_table_is_flagged(session_factory):
+    advisor = QueryPlanAdvisor(min_rows=2)
+    with session_factory() as db:
+        with db.get_bind().begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_projects_owner_id_created_at_id")
+        advisor.install(db.get_bind())
+
+        user = User(email="t@t.com", password_hash="pw")
+        db.add(user)
+        db.flush()
+        db.add_all(Project(name=f"p{i}", owner_id=user.id) for i in range(3))
+        db.commit()
+
+        get_projects_by_owner(db, user.id, limit=10)
+        get_projects_by_owner(db, user.id, limit=10)
+
+    [finding] = advisor.stats()["sequential_scans"]
+    assert finding["table"] == "projects"
+    assert finding["rows"] == 3
+    assert finding["endpoint"] == "(no request)"
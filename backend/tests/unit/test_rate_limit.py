@@ -0,0 +1,51 @@
+import pytest
+
+from app.core.exceptions import RateLimitedException
+from app.core.rate_limit import ClientIpResolver, TokenBucketLimiter
+from app.services import auth as auth_service
+
+
+def test_bucket_rejects_after_burst_and_refills():
+    now = [0.0]
+    limiter = TokenBucketLimiter(rate_per_second=0.5, burst=2, clock=lambda: now[0])
+
+    assert limiter.try_acquire("ip:1") == 0
+    assert limiter.try_acquire("ip:1") == 0
+    assert limiter.try_acquire("ip:1") == 2.0
+
+    # Other keys have their own bucket
+    assert limiter.try_acquire("ip:2") == 0
+
+    now[0] = 2.0
+    assert limiter.try_acquire("ip:1") == 0
+    assert limiter.stats() == {"admitted": 4, "rejected": 1, "tracked_keys": 2}
+
+
+def test_client_ip_only_trusts_forwarded_for_from_trusted_proxies():
+    resolver = ClientIpResolver(["10.0.0.0/8", "127.0.0.1"])
+
+    # Direct client: its own X-Forwarded-For is ignored
+    assert resolver.resolve("203.0.113.7", "198.51.100.1") == "203.0.113.7"
+    # Behind proxies: the rightmost address that is not a trusted proxy
+    assert resolver.resolve("10.0.0.5", "198.51.100.1, 203.0.113.7, 10.1.2.3") == "203.0.113.7"
+    assert resolver.resolve("127.0.0.1", None) == "127.0.0.1"
+    assert resolver.resolve(None, "203.0.113.7") is None
+
+    assert ClientIpResolver([]).resolve("10.0.0.5", "203.0.113.7") == "10.0.0.5"
+
+
+def test_rejected_ip_spends_no_account_token(monkeypatch):
+    now = [0.0]
+    ip_limiter = TokenBucketLimiter(rate_per_second=0.01, burst=1, clock=lambda: now[0])
+    account_limiter = TokenBucketLimiter(rate_per_second=0.01, burst=2, clock=lambda: now[0])
+    monkeypatch.setattr(auth_service, "login_ip_limiter", ip_limiter)
+    monkeypatch.setattr(auth_service, "login_account_limiter", account_limiter)
+
+    auth_service.admit_login_attempt("a@example.com", "203.0.113.7")
+    for _ in range(5):
+        with pytest.raises(RateLimitedException):
+            auth_service.admit_login_attempt("a@example.com", "203.0.113.7")
+
+    # The sprayer used one account token; the owner still gets in from elsewhere
+    assert account_limiter.stats()["admitted"] == 1
+    auth_service.admit_login_attempt("a@example.com", "198.51.100.1")
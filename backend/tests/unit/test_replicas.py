@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db_runner import FailoverSessionRunner, ThreadedSessionRunner
+from app.core.replicas import READ_PRIMARY_COOKIE, ReplicaSet, choose_read_engine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_request(cookies: dict[str, str] | None = None) -> Request:
+    cookie_header = "; ".join(f"{key}={value}" for key, value in (cookies or {}).items())
+    headers = [(b"cookie", cookie_header.encode())] if cookie_header else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_round_robin_skips_a_failed_replica_until_retry():
+    clock = FakeClock()
+    replicas = ReplicaSet(["a", "b"], retry_seconds=30, clock=clock)
+    assert [replicas.choose() for _ in range(4)] == ["a", "b", "a", "b"]
+
+    replicas.mark_down(0)
+    assert [replicas.choose() for _ in range(3)] == ["b", "b", "b"]
+
+    clock.now = 31
+    assert {replicas.choose() for _ in range(2)} == {"a", "b"}
+
+
+def test_all_replicas_down_falls_back_to_primary():
+    replicas = ReplicaSet(["a"], retry_seconds=30, clock=FakeClock())
+    replicas.mark_down(0)
+    assert choose_read_engine(make_request(), replicas, "primary") == "primary"
+
+
+def test_recent_write_pins_reads_to_primary():
+    replicas = ReplicaSet(["a"], retry_seconds=30)
+    pinned = make_request({READ_PRIMARY_COOKIE: str(int(time.time()) + 5)})
+    expired = make_request({READ_PRIMARY_COOKIE: str(int(time.time()) - 5)})
+
+    assert choose_read_engine(pinned, replicas, "primary") == "primary"
+    assert choose_read_engine(expired, replicas, "primary") == "a"
+    assert choose_read_engine(make_request(), ReplicaSet([], 30), "primary") == "primary"
+
+
+def test_failed_replica_read_is_retried_on_primary(tmp_path):
+    primary_engine = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    with primary_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (name TEXT)"))
+        conn.execute(text("INSERT INTO items VALUES ('from-primary')"))
+    # The replica file is missing its table, so every read on it fails
+    replica_engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    replicas = ReplicaSet([replica_engine], retry_seconds=30)
+    replicas.watch(0, replica_engine)
+
+    def read_items(db):
+        return db.execute(text("SELECT name FROM items")).scalars().all()
+
+    async def scenario():
+        with sessionmaker(bind=replica_engine)() as replica, sessionmaker(bind=primary_engine)() as primary:
+            runner = FailoverSessionRunner(ThreadedSessionRunner(replica), ThreadedSessionRunner(primary))
+            return await runner.run(read_items), runner.failed_over
+
+    assert asyncio.run(scenario()) == (["from-primary"], True)
+    assert replicas.stats()["healthy"] == [False]
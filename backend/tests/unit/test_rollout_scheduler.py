@@ -0,0 +1,135 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db_runner import ThreadedSessionPerRunRunner
+from app.models.deployment import Deployment
+from app.models.environment import Environment
+from app.models.job import Job
+from app.models.project import Project
+from app.models.user import User
+from app.repositories import jobs as jobs_repo
+from app.schemas.deployment import DeploymentCreate
+from app.services.deployment_logs import DEPLOY_STREAM, read_log
+from app.services.deployments import create_deployment, run_deployment
+from app.services.job_worker import JobKind, JobWorker
+from app.services.rollout_scheduler import rollout_stats
+
+
+@pytest.fixture
+def owner_and_envs(test_db):
+    user = User(email="t@t.com", password_hash="pw")
+    test_db.add(user)
+    test_db.commit()
+    project = Project(name="p1", owner_id=user.id)
+    test_db.add(project)
+    test_db.commit()
+    envs = [Environment(project_id=project.id, name=f"e{i}", status="running", type="ephemeral") for i in (1, 2)]
+    test_db.add_all(envs)
+    test_db.commit()
+    return user.id, envs
+
+
+def deploy(test_db, owner_id, env, version) -> Deployment:
+    dep = create_deployment(test_db, env.id, DeploymentCreate(version=version), owner_id)
+    test_db.commit()
+    return dep
+
+
+def claim(test_db, now=None, **kwargs) -> list:
+    now = now or datetime.now(timezone.utc)
+    jobs = jobs_repo.claim_jobs(test_db, "w1", now, now + timedelta(seconds=60), 10, **kwargs)
+    test_db.commit()
+    return jobs
+
+
+def test_queued_rollouts_of_an_environment_coalesce_to_the_newest(test_db, owner_and_envs):
+    owner_id, (env, _) = owner_and_envs
+    coalesced = rollout_stats.stats()["coalesced"]
+
+    v1, v2, v3 = (deploy(test_db, owner_id, env, version) for version in ("v1", "v2", "v3"))
+
+    test_db.expire_all()
+    assert [test_db.get(Deployment, dep.id).status for dep in (v1, v2, v3)] == ["superseded", "superseded", "pending"]
+    assert read_log(test_db, v1.id, DEPLOY_STREAM).rstrip().endswith(f"Superseded by version v2 (deployment {v2.id}).")
+    job = test_db.execute(select(Job)).scalar_one()
+    assert job.payload == {"deployment_id": str(v3.id)}
+    assert rollout_stats.stats()["coalesced"] == coalesced + 2
+
+
+def test_an_environment_runs_one_rollout_at_a_time(test_db, owner_and_envs):
+    owner_id, (env, other_env) = owner_and_envs
+    deploy(test_db, owner_id, env, "v1")
+    [running] = claim(test_db)
+
+    # Queued behind the running one: not claimable, and nothing to coalesce with
+    v2 = deploy(test_db, owner_id, env, "v2")
+    other = deploy(test_db, owner_id, other_env, "v1")
+    assert [job.payload["deployment_id"] for job in claim(test_db)] == [str(other.id)]
+
+    assert jobs_repo.finish_job(test_db, running.id, running.attempts)
+    test_db.commit()
+    assert [job.payload["deployment_id"] for job in claim(test_db)] == [str(v2.id)]
+
+
+def test_jobs_sharing_a_key_are_claimed_oldest_first(test_db):
+    from app.services.jobs import enqueue_job
+
+    for n in range(3):
+        enqueue_job(test_db, "noop", {"n": n}, concurrency_key="k")
+    test_db.commit()
+
+    for n in range(3):
+        [job] = claim(test_db)
+        assert job.payload == {"n": n}
+        # An expired lease is taken over before the next job of the key
+        later = datetime.now(timezone.utc) + timedelta(seconds=61)
+        [again] = claim(test_db, now=later)
+        assert again.id == job.id
+        assert jobs_repo.finish_job(test_db, again.id, again.attempts)
+        test_db.commit()
+    assert claim(test_db) == []
+
+
+def test_rollout_that_finds_a_newer_deployment_gives_way(test_db, owner_and_envs):
+    owner_id, (env, _) = owner_and_envs
+    v1 = deploy(test_db, owner_id, env, "v1")
+    claim(test_db)  # v1's rollout is claimed, so v2 does not replace its job
+    v2 = deploy(test_db, owner_id, env, "v2")
+    superseded_on_start = rollout_stats.stats()["superseded_on_start"]
+
+    runner = ThreadedSessionPerRunRunner(sessionmaker(bind=test_db.get_bind()))
+    asyncio.run(run_deployment(v1.id, runner, step_seconds=0))
+
+    test_db.expire_all()
+    assert test_db.get(Deployment, v1.id).status == "superseded"
+    assert test_db.get(Deployment, v2.id).status == "pending"
+    assert rollout_stats.stats()["superseded_on_start"] == superseded_on_start + 1
+
+
+def test_worker_caps_running_jobs_of_a_kind(test_db, owner_and_envs):
+    owner_id, envs = owner_and_envs
+    for env in envs:
+        deploy(test_db, owner_id, env, "v1")
+
+    async def noop(payload, db):
+        pass
+
+    worker = JobWorker(
+        db=ThreadedSessionPerRunRunner(sessionmaker(bind=test_db.get_bind())),
+        kinds={"run_deployment": JobKind(run=noop, max_running=1)},
+        concurrency=10,
+        poll_seconds=0,
+        visibility_timeout_seconds=60,
+        retry_base_seconds=0,
+        retry_max_seconds=60,
+        shutdown_grace_seconds=0,
+        worker_id="w1",
+    )
+    assert asyncio.run(worker.claim(10)) and worker.claimed == 1
+    # The cap counts running jobs of every worker
+    assert asyncio.run(worker.claim(10)) == []
+    assert worker.stats()["queue_depth"] == {"run_deployment": 1}
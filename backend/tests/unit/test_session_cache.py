@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core.security import generate_session_id, hash_token
+from app.core.session_cache import SessionCache, CachedSession, negative_session_cache, session_cache
+from app.models.session import Session as SessionModel
+from app.models.user import User
+from app.services.auth import get_current_user_from_session_id, revoke_session
+import app.repositories.sessions as sessions_repo
+
+
+def make_entry():
+    return CachedSession(
+        user=None,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=1),
+        revoked=False,
+    )
+
+
+def create_session(test_db):
+    user = User(email="t@t.com", password_hash="pw", is_verified=True)
+    test_db.add(user)
+    test_db.commit()
+
+    raw_session_id = generate_session_id()
+    test_db.add(
+        SessionModel(
+            user_id=user.id,
+            session_id_hash=hash_token(raw_session_id),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+    )
+    test_db.commit()
+    return user, raw_session_id
+
+
+def test_cache_hit_miss_and_eviction():
+    cache = SessionCache(ttl_seconds=60, max_entries=2)
+
+    assert cache.get("a") is None
+    cache.put("a", make_entry())
+    cache.put("b", make_entry())
+    assert cache.get("a") is not None
+
+    # "b" is now least recently used and gets evicted
+    cache.put("c", make_entry())
+    assert cache.get("b") is None
+
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 2,
+        "evictions": 1,
+        "size": 2,
+        "max_entries": 2,
+    }
+
+
+def test_cache_entries_expire_after_ttl():
+    now = [0.0]
+    cache = SessionCache(ttl_seconds=30, max_entries=10, clock=lambda: now[0])
+    cache.put("a", make_entry())
+
+    now[0] = 29.0
+    assert cache.get("a") is not None
+    now[0] = 30.0
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_current_user_is_served_from_cache(test_db):
+    user, raw_session_id = create_session(test_db)
+
+    first = get_current_user_from_session_id(test_db, raw_session_id)
+    assert first.id == user.id
+
+    hits = session_cache.hits
+    # Remove the session row: a cache hit must not need it
+    test_db.query(SessionModel).delete()
+    test_db.commit()
+
+    second = get_current_user_from_session_id(test_db, raw_session_id)
+    assert second is not None
+    assert second.id == user.id
+    assert session_cache.hits == hits + 1
+
+
+def test_unknown_session_ids_stay_out_of_the_live_cache(test_db):
+    _, raw_session_id = create_session(test_db)
+    assert get_current_user_from_session_id(test_db, raw_session_id) is not None
+    live_size = session_cache.stats()["size"]
+
+    for _ in range(5):
+        assert get_current_user_from_session_id(test_db, generate_session_id()) is None
+
+    assert session_cache.stats()["size"] == live_size
+    assert session_cache.get(hash_token(raw_session_id)) is not None
+
+    # A repeated junk cookie is answered from the negative cache
+    junk = generate_session_id()
+    assert get_current_user_from_session_id(test_db, junk) is None
+    hits = negative_session_cache.hits
+    assert get_current_user_from_session_id(test_db, junk) is None
+    assert negative_session_cache.hits == hits + 1
+
+
+def test_revoke_session_invalidates_cache(test_db):
+    _, raw_session_id = create_session(test_db)
+
+    assert get_current_user_from_session_id(test_db, raw_session_id) is not None
+    revoke_session(test_db, raw_session_id)
+    test_db.commit()
+
+    assert get_current_user_from_session_id(test_db, raw_session_id) is None
+
+
+def test_active_user_lookup_filters_revoked_and_expired(test_db):
+    user, raw_session_id = create_session(test_db)
+    session_hash = hash_token(raw_session_id)
+    now = datetime.now(timezone.utc)
+
+    row = sessions_repo.get_active_user_by_session_hash(test_db, session_hash, now)
+    assert row is not None
+    assert row[0].id == user.id
+
+    later = now + timedelta(days=2)
+    assert sessions_repo.get_active_user_by_session_hash(test_db, session_hash, later) is None
+
+    record = sessions_repo.get_session_by_hash(test_db, session_hash)
+    record.revoked_at = now
+    test_db.commit()
+    assert sessions_repo.get_active_user_by_session_hash(test_db, session_hash, now) is None
@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.security import generate_session_id, hash_token
+from app.models.session import Session as SessionModel
+from app.models.user import User
+from app.services import session_reaper as reaper_module
+from app.services.session_reaper import SessionReaper
+
+
+def add_session(test_db, user, expires_in, revoked_ago=None):
+    now = datetime.now(timezone.utc)
+    test_db.add(
+        SessionModel(
+            user_id=user.id,
+            session_id_hash=hash_token(generate_session_id()),
+            expires_at=now + expires_in,
+            revoked_at=now - revoked_ago if revoked_ago else None,
+        )
+    )
+
+
+def test_reaper_deletes_expired_and_old_revoked_sessions_in_batches(test_db):
+    user = User(email="t@t.com", password_hash="pw")
+    test_db.add(user)
+    test_db.commit()
+
+    for _ in range(5):
+        add_session(test_db, user, expires_in=timedelta(days=-1))
+    add_session(test_db, user, expires_in=timedelta(days=1), revoked_ago=timedelta(hours=2))
+    # Revoked too recently: still needed by the revocation list
+    add_session(test_db, user, expires_in=timedelta(days=1), revoked_ago=timedelta(seconds=10))
+    add_session(test_db, user, expires_in=timedelta(days=1))
+    test_db.commit()
+
+    reaper = SessionReaper(
+        session_factory=sessionmaker(bind=test_db.get_bind()),
+        batch_size=2,
+        max_batches=10,
+        pause_seconds=0,
+        revoked_retention_seconds=600,
+    )
+
+    assert reaper.run_once() == 6
+    assert test_db.query(SessionModel).count() == 2
+    assert reaper.stats() == {
+        "runs": 1,
+        "rows_reaped": 6,
+        "last_run_rows": 6,
+        "table_rows": 2,
+    }
+
+
+def test_reaper_skips_while_another_replica_sweeps(test_db, monkeypatch):
+    user = User(email="t@t.com", password_hash="pw")
+    test_db.add(user)
+    test_db.commit()
+    add_session(test_db, user, expires_in=timedelta(days=-1))
+    test_db.commit()
+
+    @contextmanager
+    def lock_taken(db):
+        yield False
+
+    monkeypatch.setattr(reaper_module, "sweep_lock", lock_taken)
+    reaper = SessionReaper(
+        session_factory=sessionmaker(bind=test_db.get_bind()),
+        batch_size=2,
+        max_batches=10,
+        pause_seconds=0,
+        revoked_retention_seconds=600,
+    )
+
+    assert reaper.run_once() == 0
+    assert test_db.query(SessionModel).count() == 1
+    assert reaper.stats()["runs"] == 0
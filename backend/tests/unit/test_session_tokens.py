@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.revocation import BloomFilter, RevocationList
+from app.core.security import generate_session_id, hash_token
+from app.models.session import Session as SessionModel
+from app.models.user import User
+from app.services.auth import (
+    get_user_from_access_token,
+    refresh_access_token,
+    revoke_session,
+)
+
+
+def create_session(test_db):
+    user = User(email="t@t.com", password_hash="pw", is_verified=True)
+    test_db.add(user)
+    test_db.commit()
+
+    raw_session_id = generate_session_id()
+    test_db.add(
+        SessionModel(
+            user_id=user.id,
+            session_id_hash=hash_token(raw_session_id),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+    )
+    test_db.commit()
+    return user, raw_session_id
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=100)
+    items = [f"session-{i}" for i in range(100)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(1000))
+    assert false_positives < 20
+
+
+def test_revocation_list_sync_keeps_local_revocations(test_db):
+    _, raw_session_id = create_session(test_db)
+    record = test_db.query(SessionModel).one()
+    record.revoked_at = datetime.now(timezone.utc)
+    test_db.commit()
+
+    revocations = RevocationList(
+        session_factory=sessionmaker(bind=test_db.get_bind()), retention_seconds=600
+    )
+    revocations.add("revoked-locally")
+
+    assert revocations.sync() == 1
+    assert revocations.is_revoked(str(record.id))
+    assert revocations.is_revoked("revoked-locally")
+    assert not revocations.is_revoked("never-revoked")
+
+
+def test_access_token_resolves_user_without_db(test_db):
+    user, raw_session_id = create_session(test_db)
+
+    refreshed_user, access_token = refresh_access_token(test_db, raw_session_id)
+    assert refreshed_user.id == user.id
+
+    # No DB session involved at all
+    principal = get_user_from_access_token(access_token)
+    assert principal.id == user.id
+    assert principal.email == "t@t.com"
+
+    assert get_user_from_access_token("not-a-token") is None
+
+
+def test_revoked_session_rejects_its_access_tokens(test_db):
+    _, raw_session_id = create_session(test_db)
+    _, access_token = refresh_access_token(test_db, raw_session_id)
+
+    revoke_session(test_db, raw_session_id)
+    test_db.commit()
+
+    assert get_user_from_access_token(access_token) is None
+    assert refresh_access_token(test_db, raw_session_id) is None
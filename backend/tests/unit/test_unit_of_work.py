@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from app.core.security import generate_session_id, hash_token
+from app.models.session import Session as SessionModel
+from app.models.user import User
+from app.schemas.project import ProjectCreate
+from app.services.auth import get_current_user_from_session_id, revoke_session
+from app.services.projects import create_project_for_user
+
+
+class StatementLog:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements: list[str] = []
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement.split()[0].upper())
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+def test_create_fills_server_defaults_without_a_refresh(test_db):
+    user = User(email="t@t.com", password_hash="pw")
+    test_db.add(user)
+    test_db.commit()
+    user_id = user.id
+
+    with StatementLog(test_db.get_bind()) as log:
+        project = create_project_for_user(test_db, ProjectCreate(name="p1"), user_id)
+        assert project.created_at is not None
+        test_db.commit()
+
+    # One INSERT ... RETURNING; no SELECT to reload the row
+    assert log.statements == ["INSERT"]
+
+
+def test_revocation_reaches_the_cache_only_on_commit(test_db):
+    user = User(email="t@t.com", password_hash="pw")
+    test_db.add(user)
+    test_db.flush()
+    raw_session_id = generate_session_id()
+    test_db.add(
+        SessionModel(
+            user_id=user.id,
+            session_id_hash=hash_token(raw_session_id),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+    )
+    test_db.commit()
+    assert get_current_user_from_session_id(test_db, raw_session_id) is not None
+
+    # A rolled back request leaves the cached session live
+    revoke_session(test_db, raw_session_id)
+    test_db.rollback()
+    assert get_current_user_from_session_id(test_db, raw_session_id) is not None
+
+    revoke_session(test_db, raw_session_id)
+    test_db.commit()
+    assert get_current_user_from_session_id(test_db, raw_session_id) is None
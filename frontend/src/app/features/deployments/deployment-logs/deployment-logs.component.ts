@@ -4,8 +4,6 @@ import { ActivatedRoute, RouterLink } from '@angular/router';
 import { FormsModule } from '@angular/forms';
 import { DeploymentsService } from '../deployments.service';
 import { LoadingSpinnerComponent } from '../../../shared/components/loading-spinner/loading-spinner.component';
-import { Subscription, interval, of } from 'rxjs';
-import { switchMap, startWith, timeout, catchError } from 'rxjs/operators';
 import { trigger, transition, style, animate } from '@angular/animations';
 
 @Component({
@@ -46,7 +44,7 @@ export class DeploymentLogsComponent implements OnInit, OnDestroy {
     followLogs: boolean = true;
     hasNewLogs: boolean = false;
 
-    private pollSubscription?: Subscription;
+    private logEvents?: EventSource;
 
     constructor(
         private route: ActivatedRoute,
@@ -63,7 +61,7 @@ export class DeploymentLogsComponent implements OnInit, OnDestroy {
 
             if (this.depId) {
                 this.ngZone.run(() => {
-                    this.startPolling();
+                    this.startStreaming();
                 });
             } else {
                 this.ngZone.run(() => {
@@ -76,7 +74,9 @@ export class DeploymentLogsComponent implements OnInit, OnDestroy {
     }
 
     get highlightedLogs(): string {
-        const text = this.activeTab === 'deployment' ? this.deploymentLogs : this.appLogs;
+        const text = this.activeTab === 'deployment'
+            ? this.deploymentLogs || 'No deployment logs available yet...'
+            : this.appLogs || 'No app logs available yet...';
         if (!this.searchQuery) return this.escapeHtml(text);
 
         const escapedSearch = this.searchQuery.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
@@ -145,58 +145,58 @@ export class DeploymentLogsComponent implements OnInit, OnDestroy {
         }
     }
 
-    private startPolling(): void {
-        this.pollSubscription?.unsubscribe();
-        this.pollSubscription = interval(3000)
-            .pipe(
-                startWith(0),
-                switchMap(() => {
-                    return this.deploymentsService.getDeploymentLogs(this.depId!).pipe(
-                        timeout(5000),
-                        catchError(err => {
-                            console.error('Request timeout or error:', err);
-                            return of({ deployment_logs: this.deploymentLogs, app_logs: this.appLogs });
-                        })
-                    );
-                })
-            )
-            .subscribe({
-                next: (data: any) => {
-                    this.ngZone.run(() => {
-                        const newDeploymentLogs = data.deployment_logs || 'No deployment logs available yet...';
-                        const newAppLogs = data.app_logs || 'No app logs available yet...';
-
-                        const logsChanged = newDeploymentLogs !== this.deploymentLogs || newAppLogs !== this.appLogs;
-
-                        this.deploymentLogs = newDeploymentLogs;
-                        this.appLogs = newAppLogs;
-                        this.loading = false;
-
-                        if (logsChanged) {
-                            if (this.followLogs) {
-                                this.scrollToBottom();
-                            } else {
-                                this.hasNewLogs = true;
-                            }
-                        }
-
-                        this.cdr.detectChanges();
-                    });
-                },
-                error: (err) => {
-                    console.error('Error fetching logs:', err);
-                    this.ngZone.run(() => {
-                        this.error = 'Failed to load deployment logs.';
-                        this.loading = false;
-                        this.cdr.detectChanges();
-                    });
+    private startStreaming(): void {
+        this.logEvents?.close();
+        this.deploymentLogs = '';
+        this.appLogs = '';
+
+        const events = this.deploymentsService.streamDeploymentLogs(this.depId!);
+        this.logEvents = events;
+
+        const append = (stream: 'deployment' | 'app', event: MessageEvent) => {
+            this.ngZone.run(() => {
+                if (stream === 'deployment') {
+                    this.deploymentLogs += event.data + '\n';
+                } else {
+                    this.appLogs += event.data + '\n';
                 }
+                this.loading = false;
+
+                if (this.followLogs) {
+                    this.scrollToBottom();
+                } else {
+                    this.hasNewLogs = true;
+                }
+
+                this.cdr.detectChanges();
             });
+        };
+
+        events.onopen = () => {
+            this.ngZone.run(() => {
+                this.loading = false;
+                this.cdr.detectChanges();
+            });
+        };
+        events.addEventListener('deploy', event => append('deployment', event as MessageEvent));
+        events.addEventListener('app', event => append('app', event as MessageEvent));
+        // The deployment has finished: no more lines will come, so do not let the browser reconnect
+        events.addEventListener('end', () => events.close());
+        events.onerror = () => {
+            // Dropped connections are retried by the browser; it only gives up on errors such as a 404
+            if (events.readyState !== EventSource.CLOSED) {
+                return;
+            }
+            console.error('Error streaming logs for deployment', this.depId);
+            this.ngZone.run(() => {
+                this.error = 'Failed to load deployment logs.';
+                this.loading = false;
+                this.cdr.detectChanges();
+            });
+        };
     }
 
     ngOnDestroy(): void {
-        if (this.pollSubscription) {
-            this.pollSubscription.unsubscribe();
-        }
+        this.logEvents?.close();
     }
 }
@@ -4,6 +4,7 @@ import { Observable, interval } from 'rxjs';
 import { switchMap, map } from 'rxjs/operators';
 import { environment } from '../../../environments/environment';
 import { Deployment, DeploymentCreate } from '../../shared/models/deployment.model';
+import { getAllPages } from '../../shared/http/pagination';
 
 @Injectable({
   providedIn: 'root'
@@ -14,7 +15,7 @@ export class DeploymentsService {
   constructor(private http: HttpClient) { }
 
   getDeployments(environmentId: string): Observable<Deployment[]> {
-    return this.http.get<Deployment[]>(`${this.apiUrl}/environments/${environmentId}`)
+    return getAllPages<Deployment>(this.http, `${this.apiUrl}/environments/${environmentId}`)
       .pipe(
         map(deployments => deployments.sort((a, b) =>
           new Date(b.created_at).getTime() - new Date(a.created_at).getTime()
@@ -39,4 +40,13 @@ export class DeploymentsService {
   getDeploymentLogs(deploymentId: string): Observable<{ logs: string }> {
     return this.http.get<{ logs: string }>(`${this.apiUrl}/${deploymentId}/logs`);
   }
+
+  /**
+   * Server-Sent Events for a deployment's logs: `deploy` and `app` events carry new lines,
+   * `end` (data: final status) is sent once the deployment has finished. The browser
+   * reconnects on its own and resumes after the last event it received.
+   */
+  streamDeploymentLogs(deploymentId: string): EventSource {
+    return new EventSource(`${this.apiUrl}/${deploymentId}/logs/events`, { withCredentials: true });
+  }
 }
@@ -4,6 +4,7 @@ import { Observable, interval } from 'rxjs';
 import { switchMap } from 'rxjs/operators';
 import { environment } from '../../../environments/environment';
 import { Environment, EnvironmentCreate } from '../../shared/models/environment.model';
+import { getAllPages } from '../../shared/http/pagination';
 
 @Injectable({
   providedIn: 'root'
@@ -14,7 +15,7 @@ export class EnvironmentsService {
   constructor(private http: HttpClient) { }
 
   getEnvironments(projectId: string): Observable<Environment[]> {
-    return this.http.get<Environment[]>(`${this.apiUrl}/projects/${projectId}`);
+    return getAllPages<Environment>(this.http, `${this.apiUrl}/projects/${projectId}`);
   }
 
   pollEnvironments(projectId: string, intervalMs: number = 3000): Observable<Environment[]> {
@@ -3,6 +3,7 @@ import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
 import { environment } from '../../../environments/environment';
 import { Project, ProjectCreate } from '../../shared/models/project.model';
+import { getAllPages } from '../../shared/http/pagination';
 
 @Injectable({
   providedIn: 'root'
@@ -13,7 +14,7 @@ export class ProjectsService {
   constructor(private http: HttpClient) { }
 
   getProjects(): Observable<Project[]> {
-    return this.http.get<Project[]>(this.apiUrl);
+    return getAllPages<Project>(this.http, this.apiUrl);
   }
 
   getProject(id: string): Observable<Project> {
@@ -17,7 +17,8 @@ export class StatusBadgeComponent {
       'running': 'badge-success',
       'failed': 'badge-error',
       'pending': 'badge-info',
-      'succeeded': 'badge-success'
+      'succeeded': 'badge-success',
+      'superseded': 'badge-default'
     };
     return statusMap[this.status.toLowerCase()] || 'badge-default';
   }
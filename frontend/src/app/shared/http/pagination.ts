@@ -0,0 +1,31 @@
+import { HttpClient, HttpParams } from '@angular/common/http';
+import { EMPTY, Observable } from 'rxjs';
+import { expand, reduce } from 'rxjs/operators';
+
+/** Response header with the cursor of the next page; absent on the last page. */
+export const NEXT_CURSOR_HEADER = 'X-Next-Cursor';
+
+/** Largest page the API serves (PAGE_SIZE_MAX): fewest round trips for a full list. */
+export const PAGE_SIZE = 500;
+
+/**
+ * GET every page of a keyset-paginated list endpoint, following X-Next-Cursor
+ * with `?cursor=` until the last page, and emit all items once.
+ */
+export function getAllPages<T>(http: HttpClient, url: string): Observable<T[]> {
+  const getPage = (cursor: string | null) => {
+    let params = new HttpParams().set('limit', PAGE_SIZE);
+    if (cursor) {
+      params = params.set('cursor', cursor);
+    }
+    return http.get<T[]>(url, { params, observe: 'response' });
+  };
+
+  return getPage(null).pipe(
+    expand(response => {
+      const cursor = response.headers.get(NEXT_CURSOR_HEADER);
+      return cursor ? getPage(cursor) : EMPTY;
+    }),
+    reduce((items: T[], response) => items.concat(response.body ?? []), [])
+  );
+}
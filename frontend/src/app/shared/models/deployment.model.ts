@@ -2,7 +2,7 @@ export interface Deployment {
   id: string;
   environment_id: string;
   version: string;
-  status: 'pending' | 'running' | 'succeeded' | 'failed';
+  status: 'pending' | 'running' | 'succeeded' | 'failed' | 'superseded';
   logs_url?: string;
   created_at: string;
 }